@@ -1,7 +1,3 @@
-import pandas as pd
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
-import math
 import warnings
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning) # Disabilita i warning di sicurezza per le connessioni HTTPS non verificate
@@ -12,7 +8,29 @@ from config import (
     ELASTICSEARCH_HOST,
     ELASTIC_USER,
     ELASTIC_PASSWORD,
-    INDEX_NAME_MAIN
+    INDEX_NAME_MAIN,
+    ES_INDEXING_MODE,
+    ES_MONTHLY_PARTITIONS
+)
+from es_indexing import (
+    connetti_a_elasticsearch,
+    indicizza_documenti,
+    prepara_generazione,
+    finalizza_generazione,
+    pubblica_generazione,
+    elimina_generazione_non_pubblicata,
+    indici_attivi,
+    TempiFasi,
+    DeadLetter
+)
+from es_serializzazione import colonne_file, leggi_a_blocchi
+from es_sorgenti import MAPPING_PRINCIPALE, IMPOSTAZIONI_INDICE, azioni_principale
+from es_incrementale import (
+    percorso_manifest,
+    ManifestIndice,
+    DeltaIncrementale,
+    impronta_schema,
+    riconcilia
 )
 
 # --- CONFIGURAZIONE SPECIFICA (mantenuta qui o spostata se utile altrove) ---
@@ -21,57 +39,24 @@ INPUT_CSV_FILE = ELASTICSEARCH_INDEXER_INPUT_CSV
 ELASTICSEARCH_HOST = ELASTICSEARCH_HOST
 ELASTIC_USER = ELASTIC_USER
 ELASTIC_PASSWORD = ELASTIC_PASSWORD
-INDEX_NAME = INDEX_NAME_MAIN
+INDEX_NAME = INDEX_NAME_MAIN # Alias di lettura: i dati vivono in generazioni '<alias>-<timestamp>'
 
 # --- FUNZIONI (invariate) ---
-def connetti_a_elasticsearch():
-    """Tenta di connettersi a un'istanza Elasticsearch sicura (HTTPS)."""
-    print(f"Tentativo di connessione sicura (HTTPS) a Elasticsearch su {ELASTICSEARCH_HOST}...")
-    try:
-        es_client = Elasticsearch(
-            hosts=[ELASTICSEARCH_HOST],
-            basic_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
-            verify_certs=False
-        )
-        es_client.info()
-        print("Connessione a Elasticsearch riuscita!")
-        return es_client
-    except Exception as e:
-        print(f"ERRORE DI CONNESSIONE: {e}")
-        return None
+def crea_indice_con_mapping(es_client, alias):
+    """Crea la nuova generazione (indice unico o partizioni mensili) con il mapping dei dati e ne restituisce il nome."""
+    return prepara_generazione(es_client, alias, MAPPING_PRINCIPALE, IMPOSTAZIONI_INDICE, partizionata=ES_MONTHLY_PARTITIONS)
 
-def crea_indice_con_mapping(es_client, index_name):
-    """Crea un indice con un mapping specifico per i dati."""
-    if es_client.indices.exists(index=index_name):
-        print(f"L'indice '{index_name}' esiste già. Verrà eliminato e ricreato.")
-        es_client.indices.delete(index=index_name)
-    mapping = {
-        "properties": {
-            "id_originale": {"type": "keyword"},
-            "fonte": {"type": "keyword"},
-            "data_originale_str": {"type": "date", "format": "date_optional_time||epoch_second"},
-            "lingua_rilevata": {"type": "keyword"},
-            "testo_pulito_base": {"type": "text", "analyzer": "standard"},
-            "testo_lemmatizzato": {"type": "text", "analyzer": "standard"},
-            "sentiment_label": {"type": "keyword"},
-            "sentiment_score_positive": {"type": "float"},
-            "sentiment_score_negative": {"type": "float"},
-            "sentiment_score_neutral": {"type": "float"}
-        }
-    }
-    print(f"Creazione del nuovo indice '{index_name}' con mapping...")
-    es_client.indices.create(index=index_name, mappings=mapping)
+def generatore_documenti_da_csv(percorso, index_name, id_column):
+    """Azioni bulk già serializzate, lette a blocchi dal file di input (CSV o Parquet)."""
+    return azioni_principale(percorso, index_name, id_column, partizionata=ES_MONTHLY_PARTITIONS)
 
-def generatore_documenti_da_csv(df, index_name, id_column):
-    """Funzione generatore per produrre documenti da indicizzare con 'bulk'."""
-    for index, row in df.iterrows():
-        doc = row.to_dict()
-        doc_pulito = {key: None if pd.isna(value) or (isinstance(value, float) and math.isnan(value)) else value for key, value in doc.items()}
-        yield {
-            "_index": index_name,
-            "_id": str(doc_pulito.get(id_column, f"doc_{index}")),
-            "_source": doc_pulito,
-        }
+def trova_riga(percorso, id_column, id_cercato):
+    """Righe del file di input con l'id indicato, cercate blocco per blocco."""
+    for blocco in leggi_a_blocchi(percorso, colonne_id=[id_column]):
+        righe = blocco[blocco[id_column].astype(str) == str(id_cercato)]
+        if not righe.empty:
+            return righe
+    return None
 
 # --- BLOCCO DI ESECUZIONE PRINCIPALE (CON GESTIONE ERRORE CORRETTA) ---
 if __name__ == "__main__":
@@ -82,18 +67,64 @@ if __name__ == "__main__":
         
         if es:
             try:
-                print(f"Caricamento dati da '{INPUT_CSV_FILE}'...")
-                df = pd.read_csv(INPUT_CSV_FILE)
-                df.dropna(axis=1, how='all', inplace=True)
-                print(f"Caricate {len(df)} righe. Colonne presenti: {df.columns.tolist()}")                
-                crea_indice_con_mapping(es, INDEX_NAME)
-                print("Inizio indicizzazione dei documenti in Elasticsearch...")
-                
-                success, errors = bulk(
-                    client=es, 
-                    actions=generatore_documenti_da_csv(df, INDEX_NAME, id_column='id_originale'),
-                    raise_on_error=False
-                )
+                # il file viene letto a blocchi durante l'indicizzazione: qui solo l'intestazione
+                print(f"Lettura a blocchi dei dati da '{INPUT_CSV_FILE}'. Colonne presenti: {colonne_file(INPUT_CSV_FILE)}")
+                tempi = TempiFasi()
+                dead_letter = DeadLetter(INDEX_NAME)
+                manifest = ManifestIndice(percorso_manifest(INDEX_NAME))
+                attivi = indici_attivi(es, INDEX_NAME)
+                schema = impronta_schema(MAPPING_PRINCIPALE, IMPOSTAZIONI_INDICE)
+                # il delta si applica solo a una generazione con un unico indice fisico (niente partizioni mensili)
+                # creata con il mapping e le impostazioni attuali
+                allineato = len(attivi) == 1 and manifest.indice() == attivi[0]
+                incrementale = (ES_INDEXING_MODE == "incrementale" and not ES_MONTHLY_PARTITIONS
+                                and allineato and manifest.schema() == schema)
+                if ES_INDEXING_MODE == "incrementale" and ES_MONTHLY_PARTITIONS:
+                    print("Partizioni mensili attive: la modalità incrementale non è supportata, eseguo una ricostruzione completa.")
+                elif ES_INDEXING_MODE == "incrementale" and allineato and not incrementale:
+                    print("Mapping o impostazioni dell'indice cambiati rispetto al manifest: eseguo una ricostruzione completa.")
+                elif ES_INDEXING_MODE == "incrementale" and not incrementale:
+                    print("Manifest assente o non allineato con l'alias: eseguo una ricostruzione completa.")
+
+                if incrementale:
+                    # solo il delta rispetto al manifest, scritto direttamente nella generazione attiva
+                    indice = attivi[0]
+                    delta = DeltaIncrementale(manifest.documenti())
+                    print(f"Inizio indicizzazione incrementale in '{indice}' ({len(delta.precedenti)} documenti nel manifest)...")
+                    with tempi.fase("caricamento incrementale"):
+                        success, errors = indicizza_documenti(es, delta.azioni(generatore_documenti_da_csv(INPUT_CSV_FILE, indice, id_column='id_originale'), indice), dead_letter=dead_letter)
+                    with tempi.fase("refresh"):
+                        es.indices.refresh(index=indice)
+                else:
+                    # nuova generazione: l'alias continua a servire quella attuale fino alla pubblicazione
+                    with tempi.fase("creazione indice"):
+                        indice = crea_indice_con_mapping(es, INDEX_NAME)
+                    print("Inizio indicizzazione dei documenti in Elasticsearch...")
+                    delta = DeltaIncrementale({})
+                    with tempi.fase("caricamento bulk"):
+                        success, errors = indicizza_documenti(es, delta.azioni(generatore_documenti_da_csv(INPUT_CSV_FILE, indice, id_column='id_originale'), indice), dead_letter=dead_letter)
+                    indici = finalizza_generazione(es, INDEX_NAME, indice, tempi, partizionata=ES_MONTHLY_PARTITIONS)
+                print(delta.riepilogo())
+
+                # lo stato finale deve coincidere con quello di una ricostruzione completa
+                stato = delta.stato_finale(errors)
+                with tempi.fase("riconciliazione"):
+                    riconciliato, messaggio = riconcilia(es, indice if incrementale else indici, stato)
+                print(f"Riconciliazione {'superata' if riconciliato else 'FALLITA'}: {messaggio}.")
+                if incrementale:
+                    if riconciliato:
+                        manifest.sostituisci(indice, stato, schema)
+                    else:
+                        manifest.invalida()
+                        print("Il manifest è stato invalidato: la prossima esecuzione ricostruirà l'indice da zero.")
+                elif not riconciliato:
+                    print(f"L'alias '{INDEX_NAME}' resta sulla generazione attuale.")
+                    elimina_generazione_non_pubblicata(es, INDEX_NAME, indice, "riconciliazione fallita")
+                elif pubblica_generazione(es, INDEX_NAME, indice, errors, tempi):
+                    manifest.sostituisci(indice, stato, schema)
+                manifest.chiudi()
+                dead_letter.chiudi()
+                print(tempi.riepilogo())
                 
                 print("\n--- Risultato Indicizzazione ---")
                 print(f"Documenti indicizzati con successo: {success}")
@@ -103,7 +134,7 @@ if __name__ == "__main__":
                     print("\nDettagli per il primo documento fallito:")
                     
                     error_info = errors[0]
-                    error_details = error_info.get('index', {})
+                    error_details = next(iter(error_info.values()), {}) # chiave 'index', 'create' o 'delete'
                     failed_id = error_details.get('_id')
                     error_reason = error_details.get('error', {})
                     
@@ -113,14 +144,13 @@ if __name__ == "__main__":
                     
                     if failed_id:
                         try:
-                            df['id_originale_str'] = df['id_originale'].astype(str)
-                            failed_row = df[df['id_originale_str'] == str(failed_id)]
+                            failed_row = trova_riga(INPUT_CSV_FILE, 'id_originale', failed_id)
                             
-                            if not failed_row.empty:
+                            if failed_row is not None:
                                 print("  Dati Originali della Riga Fallita nel CSV:")
                                 print(failed_row.to_string())
                             else:
-                                print(f"  Impossibile trovare la riga con id '{failed_id}' nel DataFrame.")
+                                print(f"  Impossibile trovare la riga con id '{failed_id}' nel file di input.")
                         except Exception as find_e:
                             print(f"  (Impossibile recuperare la riga originale dal CSV per l'id '{failed_id}': {find_e})")
                 else:
@@ -1,7 +1,3 @@
-import pandas as pd
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk, BulkIndexError
-import math
 import warnings
 import urllib3
 
@@ -15,8 +11,22 @@ from config import (
     ELASTICSEARCH_HOST,
     ELASTIC_USER,
     ELASTIC_PASSWORD,
-    INDEX_NAME_TOPIC
+    INDEX_NAME_TOPIC,
+    ES_MONTHLY_PARTITIONS,
+    LDA_TOPICS_EN_TXT,
+    LDA_TOPICS_IT_TXT
 )
+from es_indexing import (
+    connetti_a_elasticsearch,
+    indicizza_documenti,
+    prepara_generazione,
+    finalizza_generazione,
+    pubblica_generazione,
+    TempiFasi,
+    DeadLetter
+)
+from es_sorgenti import MAPPING_TOPIC, IMPOSTAZIONI_INDICE, prepara_blocchi_topic, azioni_topic
+from topic_registry import ErroreVersioneTopic
 
 # --- CONFIGURAZIONE SPECIFICA (mantenuta qui o spostata se utile altrove) ---
 # Ora queste variabili sono importate da config.py
@@ -26,88 +36,16 @@ INPUT_TOPICS_IT_CSV = ELASTICSEARCH_INDEXER_TOPICS_IT_CSV
 ELASTICSEARCH_HOST = ELASTICSEARCH_HOST
 ELASTIC_USER = ELASTIC_USER
 ELASTIC_PASSWORD = ELASTIC_PASSWORD
-INDEX_NAME = INDEX_NAME_TOPIC # Nome del NUOVO indice dedicato ai topic
-
-TOPIC_LABELS_EN = {
-    0: "Conflitto Geopolitico e Minaccia Nucleare",
-    1: "Meta-Discussione su Informazione e Fonti Online",
-    2: "Resoconti di Attacchi su Città e Civili",
-    3: "Leader e Incontri Diplomatici (Trump, Putin, Zelensky)",
-    4: "Economia del Conflitto e Ruolo della Cina",
-    5: "Supporto Internazionale e Sicurezza dell'Ucraina",
-    6: "Critica Politica Emotiva (Ungheria/Orbán)",
-    7: "Operazioni Militari e Controllo del Territorio",
-    8: "Narrazioni Storiche e Propaganda (Nazismo)",
-    9: "Risposta e Difesa Europea (EU/NATO)",
-    10: "Opinione Pubblica Social (Chatter Generale)",
-    11: "Jargon di Guerra e Linguaggio Social ('Operazione Speciale')",
-    12: "Politica Interna USA e Ripercussioni (Afghanistan)",
-    13: "Sanzioni, Energia e Negoziati di Pace",
-    14: "Intelligence, Tecnologia e Ruolo di Elon Musk"
-}
-
-TOPIC_LABELS_IT = {
-    0: "Narrazione dell'Operazione Militare e Rischi",
-    1: "Guerra Aerea e Sistemi di Difesa",
-    2: "Impatto del Conflitto sui Civili",
-    3: "Quadro Politico-Diplomatico (Sanzioni Europee)",
-    4: "Attacchi a Infrastrutture e Siti Nucleari (Chernobyl)",
-    5: "Coinvolgimento Leader Europei (Draghi/Macron)",
-    6: "Discorso Politico Generale sul Conflitto (1)",
-    7: "Comunicazioni Ufficiali Russe (Cremlino/Peskov)",
-    8: "Discorso Politico Generale sul Conflitto (2)",
-    9: "Assedio di Mariupol e Corridoi Umanitari",
-    10: "Prospettiva Politica Italiana e Scenario Globale (Gaza)",
-    11: "Adesione NATO (Svezia) e Ruolo UK",
-    12: "Sanzioni, Neutralità e Media Internazionali",
-    13: "Discorso Politico-Militare Generale (Attacchi)",
-    14: "Referendum e Fornitura di Caccia (Svezia)"
-}
+INDEX_NAME = INDEX_NAME_TOPIC # Alias di lettura dell'indice dedicato ai topic (generazioni '<alias>-<timestamp>')
 
 # --- FUNZIONI (Simili allo script precedente) ---
-def connetti_a_elasticsearch():
-    """Tenta di connettersi a un'istanza Elasticsearch sicura (HTTPS)."""
-    print(f"Tentativo di connessione sicura (HTTPS) a Elasticsearch su {ELASTICSEARCH_HOST}...")
-    try:
-        es_client = Elasticsearch(
-            hosts=[ELASTICSEARCH_HOST], basic_auth=(ELASTIC_USER, ELASTIC_PASSWORD), verify_certs=False
-        )
-        es_client.info()
-        print("Connessione a Elasticsearch riuscita!")
-        return es_client
-    except Exception as e:
-        print(f"ERRORE DI CONNESSIONE: {e}")
-        return None
+def crea_indice_topic_con_mapping(es_client, alias):
+    """Crea la nuova generazione (indice unico o partizioni mensili) con il mapping dei topic e ne restituisce il nome."""
+    return prepara_generazione(es_client, alias, MAPPING_TOPIC, IMPOSTAZIONI_INDICE, partizionata=ES_MONTHLY_PARTITIONS)
 
-def crea_indice_topic_con_mapping(es_client, index_name):
-    """Crea un indice con un mapping specifico per i dati dei topic."""
-    if es_client.indices.exists(index=index_name):
-        print(f"L'indice '{index_name}' esiste già. Verrà eliminato e ricreato.")
-        es_client.indices.delete(index=index_name)
-    mapping = {
-        "properties": {
-            "id_originale": {"type": "keyword"},
-            "fonte": {"type": "keyword"},
-            "data_originale_str": {"type": "date", "format": "date_optional_time||epoch_second"},
-            "lingua": {"type": "keyword"},
-            "testo_processato": {"type": "text", "analyzer": "standard"},
-            "topic_id": {"type": "integer"},
-            "topic_label": {"type": "keyword"}
-        }
-    }
-    print(f"Creazione del nuovo indice '{index_name}' con mapping...")
-    es_client.indices.create(index=index_name, mappings=mapping)
-
-def generatore_documenti_da_df(df, index_name, id_column):
-    """Funzione generatore per produrre documenti da indicizzare."""
-    for index, row in df.iterrows():
-        doc = row.to_dict()
-        doc_pulito = {key: None if pd.isna(value) else value for key, value in doc.items()}
-        yield {
-            "_index": index_name,
-            "_id": str(doc_pulito.get(id_column, f"topic_doc_{index}")),
-            "_source": doc_pulito,
-        }
+def generatore_documenti_da_df(blocchi, index_name, id_column):
+    """Azioni bulk già serializzate per i blocchi di documenti dei topic."""
+    return azioni_topic(blocchi, index_name, id_column, partizionata=ES_MONTHLY_PARTITIONS)
 
 # --- BLOCCO DI ESECUZIONE PRINCIPALE ---
 if __name__ == "__main__":
@@ -115,33 +53,29 @@ if __name__ == "__main__":
         print("ERRORE: Per favore, inserisci la password reale per l'utente 'elastic' nella variabile ELASTIC_PASSWORD in config.py.")
     else:
         try:
-            print(f"Caricamento dati topic inglesi da '{INPUT_TOPICS_EN_CSV}'...")
-            df_en = pd.read_csv(INPUT_TOPICS_EN_CSV)
-            df_en.rename(columns={'topic_dominante_lda_en': 'topic_id'}, inplace=True)
-            df_en['topic_label'] = df_en['topic_id'].map(TOPIC_LABELS_EN)
-            df_en['lingua'] = 'en'
-            
-            print(f"Caricamento dati topic italiani da '{INPUT_TOPICS_IT_CSV}'...")
-            df_it = pd.read_csv(INPUT_TOPICS_IT_CSV)
-            df_it.rename(columns={'topic_dominante_lda_it': 'topic_id'}, inplace=True)
-            df_it['topic_label'] = df_it['topic_id'].map(TOPIC_LABELS_IT)
-            df_it['lingua'] = 'it'
-
-            print("Unione dei dataset inglese e italiano...")
-            df_combined = pd.concat([df_en, df_it], ignore_index=True)
-            df_combined.rename(columns={'testo_lemmatizzato': 'testo_processato'}, inplace=True, errors='ignore') # Ensure column name consistency
-            print(f"Dataset finale per l'indicizzazione creato con {len(df_combined)} documenti.")
-            print(f"Colonne disponibili: {df_combined.columns.tolist()}")
+            # versioni ed etichette sono verificate prima di indicizzare; i documenti inglesi e italiani
+            # sono poi letti a blocchi e indicizzati di seguito, come un unico dataset
+            blocchi, versioni = prepara_blocchi_topic({
+                'en': (INPUT_TOPICS_EN_CSV, LDA_TOPICS_EN_TXT),
+                'it': (INPUT_TOPICS_IT_CSV, LDA_TOPICS_IT_TXT)
+            })
+            print(f"Etichette dei topic caricate dal registro (EN: '{versioni['en']}', IT: '{versioni['it']}').")
 
             es = connetti_a_elasticsearch()
             if es:
-                crea_indice_topic_con_mapping(es, INDEX_NAME)
+                # nuova generazione: l'alias continua a servire quella attuale fino alla pubblicazione
+                tempi = TempiFasi()
+                dead_letter = DeadLetter(INDEX_NAME)
+                with tempi.fase("creazione indice"):
+                    nuovo_indice = crea_indice_topic_con_mapping(es, INDEX_NAME)
                 
-                print(f"Inizio indicizzazione dei dati dei topic nell'indice '{INDEX_NAME}'...")
-                success, errors = bulk(
-                    client=es,
-                    actions=generatore_documenti_da_df(df_combined, INDEX_NAME, id_column='id_originale')
-                )
+                print(f"Inizio indicizzazione dei dati dei topic nell'indice '{nuovo_indice}' (alias '{INDEX_NAME}')...")
+                with tempi.fase("caricamento bulk"):
+                    success, errors = indicizza_documenti(es, generatore_documenti_da_df(blocchi, nuovo_indice, id_column='id_originale'), dead_letter=dead_letter)
+                dead_letter.chiudi()
+                finalizza_generazione(es, INDEX_NAME, nuovo_indice, tempi, partizionata=ES_MONTHLY_PARTITIONS)
+                pubblica_generazione(es, INDEX_NAME, nuovo_indice, errors, tempi)
+                print(tempi.riepilogo())
                 
                 print("\n--- Risultato Indicizzazione Topic ---")
                 print(f"Documenti indicizzati con successo: {success}")
@@ -151,6 +85,8 @@ if __name__ == "__main__":
                 else:
                     print("Nessun errore riscontrato.")
                 
+        except ErroreVersioneTopic as e:
+            print(f"ERRORE: {e} Indicizzazione annullata.")
         except FileNotFoundError as e:
             print(f"ERRORE: File non trovato: {e.filename}. Assicurati che i file CSV dei topic siano nella directory corretta.")
         except Exception as e:
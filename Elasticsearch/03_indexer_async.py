@@ -0,0 +1,87 @@
+import asyncio
+import urllib3
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning) # Disabilita i warning di sicurezza per le connessioni HTTPS non verificate
+
+# Importa le configurazioni dal file config.py
+from config import (
+    ELASTICSEARCH_INDEXER_INPUT_CSV,
+    ELASTICSEARCH_INDEXER_TOPICS_EN_CSV,
+    ELASTICSEARCH_INDEXER_TOPICS_IT_CSV,
+    ELASTIC_PASSWORD,
+    INDEX_NAME_MAIN,
+    INDEX_NAME_TOPIC,
+    ES_MONTHLY_PARTITIONS,
+    LDA_TOPICS_EN_TXT,
+    LDA_TOPICS_IT_TXT
+)
+from es_indexing import (
+    connetti_a_elasticsearch,
+    prepara_generazione,
+    finalizza_generazione,
+    pubblica_generazione,
+    TempiFasi,
+    DeadLetter
+)
+from es_indexing_async import connetti_async, indicizza_documenti_async, ConcorrenzaAdattiva
+from es_sorgenti import MAPPING_PRINCIPALE, MAPPING_TOPIC, IMPOSTAZIONI_INDICE, azioni_principale, prepara_blocchi_topic, azioni_topic
+from topic_registry import ErroreVersioneTopic
+
+# Variante asincrona di 01_indexer.py e 02_indexer_topic.py: stesse generazioni e alias, ma invio
+# dei documenti con concorrenza adattiva (vedi es_indexing_async.py). Ricostruisce sempre una nuova
+# generazione, anche per l'indice principale (nessuna modalità incrementale).
+
+# --- FUNZIONI ---
+async def carica_indice(es, es_async, alias, mapping, crea_azioni, concorrenza):
+    """Crea una nuova generazione per l'alias, la carica in modo asincrono, la finalizza e la pubblica."""
+    tempi = TempiFasi()
+    dead_letter = DeadLetter(alias)
+    with tempi.fase("creazione indice"):
+        nuovo_indice = prepara_generazione(es, alias, mapping, IMPOSTAZIONI_INDICE, partizionata=ES_MONTHLY_PARTITIONS)
+    print(f"Inizio indicizzazione asincrona nell'indice '{nuovo_indice}' (alias '{alias}')...")
+    with tempi.fase("caricamento bulk"):
+        success, errors = await indicizza_documenti_async(es_async, crea_azioni(nuovo_indice), concorrenza=concorrenza, dead_letter=dead_letter)
+    dead_letter.chiudi()
+    finalizza_generazione(es, alias, nuovo_indice, tempi, partizionata=ES_MONTHLY_PARTITIONS)
+    pubblica_generazione(es, alias, nuovo_indice, errors, tempi)
+    print(tempi.riepilogo())
+
+    print(f"\n--- Risultato Indicizzazione '{alias}' ---")
+    print(f"Documenti indicizzati con successo: {success}")
+    if errors:
+        print(f"Errori riscontrati: {len(errors)}")
+        print(f"Primo errore: {errors[0]}")
+    else:
+        print("Nessun errore riscontrato.")
+
+async def main(es):
+    blocchi_topic, versioni = prepara_blocchi_topic({
+        'en': (ELASTICSEARCH_INDEXER_TOPICS_EN_CSV, LDA_TOPICS_EN_TXT),
+        'it': (ELASTICSEARCH_INDEXER_TOPICS_IT_CSV, LDA_TOPICS_IT_TXT)
+    })
+    print(f"Etichette dei topic caricate dal registro (EN: '{versioni['en']}', IT: '{versioni['it']}').")
+
+    es_async = connetti_async()
+    concorrenza = ConcorrenzaAdattiva() # condivisa: il secondo indice parte dal limite raggiunto dal primo
+    try:
+        await carica_indice(es, es_async, INDEX_NAME_MAIN, MAPPING_PRINCIPALE,
+                            lambda indice: azioni_principale(ELASTICSEARCH_INDEXER_INPUT_CSV, indice, partizionata=ES_MONTHLY_PARTITIONS), concorrenza)
+        await carica_indice(es, es_async, INDEX_NAME_TOPIC, MAPPING_TOPIC,
+                            lambda indice: azioni_topic(blocchi_topic, indice, partizionata=ES_MONTHLY_PARTITIONS), concorrenza)
+    finally:
+        await es_async.close()
+
+# --- BLOCCO DI ESECUZIONE PRINCIPALE ---
+if __name__ == "__main__":
+    if ELASTIC_PASSWORD == "elastic": # Valore di default in config.py, va cambiato dall'utente
+        print("ERRORE: Per favore, inserisci la password reale per l'utente 'elastic' nella variabile ELASTIC_PASSWORD in config.py.")
+    else:
+        es = connetti_a_elasticsearch()
+        if es:
+            try:
+                asyncio.run(main(es))
+            except ErroreVersioneTopic as e:
+                print(f"ERRORE: {e} Indicizzazione annullata.")
+            except FileNotFoundError as e:
+                print(f"ERRORE: File non trovato: {e.filename}.")
+            except Exception as e:
+                print(f"Si è verificato un errore generale: {e}")
@@ -0,0 +1,117 @@
+import glob
+import json
+import os
+import urllib3
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning) # Disabilita i warning di sicurezza per le connessioni HTTPS non verificate
+
+# Importa le configurazioni dal file config.py
+from config import ELASTIC_PASSWORD, ES_DEAD_LETTER_DIR
+from es_indexing import (
+    connetti_a_elasticsearch,
+    indicizza_documenti,
+    indici_attivi,
+    generazione_e_partizione,
+    dettagli_errore,
+    DeadLetter
+)
+from es_incrementale import percorso_manifest, ManifestIndice
+from es_serializzazione import CAMPO_HASH
+
+# Reinvia i documenti dei file di dead letter scritti dagli indexer. I documenti vanno alla generazione
+# attiva dell'alias registrato nel file: se è partizionata, nella partizione con lo stesso suffisso
+# (es. '-2024.01') dell'indice originale. Quelli che falliscono ancora finiscono in un nuovo dead letter.
+# Un file reinviato viene rinominato con il suffisso SUFFISSO_RIGIOCATO e non viene più riletto.
+
+# --- CONFIGURAZIONE SPECIFICA ---
+SUFFISSO_RIGIOCATO = ".rigiocato"
+
+# --- FUNZIONI ---
+def leggi_dead_letter(percorso):
+    """Righe del file di dead letter, raggruppate per alias."""
+    per_alias = {}
+    with open(percorso, "r", encoding="utf-8") as f:
+        for riga in f:
+            if riga.strip():
+                voce = json.loads(riga)
+                per_alias.setdefault(voce["alias"], []).append(voce)
+    return per_alias
+
+def destinazioni(alias, voci, attivi):
+    """
+    Indice attivo di destinazione di ogni voce, oppure (None, messaggio) se qualche voce non ha una destinazione.
+    Con un solo indice attivo tutte le voci vanno lì; con una generazione partizionata ogni voce va nella
+    partizione attiva corrispondente a quella del suo '_index' (le partizioni non esistenti non vanno create:
+    il template del caricamento non c'è più e nascerebbero senza mapping).
+    """
+    if len(attivi) == 1:
+        return [attivi[0]] * len(voci), None
+    generazioni_attive = {(generazione_e_partizione(alias, indice) or (None,))[0] for indice in attivi}
+    if len(generazioni_attive) != 1 or None in generazioni_attive:
+        return None, f"l'alias '{alias}' punta a {len(attivi)} indici che non sono le partizioni di una sola generazione"
+    generazione = generazioni_attive.pop()
+    indici = []
+    for voce in voci:
+        parti = generazione_e_partizione(alias, voce.get("_index"))
+        indice = generazione + parti[1] if parti else None
+        if indice not in attivi:
+            return None, f"nessuna partizione attiva di '{alias}' corrisponde all'indice '{voce.get('_index')}'"
+        indici.append(indice)
+    return indici, None
+
+def azioni_da_voci(voci, indici):
+    """Azioni bulk verso gli indici indicati, uno per voce. 'create' diventa 'index': il documento può essere già presente."""
+    for voce, indice in zip(voci, indici):
+        op_type = "delete" if voce["_op_type"] == "delete" else "index"
+        azione = {"_op_type": op_type, "_index": indice, "_id": voce["_id"]}
+        if op_type != "delete":
+            azione["_source"] = voce["_source"]
+        yield azione
+
+def aggiorna_manifest(alias, indice, voci, errori):
+    """Registra nel manifest incrementale i documenti reinviati con successo, se il manifest descrive l'indice attivo."""
+    percorso = percorso_manifest(alias)
+    if not os.path.exists(percorso):
+        return
+    manifest = ManifestIndice(percorso)
+    if manifest.indice() == indice:
+        falliti = {dettagli_errore(info).get("_id") for info in errori}
+        riusciti = [voce for voce in voci if voce["_id"] not in falliti]
+        manifest.aggiorna(
+            {voce["_id"]: voce["_source"][CAMPO_HASH] for voce in riusciti if voce["_op_type"] != "delete" and CAMPO_HASH in voce.get("_source", {})},
+            eliminati=[voce["_id"] for voce in riusciti if voce["_op_type"] == "delete"]
+        )
+        print(f"  Manifest incrementale di '{alias}' aggiornato.")
+    manifest.chiudi()
+
+# --- BLOCCO DI ESECUZIONE PRINCIPALE ---
+if __name__ == "__main__":
+    if ELASTIC_PASSWORD == "elastic": # Valore di default in config.py, va cambiato dall'utente
+        print("ERRORE: Per favore, inserisci la password reale per l'utente 'elastic' nella variabile ELASTIC_PASSWORD in config.py.")
+    else:
+        file_dead_letter = sorted(glob.glob(os.path.join(ES_DEAD_LETTER_DIR, "*.ndjson")))
+        if not file_dead_letter:
+            print(f"Nessun file di dead letter da reinviare in '{ES_DEAD_LETTER_DIR}'.")
+            exit()
+        es = connetti_a_elasticsearch()
+        if es:
+            for percorso in file_dead_letter:
+                print(f"\nReinvio dei documenti di '{percorso}'...")
+                try:
+                    completato = True
+                    for alias, voci in leggi_dead_letter(percorso).items():
+                        attivi = indici_attivi(es, alias)
+                        indici, problema = destinazioni(alias, voci, attivi) if attivi else (None, f"l'alias '{alias}' non esiste")
+                        if indici is None:
+                            print(f"  ERRORE: {problema}, impossibile reinviare {len(voci)} documenti.")
+                            completato = False
+                            continue
+                        dead_letter = DeadLetter(alias)
+                        success, errors = indicizza_documenti(es, azioni_da_voci(voci, indici), dead_letter=dead_letter)
+                        dead_letter.chiudi()
+                        if len(attivi) == 1: # il manifest incrementale descrive solo generazioni non partizionate
+                            aggiorna_manifest(alias, attivi[0], voci, errors)
+                        print(f"  '{alias}': {success} documenti reinviati in {len(set(indici))} indici di '{alias}', {len(errors)} ancora falliti.")
+                    if completato: # altrimenti il file resta per un nuovo tentativo
+                        os.replace(percorso, percorso + SUFFISSO_RIGIOCATO)
+                except Exception as e:
+                    print(f"Si è verificato un errore durante il reinvio di '{percorso}': {e}")
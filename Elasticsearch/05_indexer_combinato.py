@@ -0,0 +1,98 @@
+import urllib3
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning) # Disabilita i warning di sicurezza per le connessioni HTTPS non verificate
+
+# Importa le configurazioni dal file config.py
+from config import (
+    ELASTICSEARCH_INDEXER_INPUT_CSV,
+    ELASTICSEARCH_INDEXER_TOPICS_EN_CSV,
+    ELASTICSEARCH_INDEXER_TOPICS_IT_CSV,
+    ELASTIC_PASSWORD,
+    INDEX_NAME_COMBINED,
+    ES_MONTHLY_PARTITIONS,
+    LDA_TOPICS_EN_TXT,
+    LDA_TOPICS_IT_TXT
+)
+from es_indexing import (
+    connetti_a_elasticsearch,
+    indicizza_documenti,
+    prepara_generazione,
+    finalizza_generazione,
+    pubblica_generazione,
+    TempiFasi,
+    DeadLetter
+)
+from es_sorgenti import MAPPING_COMBINATO, IMPOSTAZIONI_INDICE, prepara_blocchi_topic, tabella_topic, blocchi_combinati, azioni_combinate
+from topic_registry import ErroreVersioneTopic
+
+# Indice denormalizzato: l'output del sentiment unito localmente ai topic EN/IT per id_originale,
+# un documento per elemento. Le aggregazioni sentiment per topic diventano una sola query terms + avg.
+
+# --- CONFIGURAZIONE SPECIFICA ---
+INDEX_NAME = INDEX_NAME_COMBINED # Alias di lettura (generazioni '<alias>-<timestamp>')
+NUM_TOPIC_AGGREGAZIONE = 20
+
+# --- FUNZIONI ---
+def sentiment_per_topic(es_client, index_name, num_topic=NUM_TOPIC_AGGREGAZIONE):
+    """Sentiment medio e distribuzione delle etichette per topic, in una sola richiesta."""
+    return es_client.search(index=index_name, size=0, aggs={
+        "per_topic": {
+            "terms": {"field": "topic_label", "size": num_topic},
+            "aggs": {
+                "positivo_medio": {"avg": {"field": "sentiment_score_positive"}},
+                "negativo_medio": {"avg": {"field": "sentiment_score_negative"}},
+                "neutro_medio": {"avg": {"field": "sentiment_score_neutral"}},
+                "etichette": {"terms": {"field": "sentiment_label"}}
+            }
+        }
+    })
+
+def stampa_sentiment_per_topic(risposta):
+    print(f"\nSentiment per topic (query eseguita in {risposta['took']} ms):")
+    for bucket in risposta["aggregations"]["per_topic"]["buckets"]:
+        etichette = ", ".join(f"{b['key']}: {b['doc_count']}" for b in bucket["etichette"]["buckets"])
+        print(f"  {bucket['key']:<40} {bucket['doc_count']:>8} doc  pos {bucket['positivo_medio']['value'] or 0:.3f}  "
+              f"neg {bucket['negativo_medio']['value'] or 0:.3f}  neu {bucket['neutro_medio']['value'] or 0:.3f}  ({etichette})")
+
+# --- BLOCCO DI ESECUZIONE PRINCIPALE ---
+if __name__ == "__main__":
+    if ELASTIC_PASSWORD == "elastic": # Valore di default in config.py, va cambiato dall'utente
+        print("ERRORE: Per favore, inserisci la password reale per l'utente 'elastic' nella variabile ELASTIC_PASSWORD in config.py.")
+    else:
+        try:
+            tempi = TempiFasi()
+            blocchi_topic, versioni = prepara_blocchi_topic({
+                'en': (ELASTICSEARCH_INDEXER_TOPICS_EN_CSV, LDA_TOPICS_EN_TXT),
+                'it': (ELASTICSEARCH_INDEXER_TOPICS_IT_CSV, LDA_TOPICS_IT_TXT)
+            })
+            print(f"Etichette dei topic caricate dal registro (EN: '{versioni['en']}', IT: '{versioni['it']}').")
+            with tempi.fase("tabella dei topic"):
+                topic = tabella_topic(blocchi_topic)
+            print(f"Tabella dei topic per il join: {topic.num_rows} documenti.")
+
+            es = connetti_a_elasticsearch()
+            if es:
+                dead_letter = DeadLetter(INDEX_NAME)
+                with tempi.fase("creazione indice"):
+                    nuovo_indice = prepara_generazione(es, INDEX_NAME, MAPPING_COMBINATO, IMPOSTAZIONI_INDICE, partizionata=ES_MONTHLY_PARTITIONS)
+                print(f"Inizio indicizzazione dei documenti combinati nell'indice '{nuovo_indice}' (alias '{INDEX_NAME}')...")
+                with tempi.fase("join e caricamento bulk"):
+                    success, errors = indicizza_documenti(
+                        es, azioni_combinate(blocchi_combinati(ELASTICSEARCH_INDEXER_INPUT_CSV, topic), nuovo_indice, partizionata=ES_MONTHLY_PARTITIONS), dead_letter=dead_letter
+                    )
+                dead_letter.chiudi()
+                finalizza_generazione(es, INDEX_NAME, nuovo_indice, tempi, partizionata=ES_MONTHLY_PARTITIONS)
+                pubblicato = pubblica_generazione(es, INDEX_NAME, nuovo_indice, errors, tempi)
+                print(tempi.riepilogo())
+
+                print("\n--- Risultato Indicizzazione Combinata ---")
+                print(f"Documenti indicizzati con successo: {success}")
+                print(f"Errori riscontrati: {len(errors)}" if errors else "Nessun errore riscontrato.")
+                if pubblicato:
+                    stampa_sentiment_per_topic(sentiment_per_topic(es, INDEX_NAME))
+
+        except ErroreVersioneTopic as e:
+            print(f"ERRORE: {e} Indicizzazione annullata.")
+        except FileNotFoundError as e:
+            print(f"ERRORE: File non trovato: {e.filename}.")
+        except Exception as e:
+            print(f"Si è verificato un errore generale: {e}")
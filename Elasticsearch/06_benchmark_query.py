@@ -0,0 +1,123 @@
+import json
+import time
+import urllib3
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning) # Disabilita i warning di sicurezza per le connessioni HTTPS non verificate
+
+import numpy as np
+
+# Importa le configurazioni dal file config.py
+from config import (
+    ELASTIC_PASSWORD,
+    ES_QUERY_BENCHMARK_TARGETS,
+    ES_QUERY_BENCHMARK_REPETITIONS,
+    ES_QUERY_BENCHMARK_REPORT_JSON
+)
+from es_indexing import connetti_a_elasticsearch, indici_attivi
+from es_sorgenti import COLONNA_DATA
+
+# Misura le query tipiche delle dashboard Kibana su ciascun alias di ES_QUERY_BENCHMARK_TARGETS, per
+# confrontare layout diversi (indice unico o partizioni mensili, mapping e ordinamento dei segmenti).
+# La cache delle richieste è disattivata: ogni ripetizione esegue davvero la query. Le date degli
+# intervalli sono ricavate dai dati di ogni alias, così le query coprono sempre i documenti più recenti.
+
+# --- CONFIGURAZIONE SPECIFICA ---
+GIORNI_INTERVALLO_BREVE = 30
+GIORNI_INTERVALLO_LUNGO = 180
+RIPETIZIONI_RISCALDAMENTO = 3
+TESTO_RICERCA = "governo"
+
+# --- FUNZIONI ---
+def estremi_date(es_client, alias):
+    """Data minima e massima (epoch ms) dei documenti dell'alias, o None se l'alias è vuoto."""
+    risposta = es_client.search(index=alias, size=0, request_cache=False, aggs={
+        "minima": {"min": {"field": COLONNA_DATA}},
+        "massima": {"max": {"field": COLONNA_DATA}}
+    })
+    minima, massima = risposta["aggregations"]["minima"]["value"], risposta["aggregations"]["massima"]["value"]
+    return None if massima is None else (int(minima), int(massima))
+
+def intervallo(massima, giorni):
+    return {"range": {COLONNA_DATA: {"gte": massima - giorni * 86400 * 1000, "lte": massima, "format": "epoch_millis"}}}
+
+def query_dashboard(massima):
+    """Corpo delle query misurate, per nome: conteggi, aggregazioni, ricerca testuale e ultimi documenti."""
+    breve, lungo = intervallo(massima, GIORNI_INTERVALLO_BREVE), intervallo(massima, GIORNI_INTERVALLO_LUNGO)
+    return {
+        "istogramma_giornaliero": {"size": 0, "query": lungo, "aggs": {
+            "per_giorno": {"date_histogram": {"field": COLONNA_DATA, "calendar_interval": "day"}}
+        }},
+        "giorni_precalcolati": {"size": 0, "query": lungo, "aggs": {
+            "per_giorno": {"terms": {"field": "giorno", "size": GIORNI_INTERVALLO_LUNGO + 1}}
+        }},
+        "fonti_per_mese": {"size": 0, "query": lungo, "aggs": {
+            "per_mese": {"terms": {"field": "mese", "size": 12}, "aggs": {"per_fonte": {"terms": {"field": "fonte", "size": 20}}}}
+        }},
+        "fonti_intervallo_breve": {"size": 0, "query": breve, "aggs": {
+            "per_fonte": {"terms": {"field": "fonte", "size": 20}}
+        }},
+        "sentiment_per_lingua": {"size": 0, "query": lungo, "aggs": {
+            "per_lingua": {"terms": {"field": "lingua_rilevata", "size": 10}, "aggs": {
+                "positivo_medio": {"avg": {"field": "sentiment_score_positive"}},
+                "negativo_medio": {"avg": {"field": "sentiment_score_negative"}},
+                "etichette": {"terms": {"field": "sentiment_label"}}
+            }}
+        }},
+        "ricerca_testo": {"size": 10, "track_total_hits": True, "query": {"bool": {
+            "must": {"match": {"testo_lemmatizzato": TESTO_RICERCA}}, "filter": lungo
+        }}},
+        "ultimi_documenti": {"size": 20, "query": breve, "sort": [{COLONNA_DATA: "desc"}],
+                             "_source": ["id_originale", "fonte", COLONNA_DATA, "sentiment_label"]}
+    }
+
+def misura_query(es_client, alias, corpo, ripetizioni=ES_QUERY_BENCHMARK_REPETITIONS):
+    """Esegue la query e restituisce p50/p95 del tempo lato cluster ('took') e della latenza lato client, in ms."""
+    took, latenze = [], []
+    for i in range(RIPETIZIONI_RISCALDAMENTO + ripetizioni):
+        inizio = time.perf_counter()
+        risposta = es_client.search(index=alias, request_cache=False, **corpo)
+        latenza = (time.perf_counter() - inizio) * 1000
+        if i >= RIPETIZIONI_RISCALDAMENTO:
+            took.append(risposta["took"])
+            latenze.append(latenza)
+    return {
+        "took_p50_ms": float(np.percentile(took, 50)),
+        "took_p95_ms": float(np.percentile(took, 95)),
+        "client_p50_ms": round(float(np.percentile(latenze, 50)), 2),
+        "client_p95_ms": round(float(np.percentile(latenze, 95)), 2),
+        "hits": risposta["hits"]["total"]["value"]
+    }
+
+def benchmark_alias(es_client, alias):
+    """Risultati di tutte le query su un alias, con gli indici fisici coinvolti."""
+    estremi = estremi_date(es_client, alias)
+    if estremi is None:
+        print(f"  L'alias '{alias}' non contiene documenti con data: saltato.")
+        return None
+    indici = indici_attivi(es_client, alias) or [alias]
+    print(f"\nAlias '{alias}': {len(indici)} indici fisici.")
+    risultati = {}
+    for nome, corpo in query_dashboard(estremi[1]).items():
+        risultati[nome] = misura_query(es_client, alias, corpo)
+        r = risultati[nome]
+        print(f"  {nome:<24} took p50 {r['took_p50_ms']:>7.1f} ms  p95 {r['took_p95_ms']:>7.1f} ms   "
+              f"client p50 {r['client_p50_ms']:>7.1f} ms  p95 {r['client_p95_ms']:>7.1f} ms   ({r['hits']} hit)")
+    return {"indici": indici, "query": risultati}
+
+# --- BLOCCO DI ESECUZIONE PRINCIPALE ---
+if __name__ == "__main__":
+    if ELASTIC_PASSWORD == "elastic": # Valore di default in config.py, va cambiato dall'utente
+        print("ERRORE: Per favore, inserisci la password reale per l'utente 'elastic' nella variabile ELASTIC_PASSWORD in config.py.")
+    else:
+        es = connetti_a_elasticsearch()
+        if es:
+            try:
+                report = {"ripetizioni": ES_QUERY_BENCHMARK_REPETITIONS, "alias": {}}
+                for alias in ES_QUERY_BENCHMARK_TARGETS:
+                    risultato = benchmark_alias(es, alias)
+                    if risultato is not None:
+                        report["alias"][alias] = risultato
+                with open(ES_QUERY_BENCHMARK_REPORT_JSON, "w", encoding="utf-8") as f:
+                    json.dump(report, f, indent=2, ensure_ascii=False)
+                print(f"\nReport salvato in '{ES_QUERY_BENCHMARK_REPORT_JSON}'.")
+            except Exception as e:
+                print(f"Si è verificato un errore durante il benchmark delle query: {e}")
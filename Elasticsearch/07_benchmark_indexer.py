@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import time
+
+from elasticsearch import Elasticsearch
+
+# Importa le configurazioni dal file config.py
+from config import (
+    ROOT_DIR,
+    SENTIMENT_BACKEND_SAMPLE_CSVS,
+    ES_BULK_MODE,
+    ES_HTTP_COMPRESS,
+    ES_CONNECTIONS_PER_NODE,
+    ES_REQUEST_TIMEOUT,
+    ES_BENCHMARK_DOCS,
+    ES_BENCHMARK_MODES,
+    ES_BENCHMARK_SCENARIOS,
+    ES_BENCHMARK_INCREMENTAL_CHANGE_RATIO,
+    ES_BENCHMARK_DUPLICATE_RATIO,
+    ES_BENCHMARK_DIR
+)
+from es_indexing import indicizza_documenti, dettagli_errore, DeadLetter
+from es_indexing_async import connetti_async, indicizza_documenti_async, ConcorrenzaAdattiva
+from es_incrementale import DeltaIncrementale
+from es_serializzazione import leggi_a_blocchi
+from es_sorgenti import azioni_principale, azioni_topic
+from es_benchmark import ServerBulkFinto, righe_base, scrivi_dati_sintetici, misura_serializzazione, manifest_simulato
+
+# Benchmark di 01_indexer.py e 02_indexer_topic.py senza un cluster: i documenti sono inviati a un endpoint
+# _bulk finto locale (vedi es_benchmark.py). Per ogni indice misura la serializzazione da sola e poi, per ogni
+# scenario e modalità, docs/s da un capo all'altro, documenti ritentati e falliti, richieste in volo.
+# I tempi includono il backoff dei tentativi (ES_RETRY_BACKOFF_S), come in un caricamento reale.
+# Ogni modalità passa da DeltaIncrementale come 01_indexer.py (manifest vuoto = ricostruzione completa). Alla fine
+# la verifica degli id ripetuti ricarica l'indice principale nell'ultimo scenario con il server che conserva i
+# documenti, e confronta lo stato finale con quello atteso (DeltaIncrementale.stato_finale).
+
+# --- CONFIGURAZIONE SPECIFICA ---
+COMMENTI_CSV = os.path.join(ROOT_DIR, "Topic_Modeling", "document_topics_it.csv")
+SENTIMENT_SINTETICO_CSV = os.path.join(ES_BENCHMARK_DIR, "sentiment_sintetico.csv")
+TOPIC_SINTETICO_CSV = os.path.join(ES_BENCHMARK_DIR, "topic_sintetico.csv")
+INDICE_BENCHMARK = "benchmark"
+
+# --- FUNZIONI ---
+def crea_azioni_per_indice():
+    """Generatori delle azioni bulk di ciascun indice, come negli indexer (nessuna partizione mensile)."""
+    return {
+        "principale": lambda indice: azioni_principale(SENTIMENT_SINTETICO_CSV, indice),
+        "topic": lambda indice: azioni_topic(leggi_a_blocchi(TOPIC_SINTETICO_CSV), indice)
+    }
+
+def esegui_modalita(url, modalita, crea_azioni, delta, dead_letter):
+    """Invia le azioni del delta nella modalità indicata; restituisce (successi, errori, dettagli della modalità)."""
+    azioni = delta.azioni(crea_azioni(INDICE_BENCHMARK), INDICE_BENCHMARK)
+    if modalita == "async":
+        async def carica():
+            es_async = connetti_async(url)
+            concorrenza = ConcorrenzaAdattiva()
+            try:
+                success, errors = await indicizza_documenti_async(es_async, azioni, concorrenza=concorrenza, dead_letter=dead_letter)
+            finally:
+                await es_async.close()
+            return success, errors, {"riduzioni_concorrenza": concorrenza.riduzioni, "picco_concorrenza": concorrenza.picco}
+        return asyncio.run(carica())
+
+    es = Elasticsearch(hosts=[url], http_compress=ES_HTTP_COMPRESS, connections_per_node=ES_CONNECTIONS_PER_NODE, request_timeout=ES_REQUEST_TIMEOUT)
+    try:
+        if modalita == "incrementale":
+            success, errors = indicizza_documenti(es, azioni, modalita=ES_BULK_MODE, dead_letter=dead_letter)
+            return success, errors, {"modalita_bulk": ES_BULK_MODE, **delta.conteggi}
+        success, errors = indicizza_documenti(es, azioni, modalita=modalita, dead_letter=dead_letter)
+        return success, errors, {}
+    finally:
+        es.close()
+
+def verifica_id_ripetuti(server, crea_azioni, precedenti, scenario):
+    """
+    Per ogni modalità: carica i documenti con il server che li conserva (partendo dai precedenti nella modalità
+    incrementale) e confronta lo stato finale del server con quello atteso. Restituisce l'esito per modalità.
+    """
+    esiti = {}
+    for modalita in ES_BENCHMARK_MODES:
+        server.imposta_scenario(**{k: v for k, v in scenario.items() if k != "nome"}, registra_documenti=True)
+        iniziali = precedenti if modalita == "incrementale" else {}
+        server.documenti.update({(INDICE_BENCHMARK, _id): h for _id, h in iniziali.items()})
+        delta = DeltaIncrementale(iniziali)
+        dead_letter = DeadLetter(f"{INDICE_BENCHMARK}_verifica", cartella=os.path.join(ES_BENCHMARK_DIR, "dead_letter"))
+        _, errors, _ = esegui_modalita(server.url, modalita, crea_azioni, delta, dead_letter)
+        dead_letter.chiudi()
+        atteso = {(INDICE_BENCHMARK, _id): h for _id, h in delta.stato_finale(errors).items()}
+        differenze = sum(1 for chiave in atteso.keys() | server.documenti.keys() if atteso.get(chiave) != server.documenti.get(chiave))
+        conflitti = sum(1 for info in errors if dettagli_errore(info).get("status") == 409)
+        esiti[modalita] = {"stato_finale_corretto": differenze == 0, "documenti_diversi": differenze, "errori": len(errors), "conflitti_409": conflitti}
+        print(f"  {modalita:<12} stato finale {'corretto' if differenze == 0 else 'ERRATO'}: {differenze} documenti diversi dall'atteso, "
+              f"{len(errors)} errori ({conflitti} conflitti 409).")
+    return esiti
+
+def riga_riepilogo(risultato):
+    s = risultato["server"]
+    return (f"{risultato['indice']:<10} {risultato['scenario']:<14} {risultato['modalita']:<12} {risultato['documenti_al_secondo']:>9.0f} doc/s  "
+            f"{risultato['successi']:>8} ok {risultato['falliti']:>6} falliti  429: {s['documenti_rifiutati_429']} doc / "
+            f"{s['richieste_rifiutate_429']} richieste  picco in volo {s['picco_richieste_in_volo']}")
+
+# --- FLUSSO PRINCIPALE ---
+if __name__ == "__main__":
+    os.makedirs(ES_BENCHMARK_DIR, exist_ok=True)
+    print("Preparazione dei dati sintetici del benchmark...")
+    base = righe_base(COMMENTI_CSV, SENTIMENT_BACKEND_SAMPLE_CSVS)
+    if base.empty:
+        print("ERRORE: nessun documento di partenza nei CSV inclusi nel repository.")
+        exit()
+    scrivi_dati_sintetici(base, ES_BENCHMARK_DOCS, SENTIMENT_SINTETICO_CSV, TOPIC_SINTETICO_CSV, quota_ripetuti=ES_BENCHMARK_DUPLICATE_RATIO)
+    print(f"  {ES_BENCHMARK_DOCS} documenti per indice ({ES_BENCHMARK_DUPLICATE_RATIO:.1%} con id ripetuto), replicati da {len(base)} documenti di partenza.")
+
+    server = ServerBulkFinto().avvia()
+    print(f"Endpoint _bulk finto in ascolto su {server.url}.")
+    report = {
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "documenti_per_indice": ES_BENCHMARK_DOCS,
+        "scenari": ES_BENCHMARK_SCENARIOS,
+        "serializzazione": {},
+        "risultati": [],
+        "verifica_id_ripetuti": {}
+    }
+    try:
+        for nome_indice, crea_azioni in crea_azioni_per_indice().items():
+            print(f"\n=== Indice '{nome_indice}' ===")
+            serializzazione, hash_per_id = misura_serializzazione(lambda: crea_azioni(INDICE_BENCHMARK))
+            report["serializzazione"][nome_indice] = serializzazione
+            print(f"Serializzazione: {serializzazione['documenti_al_secondo']:.0f} doc/s, {serializzazione['mb_al_secondo']:.1f} MB/s "
+                  f"({serializzazione['byte_medi_per_documento']:.0f} byte per documento).")
+            precedenti = manifest_simulato(hash_per_id, ES_BENCHMARK_INCREMENTAL_CHANGE_RATIO)
+
+            for scenario in ES_BENCHMARK_SCENARIOS:
+                for modalita in ES_BENCHMARK_MODES:
+                    print(f"\n--- {nome_indice} / scenario '{scenario['nome']}' / modalità '{modalita}' ---")
+                    server.imposta_scenario(**{k: v for k, v in scenario.items() if k != "nome"})
+                    dead_letter = DeadLetter(f"{INDICE_BENCHMARK}_{nome_indice}", cartella=os.path.join(ES_BENCHMARK_DIR, "dead_letter"))
+                    delta = DeltaIncrementale(precedenti if modalita == "incrementale" else {})
+                    inizio = time.perf_counter()
+                    success, errors, dettagli = esegui_modalita(server.url, modalita, crea_azioni, delta, dead_letter)
+                    durata = time.perf_counter() - inizio
+                    dead_letter.chiudi()
+                    risultato = {
+                        "indice": nome_indice,
+                        "scenario": scenario["nome"],
+                        "modalita": modalita,
+                        "secondi": round(durata, 3),
+                        "successi": success,
+                        "falliti": len(errors),
+                        "documenti_al_secondo": round((success + len(errors)) / max(durata, 1e-9), 1),
+                        "server": server.statistiche.istantanea(),
+                        **dettagli
+                    }
+                    report["risultati"].append(risultato)
+
+        print(f"\n=== Verifica degli id ripetuti (indice 'principale', scenario '{ES_BENCHMARK_SCENARIOS[-1]['nome']}') ===")
+        crea_principale = crea_azioni_per_indice()["principale"]
+        _, hash_per_id = misura_serializzazione(lambda: crea_principale(INDICE_BENCHMARK))
+        precedenti = manifest_simulato(hash_per_id, ES_BENCHMARK_INCREMENTAL_CHANGE_RATIO)
+        report["verifica_id_ripetuti"] = verifica_id_ripetuti(server, crea_principale, precedenti, ES_BENCHMARK_SCENARIOS[-1])
+    finally:
+        server.arresta()
+
+    print("\n--- Riepilogo ---")
+    for risultato in report["risultati"]:
+        print(riga_riepilogo(risultato))
+    percorso = os.path.join(ES_BENCHMARK_DIR, f"benchmark_indexer_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(percorso, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nReport del benchmark salvato in '{percorso}'.")
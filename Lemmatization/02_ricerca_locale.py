@@ -0,0 +1,81 @@
+import argparse
+import time
+
+# Importa le configurazioni dal file config.py
+from config import LOCAL_SEARCH_INPUT_CSV, LOCAL_SEARCH_DB
+from ricerca_locale import IndiceLocale, RAGGRUPPAMENTI, frase, righe_da_file
+
+# Indice full-text locale del file consolidato del preprocessing (vedi ricerca_locale.py), senza Elasticsearch.
+# Esempi:
+#   python 02_ricerca_locale.py aggiorna
+#   python 02_ricerca_locale.py conta zelensky --fonte Reddit_Commento --dal 2024-01 --al 2024-07
+#   python 02_ricerca_locale.py conta "accordo di pace" --frase --per mese
+#   python 02_ricerca_locale.py frequenze ukraine russia zelensky putin nato
+#   python 02_ricerca_locale.py esempi "nato AND putin" -n 5
+# Le espressioni seguono la sintassi MATCH di FTS5; con --frase il testo è cercato come frase esatta.
+
+# --- FUNZIONI ---
+def crea_parser():
+    parser = argparse.ArgumentParser(description="Ricerca full-text locale (SQLite FTS5) sui testi del preprocessing.")
+    parser.add_argument("--db", default=LOCAL_SEARCH_DB, help="File dell'indice (default: LOCAL_SEARCH_DB in config.py)")
+    comandi = parser.add_subparsers(dest="comando", required=True)
+
+    aggiorna = comandi.add_parser("aggiorna", help="Allinea l'indice al file consolidato (solo documenti nuovi, modificati o eliminati)")
+    aggiorna.add_argument("--input", default=LOCAL_SEARCH_INPUT_CSV, help="File consolidato, CSV o Parquet (default: LOCAL_SEARCH_INPUT_CSV)")
+
+    filtri = argparse.ArgumentParser(add_help=False)
+    filtri.add_argument("--fonte")
+    filtri.add_argument("--lingua")
+    filtri.add_argument("--dal", help="Data iniziale inclusa, ISO anche parziale (es. 2024-01)")
+    filtri.add_argument("--al", help="Data finale esclusa, ISO anche parziale (es. 2024-07)")
+
+    conta = comandi.add_parser("conta", parents=[filtri], help="Numero di documenti che corrispondono all'espressione")
+    conta.add_argument("espressione", nargs="?")
+    conta.add_argument("--frase", action="store_true", help="Cerca il testo come frase esatta")
+    conta.add_argument("--per", choices=list(RAGGRUPPAMENTI), help="Raggruppa i conteggi")
+
+    frequenze = comandi.add_parser("frequenze", parents=[filtri], help="Documenti che contengono ciascuna parola chiave")
+    frequenze.add_argument("parole", nargs="+")
+
+    esempi = comandi.add_parser("esempi", parents=[filtri], help="Documenti più pertinenti con un estratto del testo")
+    esempi.add_argument("espressione")
+    esempi.add_argument("--frase", action="store_true", help="Cerca il testo come frase esatta")
+    esempi.add_argument("-n", type=int, default=5)
+    return parser
+
+# --- BLOCCO DI ESECUZIONE PRINCIPALE ---
+if __name__ == "__main__":
+    args = crea_parser().parse_args()
+    indice = IndiceLocale(args.db)
+    try:
+        inizio = time.perf_counter()
+        if args.comando == "aggiorna":
+            print(f"Aggiornamento dell'indice '{args.db}' da '{args.input}'...")
+            conteggi = indice.aggiorna(righe_da_file(args.input))
+            if conteggi["creati"] + conteggi["aggiornati"] + conteggi["eliminati"]:
+                indice.ottimizza()
+            print(f"Indice aggiornato: {conteggi['creati']} creati, {conteggi['aggiornati']} aggiornati, "
+                  f"{conteggi['invariati']} invariati, {conteggi['eliminati']} eliminati ({indice.conta()} documenti).")
+        else:
+            filtri = {"fonte": args.fonte, "lingua": args.lingua, "dal": args.dal, "al": args.al}
+            espressione = getattr(args, "espressione", None)
+            if espressione and args.frase:
+                espressione = frase(espressione)
+            if args.comando == "conta" and args.per:
+                for gruppo, n in indice.conta_per(espressione, per=args.per, **filtri):
+                    print(f"  {gruppo if gruppo is not None else '(vuoto)':<30} {n:>8}")
+            elif args.comando == "conta":
+                print(f"{indice.conta(espressione, **filtri)} documenti.")
+            elif args.comando == "frequenze":
+                for parola, n in sorted(indice.frequenze(args.parole, **filtri).items(), key=lambda voce: -voce[1]):
+                    print(f"  - '{parola}': {n} documenti")
+            else:
+                for _id, fonte, data, estratto in indice.esempi(espressione, n=args.n, **filtri):
+                    print(f"  [{fonte}, {data}] {_id}: {estratto}")
+        print(f"({(time.perf_counter() - inizio) * 1000:.1f} ms)")
+    except FileNotFoundError as e:
+        print(f"ERRORE: File non trovato: {e.filename}.")
+    except Exception as e:
+        print(f"ERRORE: {e}")
+    finally:
+        indice.chiudi()
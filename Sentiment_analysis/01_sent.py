@@ -1,140 +1,195 @@
+import os
 import pandas as pd
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
-import torch
 import time
 
 # Importa le configurazioni dal file config.py
 from config import (
     SENTIMENT_ANALYSIS_INPUT_CSV,
     SENTIMENT_FINAL_CSV,
-    SENTIMENT_MODEL_NAME
+    SENTIMENT_MODEL_NAME,
+    SENTIMENT_MODELS_BY_LANGUAGE,
+    SENTIMENT_BACKEND,
+    SENTIMENT_LENGTH_MODE,
+    SENTIMENT_NUM_PROCESSES,
+    SENTIMENT_THREADS_PER_PROCESS,
+    SENTIMENT_CACHE_ENABLED,
+    SENTIMENT_PIPELINE_ENABLED,
+    SENTIMENT_CASCADE_ENABLED,
+    SENTIMENT_CASCADE_MODEL,
+    SENTIMENT_CASCADE_THRESHOLD,
+    SENTIMENT_CHECKPOINT_DIR,
+    SENTIMENT_CHECKPOINT_ROWS
 )
+from sentiment_engine import MotoreSentiment, COLONNE_RISULTATO, MODALITA_FINESTRE
+from sentiment_parallelo import PoolSentiment, calibra_processi_thread
+from sentiment_cache import CacheSentiment, AnalizzatoreConCache
+from sentiment_cascata import ClassificatorePrimoLivello, AnalizzatoreCascata
+from sentiment_checkpoint import CheckpointSentiment, COLONNA_POSIZIONE, impronta_input
 
 # --- CONFIGURAZIONE SPECIFICA (mantenuta qui o spostata se utile altrove) ---
 # Nomi delle colonne nel CSV
-COLONNA_TESTO_PER_SENTIMENT = "testo_pulito_base" 
+COLONNA_TESTO_PER_SENTIMENT = "testo_pulito_base"
 COLONNA_LINGUA = "lingua_rilevata"
-# Ora il nome del modello è importato da config.py
-MODEL_NAME = SENTIMENT_MODEL_NAME
+LINGUE_ANALIZZATE = ['en', 'it']
+ETICHETTA_NON_ANALIZZATO = "testo_mancante_o_lingua_non_analizzata"
+# Modello da usare per ogni lingua (da config.py); le lingue senza voce usano SENTIMENT_MODEL_NAME
+MODELLI_PER_LINGUA = {lingua: SENTIMENT_MODELS_BY_LANGUAGE.get(lingua, SENTIMENT_MODEL_NAME) for lingua in LINGUE_ANALIZZATE}
 
 MAX_ROWS_TO_PROCESS = None # Impostare un numero (es. 200) per testare, o a 0 (None) per processare tutto.
 
-# --- CARICAMENTO MODELLO E TOKENIZER (con selezione dispositivo corretta) ---
-print(f"Caricamento del modello e tokenizer: {MODEL_NAME}...")
-tokenizer = None
-model = None
-label_mapping = {}
-label_mapping_reverse = {}
-device = None
-
-try:
-    if torch.cuda.is_available():
-        device = torch.device("cuda")
-        print("Trovata GPU NVIDIA (CUDA). Verrà utilizzata questa.")
-    elif torch.backends.mps.is_available():
-        device = torch.device("mps")
-        print("Trovata GPU Apple (MPS). Verrà utilizzata questa.")
-    else:
-        device = torch.device("cpu")
-        print("Nessuna GPU compatibile trovata. Verrà utilizzata la CPU (più lento).")
-    
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
-    
-    model.to(device)
-    model.eval()
-
-    print(f"Modello spostato su dispositivo: {device}")
-    
-    label_mapping = model.config.id2label
-    label_mapping_reverse = {v.lower(): k for k, v in label_mapping.items()}
-    print(f"Mapping delle etichette del modello: {label_mapping}")
-
-except Exception as e:
-    print(f"ERRORE GRAVE durante il caricamento del modello: {e}")
-
-# --- FUNZIONE DI ANALISI SENTIMENT (con troncamento e gestione dispositivo) ---
-def analizza_sentiment_testo_esplicito(text, tokenizer, model, device, label_map, label_map_reverse):
+# --- FUNZIONI ---
+def maschera_testi_analizzabili(df):
+    """Righe con testo non vuoto in una delle lingue supportate."""
+    testi = df[COLONNA_TESTO_PER_SENTIMENT]
+    testo_valido = testi.map(lambda t: isinstance(t, str) and bool(t.strip()))
+    return testo_valido & df[COLONNA_LINGUA].isin(LINGUE_ANALIZZATE)
+
+def risultati_vuoti(index):
+    """DataFrame dei risultati con tutte le righe marcate come non analizzate."""
+    risultati = pd.DataFrame(index=index, columns=COLONNE_RISULTATO)
+    risultati['sentiment_label'] = ETICHETTA_NON_ANALIZZATO
+    risultati[COLONNE_RISULTATO[1:]] = risultati[COLONNE_RISULTATO[1:]].astype(float)
+    return risultati
+
+def crea_analizzatore(model_name, testi):
     """
-    Analizza il sentiment usando tokenizzazione esplicita con troncamento.
+    Processo singolo (SENTIMENT_NUM_PROCESSES = 1) oppure pool di processi worker;
+    con "auto" la combinazione processi x thread è scelta calibrando su un campione dei testi.
     """
-    if not text or not isinstance(text, str) or not text.strip():
-        return "nessun_testo", None, None, None
-
-    try:
-        inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=512)
-        
-        inputs = {k: v.to(device) for k, v in inputs.items()}
-
-        with torch.no_grad():
-            logits = model(**inputs).logits
-
-        scores = torch.nn.functional.softmax(logits, dim=1)[0]
-        
-        predicted_class_id = torch.argmax(scores).item()
-        sentiment_label = label_map.get(predicted_class_id, "sconosciuto")
-
-        score_negative = scores[label_map_reverse.get('negative', 0)].item()
-        score_neutral = scores[label_map_reverse.get('neutral', 1)].item()
-        score_positive = scores[label_map_reverse.get('positive', 2)].item()
-
-        return sentiment_label, score_positive, score_negative, score_neutral
-            
-    except Exception as e:
-        print(f"    ERRORE durante l'analisi del sentiment per il testo: '{text[:70]}...'. Errore: {e.__class__.__name__} - {e}")
-        return "errore_generico_analisi", None, None, None
+    if SENTIMENT_NUM_PROCESSES == 1:
+        return MotoreSentiment(model_name)
+    if SENTIMENT_NUM_PROCESSES == "auto":
+        # la calibrazione restituisce il pool già ridimensionato alla configurazione migliore
+        return calibra_processi_thread(testi, model_name)
+    num_processi = SENTIMENT_NUM_PROCESSES
+    num_thread = SENTIMENT_THREADS_PER_PROCESS or max(1, (os.cpu_count() or 1) // num_processi)
+    return PoolSentiment(model_name, num_processi, num_thread)
+
+def carica_primo_livello(model_name):
+    """Classificatore di primo livello della cascata, se addestrato per il modello indicato."""
+    if not os.path.exists(SENTIMENT_CASCADE_MODEL):
+        print(f"AVVISO: primo livello della cascata non trovato in '{SENTIMENT_CASCADE_MODEL}' "
+              f"(eseguire 03_addestra_cascata.py). Si prosegue con il solo transformer.")
+        return None
+    primo_livello = ClassificatorePrimoLivello.carica(SENTIMENT_CASCADE_MODEL)
+    if primo_livello.model_name != model_name:
+        print(f"AVVISO: il primo livello della cascata è distillato da '{primo_livello.model_name}', non da '{model_name}'. "
+              f"Per questo modello si prosegue con il solo transformer.")
+        return None
+    return primo_livello
+
+def prepara_analizzatore(model_name, testi):
+    """
+    Crea il modello (o il pool) e, se abilitati, lo avvolge con la cache dei risultati e con la cascata.
+    Restituisce (modello, analizzatore con cache o None, analizzatore da usare).
+    """
+    modello = crea_analizzatore(model_name, testi)
+    analizzatore = modello
+    con_cache = None
+    if SENTIMENT_CACHE_ENABLED:
+        # backend e modalità finestre cambiano i risultati: la variante entra nella chiave del modello
+        chiave_modello = f"{model_name}#{modello.variante_cache}" if modello.variante_cache else model_name
+        con_cache = AnalizzatoreConCache(modello, CacheSentiment(chiave_modello, modello.revisione, modello.max_length))
+        analizzatore = con_cache
+    if SENTIMENT_CASCADE_ENABLED:
+        # la cascata sta fuori dalla cache: in cache finiscono solo risultati del transformer
+        primo_livello = carica_primo_livello(model_name)
+        if primo_livello is not None:
+            analizzatore = AnalizzatoreCascata(analizzatore, primo_livello)
+    return modello, con_cache, analizzatore
+
+def analizza_blocco(df, ottieni_analizzatore):
+    """
+    Aggiunge le colonne di sentiment a un blocco di righe (già privo di testi mancanti).
+    Le righe sono raggruppate per modello (lingue con lo stesso modello condividono i batch);
+    ottieni_analizzatore(model_name, testi) restituisce l'analizzatore, creandolo al primo uso.
+    """
+    analizzabili = maschera_testi_analizzabili(df)
+    results_df = risultati_vuoti(df.index)
+    modello_riga = df[COLONNA_LINGUA].map(MODELLI_PER_LINGUA)
+    for model_name in dict.fromkeys(modello_riga[analizzabili]):
+        righe = analizzabili & (modello_riga == model_name)
+        testi = df.loc[righe, COLONNA_TESTO_PER_SENTIMENT].tolist()
+        risultati = ottieni_analizzatore(model_name, testi).analizza_testi(testi)
+        for colonna in COLONNE_RISULTATO:
+            results_df.loc[righe, colonna] = risultati[colonna].values
+    return pd.concat([df, results_df], axis=1)
 
 # --- FLUSSO PRINCIPALE DELLO SCRIPT ---
 if __name__ == "__main__":
-    if not tokenizer or not model:
-        print("Tokenizer o modello non caricati correttamente. Uscita dallo script.")
-        exit()
-
-    print(f"\nCaricamento dati da: {SENTIMENT_ANALYSIS_INPUT_CSV}")
+    print(f"\nCaricamento dati da: {SENTIMENT_ANALYSIS_INPUT_CSV} (blocchi da {SENTIMENT_CHECKPOINT_ROWS} righe)")
+    if MAX_ROWS_TO_PROCESS:
+        print(f"Processo limitato alle prime {MAX_ROWS_TO_PROCESS} righe per test.")
     try:
-        df = pd.read_csv(SENTIMENT_ANALYSIS_INPUT_CSV, low_memory=False)
-        if MAX_ROWS_TO_PROCESS:
-            print(f"Processo limitato alle prime {MAX_ROWS_TO_PROCESS} righe per test.")
-            df = df.head(MAX_ROWS_TO_PROCESS)
-        print(f"Caricate {len(df)} righe per l'analisi del sentiment.")
+        checkpoint = CheckpointSentiment(
+            SENTIMENT_CHECKPOINT_DIR,
+            impronta_input(
+                SENTIMENT_ANALYSIS_INPUT_CSV, righe_per_blocco=SENTIMENT_CHECKPOINT_ROWS, max_righe=MAX_ROWS_TO_PROCESS,
+                modelli=MODELLI_PER_LINGUA, backend=SENTIMENT_BACKEND, modalita_lunghezza=SENTIMENT_LENGTH_MODE,
+                soglia_cascata=SENTIMENT_CASCADE_THRESHOLD if SENTIMENT_CASCADE_ENABLED else None
+            )
+        )
+        # l'input è letto a blocchi: la memoria non cresce con la dimensione del corpus
+        lettore = pd.read_csv(SENTIMENT_ANALYSIS_INPUT_CSV, low_memory=False, chunksize=SENTIMENT_CHECKPOINT_ROWS, nrows=MAX_ROWS_TO_PROCESS or None)
     except FileNotFoundError:
         print(f"ERRORE: File '{SENTIMENT_ANALYSIS_INPUT_CSV}' non trovato.")
         exit()
 
-    df.dropna(subset=[COLONNA_TESTO_PER_SENTIMENT], inplace=True)
-
-    results = []
-    processed_count = 0
     start_time = time.time()
     print(f"\nInizio analisi del sentiment sulla colonna '{COLONNA_TESTO_PER_SENTIMENT}'...")
-    
-    for index, riga in df.iterrows():
-        testo = riga.get(COLONNA_TESTO_PER_SENTIMENT)
-        
-        if riga.get(COLONNA_LINGUA) in ['en', 'it'] and isinstance(testo, str) and testo.strip():
-            label, score_p, score_n, score_u = analizza_sentiment_testo_esplicito(testo, tokenizer, model, device, label_mapping, label_mapping_reverse)
-        else:
-            label, score_p, score_n, score_u = "testo_mancante_o_lingua_non_analizzata", None, None, None
-            
-        results.append({
-            'sentiment_label': label,
-            'sentiment_score_positive': score_p,
-            'sentiment_score_negative': score_n,
-            'sentiment_score_neutral': score_u
-        })
-        
-        processed_count += 1
-        if processed_count % 100 == 0:
-            elapsed_time = time.time() - start_time
-            print(f"  Analizzati {processed_count}/{len(df)} documenti... (Tempo trascorso: {elapsed_time:.2f} secondi)")
-
-    results_df = pd.DataFrame(results, index=df.index)
-    df_final = pd.concat([df, results_df], axis=1)
-
-    print(f"\nAnalisi del sentiment completata per {processed_count} documenti.")
-    
+
+    print(f"Modelli per lingua: {MODELLI_PER_LINGUA}")
+
+    # un modello viene caricato solo al primo blocco che contiene una delle sue lingue
+    analizzatori = {} # model_name -> (modello, analizzatore con cache o None, analizzatore da usare)
+    def ottieni_analizzatore(model_name, testi):
+        if model_name not in analizzatori:
+            try:
+                # con SENTIMENT_NUM_PROCESSES = "auto" la calibrazione usa i primi testi da analizzare con questo modello
+                analizzatori[model_name] = prepara_analizzatore(model_name, testi)
+            except Exception as e:
+                print(f"ERRORE GRAVE durante il caricamento del modello '{model_name}': {e}")
+                print("Tokenizer o modello non caricati correttamente. Uscita dallo script.")
+                exit()
+        return analizzatori[model_name][2]
+
+    righe_lette = 0
+    righe_gia_completate = 0
+    for blocco in lettore:
+        righe_lette += len(blocco)
+        blocco[COLONNA_POSIZIONE] = blocco.index
+        da_analizzare = checkpoint.da_analizzare(blocco)
+        righe_gia_completate += len(blocco) - len(da_analizzare)
+        if da_analizzare.empty:
+            continue
+        da_analizzare = da_analizzare.dropna(subset=[COLONNA_TESTO_PER_SENTIMENT])
+
+        checkpoint.salva_shard(analizza_blocco(da_analizzare, ottieni_analizzatore))
+        elapsed_time = time.time() - start_time
+        print(f"Checkpoint salvato: {righe_lette} righe lette. (Tempo trascorso: {elapsed_time:.2f} secondi)")
+
+    if righe_gia_completate:
+        print(f"Righe già analizzate in un'esecuzione precedente e saltate: {righe_gia_completate}")
+    for model_name, (modello, con_cache, analizzatore) in analizzatori.items():
+        print(f"\nRiepilogo per il modello '{model_name}':")
+        if isinstance(analizzatore, AnalizzatoreCascata):
+            print(analizzatore.riepilogo())
+        if con_cache is not None:
+            print(con_cache.riepilogo())
+            con_cache.cache.chiudi()
+        if modello.modalita_lunghezza == MODALITA_FINESTRE:
+            print(modello.riepilogo_finestre())
+        if SENTIMENT_PIPELINE_ENABLED:
+            print(modello.riepilogo_pipeline())
+        if isinstance(modello, PoolSentiment):
+            modello.chiudi()
+
+    elapsed_time = time.time() - start_time
+    print(f"\nAnalisi del sentiment completata per {righe_lette} righe in {elapsed_time:.2f} secondi.")
+
     try:
-        df_final.to_csv(SENTIMENT_FINAL_CSV, index=False, encoding='utf-8')
-        print(f"Dati con sentiment salvati in '{SENTIMENT_FINAL_CSV}'")
+        righe_salvate = checkpoint.unisci_shard(SENTIMENT_FINAL_CSV)
+        print(f"Dati con sentiment ({righe_salvate} righe) salvati in '{SENTIMENT_FINAL_CSV}'")
+        checkpoint.elimina()
     except IOError as e:
-        print(f"Errore durante il salvataggio del file CSV con sentiment: {e}")
\ No newline at end of file
+        print(f"Errore durante il salvataggio del file CSV con sentiment: {e}")
@@ -0,0 +1,80 @@
+import json
+import time
+
+import numpy as np
+
+# Importa le configurazioni dal file config.py
+from config import (
+    SENTIMENT_MODEL_NAME,
+    SENTIMENT_BACKEND_SAMPLE_CSVS,
+    SENTIMENT_BACKEND_SAMPLE_SIZE,
+    SENTIMENT_BACKEND_MIN_AGREEMENT,
+    SENTIMENT_BACKEND_REPORT_JSON
+)
+from sentiment_backend import BACKEND_DISPONIBILI, BACKEND_FP32
+from sentiment_engine import MotoreSentiment, COLONNE_RISULTATO
+from sentiment_benchmark import carica_campione_articoli
+
+# --- FUNZIONI ---
+def misura_backend(backend, testi):
+    """Carica il modello con il backend indicato e misura il throughput sul campione."""
+    motore = MotoreSentiment(SENTIMENT_MODEL_NAME, backend=backend)
+    motore.analizza_testi(testi[:min(16, len(testi))], ogni_n_documenti=10**9) # riscaldamento
+    inizio = time.perf_counter()
+    risultati = motore.analizza_testi(testi, ogni_n_documenti=10**9)
+    durata = time.perf_counter() - inizio
+    return risultati, durata
+
+def confronta_con_riferimento(risultati, riferimento):
+    """Concordanza delle etichette e scarto assoluto degli score rispetto al backend di riferimento (fp32)."""
+    scarti = np.abs(risultati[COLONNE_RISULTATO[1:]].to_numpy(dtype=float) - riferimento[COLONNE_RISULTATO[1:]].to_numpy(dtype=float))
+    return {
+        "concordanza_etichette": float((risultati['sentiment_label'] == riferimento['sentiment_label']).mean()),
+        "scarto_medio_score": float(np.nanmean(scarti)),
+        "scarto_massimo_score": float(np.nanmax(scarti))
+    }
+
+# --- FLUSSO PRINCIPALE ---
+if __name__ == "__main__":
+    print("Caricamento del campione di articoli per il confronto dei backend...")
+    testi = carica_campione_articoli(SENTIMENT_BACKEND_SAMPLE_CSVS, SENTIMENT_BACKEND_SAMPLE_SIZE)
+    if not testi:
+        print("ERRORE: nessun articolo disponibile per il confronto. Uscita dallo script.")
+        exit()
+    print(f"Campione di {len(testi)} articoli.")
+
+    report = {"modello": SENTIMENT_MODEL_NAME, "documenti": len(testi), "backend": {}}
+    riferimento = None
+    # fp32 per primo: è il riferimento per l'accuratezza
+    for backend in [BACKEND_FP32] + [b for b in BACKEND_DISPONIBILI if b != BACKEND_FP32]:
+        print(f"\n--- Backend: {backend} ---")
+        try:
+            risultati, durata = misura_backend(backend, testi)
+        except Exception as e:
+            print(f"  ERRORE: backend '{backend}' non disponibile: {e}")
+            report["backend"][backend] = {"errore": str(e)}
+            continue
+
+        voce = {"secondi": round(durata, 3), "documenti_al_secondo": round(len(testi) / durata, 2)}
+        if riferimento is None:
+            riferimento = risultati
+        else:
+            voce.update(confronta_con_riferimento(risultati, riferimento))
+            voce["accuratezza_ok"] = voce["concordanza_etichette"] >= SENTIMENT_BACKEND_MIN_AGREEMENT
+        report["backend"][backend] = voce
+        print(f"  {voce}")
+
+    print("\n--- Riepilogo ---")
+    velocita_fp32 = report["backend"].get(BACKEND_FP32, {}).get("documenti_al_secondo")
+    for backend, voce in report["backend"].items():
+        if "errore" in voce:
+            print(f"  {backend:<14} non disponibile")
+            continue
+        speedup = f"x{voce['documenti_al_secondo'] / velocita_fp32:.2f}" if velocita_fp32 else "-"
+        concordanza = f"{voce['concordanza_etichette']:.2%}" if "concordanza_etichette" in voce else "riferimento"
+        esito = "" if "accuratezza_ok" not in voce else (" OK" if voce["accuratezza_ok"] else f" ATTENZIONE: sotto la soglia {SENTIMENT_BACKEND_MIN_AGREEMENT:.0%}")
+        print(f"  {backend:<14} {voce['documenti_al_secondo']:>8.2f} doc/s  {speedup:>6}  concordanza: {concordanza}{esito}")
+
+    with open(SENTIMENT_BACKEND_REPORT_JSON, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport salvato in '{SENTIMENT_BACKEND_REPORT_JSON}'")
@@ -0,0 +1,104 @@
+import json
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+# Importa le configurazioni dal file config.py
+from config import (
+    SENTIMENT_ANALYSIS_INPUT_CSV,
+    SENTIMENT_MODEL_NAME,
+    SENTIMENT_MODELS_BY_LANGUAGE,
+    SENTIMENT_CACHE_ENABLED,
+    SENTIMENT_CASCADE_MODEL,
+    SENTIMENT_CASCADE_THRESHOLD,
+    SENTIMENT_CASCADE_TRAIN_DOCS,
+    SENTIMENT_CASCADE_REPORT_JSON
+)
+from sentiment_engine import MotoreSentiment
+from sentiment_cache import CacheSentiment, AnalizzatoreConCache
+from sentiment_cascata import ClassificatorePrimoLivello, concordanza_cascata, RANDOM_STATE
+
+# --- CONFIGURAZIONE SPECIFICA ---
+COLONNA_TESTO_PER_SENTIMENT = "testo_pulito_base"
+COLONNA_LINGUA = "lingua_rilevata"
+LINGUE_ANALIZZATE = ['en', 'it']
+# il primo livello serve solo le lingue analizzate con SENTIMENT_MODEL_NAME (vedi carica_primo_livello in 01_sent.py)
+LINGUE_DEL_MODELLO = [l for l in LINGUE_ANALIZZATE if SENTIMENT_MODELS_BY_LANGUAGE.get(l, SENTIMENT_MODEL_NAME) == SENTIMENT_MODEL_NAME]
+ETICHETTE_VALIDE = ['negative', 'neutral', 'positive']
+SOGLIE_VALUTATE = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.97, 0.99]
+FRAZIONE_VALIDAZIONE = 0.2
+
+# --- FUNZIONI ---
+def carica_testi(percorso):
+    """Testi analizzabili (lingua servita da SENTIMENT_MODEL_NAME, testo non vuoto) del CSV indicato."""
+    df = pd.read_csv(percorso, low_memory=False)
+    df = df[df[COLONNA_LINGUA].isin(LINGUE_DEL_MODELLO)].dropna(subset=[COLONNA_TESTO_PER_SENTIMENT])
+    return df[df[COLONNA_TESTO_PER_SENTIMENT].str.strip() != ""]
+
+def etichette_del_transformer():
+    """
+    Etichette del transformer da distillare, calcolate sempre da SENTIMENT_MODEL_NAME su un campione
+    dell'input: SENTIMENT_FINAL_CSV può contenere etichette del primo livello (esecuzioni con la cascata)
+    o di altri modelli per lingua. Con la cache dei risultati i testi già analizzati da 01_sent.py non
+    passano di nuovo dal transformer.
+    """
+    print(f"Etichettatura di un campione di '{SENTIMENT_ANALYSIS_INPUT_CSV}' con il transformer '{SENTIMENT_MODEL_NAME}' "
+          f"(lingue: {', '.join(LINGUE_DEL_MODELLO)}).")
+    df = carica_testi(SENTIMENT_ANALYSIS_INPUT_CSV)
+    if len(df) > SENTIMENT_CASCADE_TRAIN_DOCS:
+        df = df.sample(n=SENTIMENT_CASCADE_TRAIN_DOCS, random_state=RANDOM_STATE)
+    testi = df[COLONNA_TESTO_PER_SENTIMENT].tolist()
+    analizzatore = MotoreSentiment(SENTIMENT_MODEL_NAME)
+    if SENTIMENT_CACHE_ENABLED:
+        chiave_modello = f"{SENTIMENT_MODEL_NAME}#{analizzatore.variante_cache}" if analizzatore.variante_cache else SENTIMENT_MODEL_NAME
+        analizzatore = AnalizzatoreConCache(analizzatore, CacheSentiment(chiave_modello, analizzatore.revisione, analizzatore.max_length))
+    risultati = analizzatore.analizza_testi(testi)
+    valide = risultati['sentiment_label'].str.lower().isin(ETICHETTE_VALIDE).to_numpy()
+    return [t for t, v in zip(testi, valide) if v], risultati.loc[valide, 'sentiment_label'].tolist()
+
+# --- FLUSSO PRINCIPALE ---
+if __name__ == "__main__":
+    try:
+        testi, etichette = etichette_del_transformer()
+    except FileNotFoundError as e:
+        print(f"ERRORE: {e}")
+        exit()
+    print(f"Documenti etichettati disponibili: {len(testi)}")
+    if len(testi) < 100:
+        print("ERRORE: troppo pochi documenti per addestrare il primo livello della cascata.")
+        exit()
+
+    testi_train, testi_val, etichette_train, etichette_val = train_test_split(
+        testi, etichette, test_size=FRAZIONE_VALIDAZIONE, random_state=RANDOM_STATE, stratify=etichette
+    )
+    print(f"Addestramento del primo livello su {len(testi_train)} documenti (validazione su {len(testi_val)})...")
+    primo_livello = ClassificatorePrimoLivello(SENTIMENT_MODEL_NAME).addestra(testi_train, etichette_train)
+
+    probabilita = primo_livello.probabilita(testi_val)
+    etichette_primo = primo_livello.etichette[probabilita.argmax(axis=1)]
+    confidenza = probabilita.max(axis=1)
+    etichette_val = np.asarray(etichette_val, dtype=object)
+
+    print(f"\nConcordanza del solo primo livello con il transformer: {(etichette_primo == etichette_val).mean():.1%}")
+    print(f"{'soglia':>8} {'inviati al transformer':>24} {'concordanza':>12}")
+    report_soglie = []
+    for soglia in SOGLIE_VALUTATE:
+        quota_escalati, concordanza = concordanza_cascata(etichette_primo, confidenza, etichette_val, soglia)
+        report_soglie.append({"soglia": soglia, "quota_escalati": quota_escalati, "concordanza": concordanza})
+        marcatore = "  <- SENTIMENT_CASCADE_THRESHOLD" if soglia == SENTIMENT_CASCADE_THRESHOLD else ""
+        print(f"{soglia:>8} {quota_escalati:>24.1%} {concordanza:>12.1%}{marcatore}")
+
+    primo_livello.salva(SENTIMENT_CASCADE_MODEL)
+    print(f"\nPrimo livello salvato in '{SENTIMENT_CASCADE_MODEL}'.")
+
+    report = {
+        "modello_transformer": SENTIMENT_MODEL_NAME,
+        "documenti_addestramento": len(testi_train),
+        "documenti_validazione": len(testi_val),
+        "concordanza_primo_livello": float((etichette_primo == etichette_val).mean()),
+        "soglie": report_soglie
+    }
+    with open(SENTIMENT_CASCADE_REPORT_JSON, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Report dell'addestramento salvato in '{SENTIMENT_CASCADE_REPORT_JSON}'.")
@@ -0,0 +1,46 @@
+import asyncio
+
+# Importa le configurazioni dal file config.py
+from config import (
+    SENTIMENT_MODEL_NAME,
+    SENTIMENT_MODELS_BY_LANGUAGE,
+    SENTIMENT_SERVER_HOST,
+    SENTIMENT_SERVER_PORT,
+    SENTIMENT_SERVER_MAX_BATCH,
+    SENTIMENT_SERVER_MAX_WAIT_MS
+)
+from sentiment_engine import MotoreSentiment
+from sentiment_server import ServerSentiment
+
+# --- CONFIGURAZIONE SPECIFICA ---
+LINGUE_ANALIZZATE = ['en', 'it']
+LINGUA_DEFAULT = 'en' # Usata per le richieste senza "lingua"
+MODELLI_PER_LINGUA = {lingua: SENTIMENT_MODELS_BY_LANGUAGE.get(lingua, SENTIMENT_MODEL_NAME) for lingua in LINGUE_ANALIZZATE}
+
+# --- FUNZIONI ---
+def carica_modelli():
+    """
+    Carica una volta ciascun modello usato dalle lingue supportate. La pipeline di prefetch
+    è disattivata: con micro-batch di poche decine di testi il thread produttore non conviene.
+    """
+    modelli = {}
+    for model_name in dict.fromkeys(MODELLI_PER_LINGUA.values()):
+        modelli[model_name] = MotoreSentiment(model_name, pipeline=False)
+        modelli[model_name].analizza_testi(["riscaldamento del modello"] * 4, ogni_n_documenti=10**9)
+    return {lingua: modelli[model_name] for lingua, model_name in MODELLI_PER_LINGUA.items()}
+
+# --- FLUSSO PRINCIPALE ---
+if __name__ == "__main__":
+    print(f"Modelli per lingua: {MODELLI_PER_LINGUA}")
+    try:
+        analizzatori_per_lingua = carica_modelli()
+    except Exception as e:
+        print(f"ERRORE GRAVE durante il caricamento del modello: {e}")
+        exit()
+
+    server = ServerSentiment(analizzatori_per_lingua, LINGUA_DEFAULT, SENTIMENT_SERVER_MAX_BATCH, SENTIMENT_SERVER_MAX_WAIT_MS)
+    print(f"Micro-batch: al massimo {SENTIMENT_SERVER_MAX_BATCH} testi, attesa massima {SENTIMENT_SERVER_MAX_WAIT_MS} ms.")
+    try:
+        asyncio.run(server.esegui(SENTIMENT_SERVER_HOST, SENTIMENT_SERVER_PORT))
+    except KeyboardInterrupt:
+        print("\nServer arrestato.")
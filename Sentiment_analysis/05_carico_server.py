@@ -0,0 +1,87 @@
+import asyncio
+import json
+import random
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+# Importa le configurazioni dal file config.py
+from config import (
+    SENTIMENT_SERVER_HOST,
+    SENTIMENT_SERVER_PORT,
+    SENTIMENT_BACKEND_SAMPLE_CSVS
+)
+from sentiment_server import componi_messaggio_http, leggi_messaggio_http
+
+# --- CONFIGURAZIONE SPECIFICA ---
+NUM_CLIENT = 32 # Connessioni concorrenti, ognuna invia una richiesta alla volta
+DURATA_S = 30
+TESTI_PER_RICHIESTA = 1
+COLONNA_TESTO_ARTICOLI = "testo_articolo"
+RANDOM_STATE = 42
+
+# --- FUNZIONI ---
+def carica_testi_brevi(percorsi_csv):
+    """Frasi degli articoli inclusi nel repository, come sostituto dei messaggi brevi di Telegram e Reddit."""
+    frasi = []
+    for percorso in percorsi_csv:
+        try:
+            df = pd.read_csv(percorso, usecols=[COLONNA_TESTO_ARTICOLI], low_memory=False)
+        except (FileNotFoundError, ValueError):
+            print(f"  AVVISO: file '{percorso}' non trovato o senza colonna '{COLONNA_TESTO_ARTICOLI}', escluso.")
+            continue
+        for testo in df[COLONNA_TESTO_ARTICOLI].dropna().astype(str):
+            frasi.extend(f for f in re.split(r"(?<=[.!?])\s+", testo) if len(f.split()) >= 4)
+    return frasi or ["The situation in the region remains tense after the latest attacks."]
+
+async def richiesta(reader, writer, metodo, percorso, corpo=None):
+    writer.write(componi_messaggio_http(f"{metodo} {percorso} HTTP/1.1", corpo or {}, {"Host": f"{SENTIMENT_SERVER_HOST}:{SENTIMENT_SERVER_PORT}"}))
+    await writer.drain()
+    riga, _, risposta = await leggi_messaggio_http(reader)
+    return int(riga.split(" ")[1]), json.loads(risposta)
+
+async def client(testi, scadenza, latenze, errori, rng):
+    reader, writer = await asyncio.open_connection(SENTIMENT_SERVER_HOST, SENTIMENT_SERVER_PORT)
+    try:
+        while time.perf_counter() < scadenza:
+            corpo = {"testi": rng.sample(testi, TESTI_PER_RICHIESTA)}
+            inizio = time.perf_counter()
+            stato, _ = await richiesta(reader, writer, "POST", "/analizza", corpo)
+            if stato == 200:
+                latenze.append((time.perf_counter() - inizio) * 1000)
+            else:
+                errori.append(stato)
+    finally:
+        writer.close()
+
+async def esegui_carico(testi):
+    latenze, errori = [], []
+    inizio = time.perf_counter()
+    scadenza = inizio + DURATA_S
+    await asyncio.gather(*(client(testi, scadenza, latenze, errori, random.Random(RANDOM_STATE + i)) for i in range(NUM_CLIENT)))
+    durata = time.perf_counter() - inizio
+
+    reader, writer = await asyncio.open_connection(SENTIMENT_SERVER_HOST, SENTIMENT_SERVER_PORT)
+    _, metriche = await richiesta(reader, writer, "GET", "/metriche")
+    writer.close()
+    return latenze, errori, durata, metriche
+
+# --- FLUSSO PRINCIPALE ---
+if __name__ == "__main__":
+    testi = carica_testi_brevi(SENTIMENT_BACKEND_SAMPLE_CSVS)
+    print(f"Generatore di carico: {NUM_CLIENT} client per {DURATA_S} s, {TESTI_PER_RICHIESTA} testi per richiesta ({len(testi)} testi disponibili).")
+    try:
+        latenze, errori, durata, metriche = asyncio.run(esegui_carico(testi))
+    except ConnectionError as e:
+        print(f"ERRORE: impossibile connettersi al server su {SENTIMENT_SERVER_HOST}:{SENTIMENT_SERVER_PORT} (avviare 04_server_sentiment.py). {e}")
+        exit()
+
+    print(f"\nRichieste completate: {len(latenze)} ({len(latenze) / durata:.1f} richieste/s, "
+          f"{len(latenze) * TESTI_PER_RICHIESTA / durata:.1f} testi/s), errori: {len(errori)}")
+    if latenze:
+        print(f"Latenza lato client (ms): p50 {np.percentile(latenze, 50):.1f}, p95 {np.percentile(latenze, 95):.1f}, "
+              f"p99 {np.percentile(latenze, 99):.1f}, max {max(latenze):.1f}")
+    print("\nMetriche del server:")
+    print(json.dumps(metriche, indent=2, ensure_ascii=False))
@@ -0,0 +1,107 @@
+import itertools
+import json
+import os
+import platform
+import subprocess
+import time
+
+# Importa le configurazioni dal file config.py
+from config import (
+    ROOT_DIR,
+    SENTIMENT_MODEL_NAME,
+    SENTIMENT_BACKEND_SAMPLE_CSVS,
+    SENTIMENT_BENCHMARK_BACKENDS,
+    SENTIMENT_BENCHMARK_BATCH_SIZES,
+    SENTIMENT_BENCHMARK_THREADS,
+    SENTIMENT_BENCHMARK_LENGTH_MODES,
+    SENTIMENT_BENCHMARK_ARTICLES,
+    SENTIMENT_BENCHMARK_SYNTH_DOCS,
+    SENTIMENT_BENCHMARK_SYNTH_MEDIAN_WORDS,
+    SENTIMENT_BENCHMARK_SYNTH_SIGMA,
+    SENTIMENT_BENCHMARK_DIR
+)
+from sentiment_benchmark import (
+    carica_campione_articoli,
+    genera_corpus_sintetico,
+    vocabolario_da_testi,
+    descrivi_corpus,
+    misura_in_processo_separato
+)
+
+# --- FUNZIONI ---
+def commit_corrente():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def versioni_librerie():
+    versioni = {}
+    for nome in ("torch", "transformers", "onnxruntime"):
+        try:
+            versioni[nome] = __import__(nome).__version__
+        except ImportError:
+            versioni[nome] = None
+    return versioni
+
+def configurazioni():
+    """Prodotto cartesiano di backend, batch size, thread e modalità di lunghezza."""
+    for backend, batch_size, thread, modalita in itertools.product(
+        SENTIMENT_BENCHMARK_BACKENDS, SENTIMENT_BENCHMARK_BATCH_SIZES, SENTIMENT_BENCHMARK_THREADS, SENTIMENT_BENCHMARK_LENGTH_MODES
+    ):
+        yield {"backend": backend, "batch_size": batch_size, "thread": thread, "modalita_lunghezza": modalita}
+
+def riga_riepilogo(risultato, nome_corpus):
+    prefisso = f"{risultato['backend']:>13} bs={risultato['batch_size']:<4} thr={risultato['thread']:<3} {risultato['modalita_lunghezza']:<12}"
+    if "errore" in risultato:
+        return f"{prefisso} ERRORE {risultato['errore']}"
+    misura = risultato["corpora"][nome_corpus]
+    latenze = misura["latenza_batch_ms"]
+    return (f"{prefisso} {misura['documenti_al_secondo']:>9.1f} doc/s {misura['token_al_secondo']:>10.0f} tok/s "
+            f"p50/p95/p99 {latenze.get('p50', 0):.0f}/{latenze.get('p95', 0):.0f}/{latenze.get('p99', 0):.0f} ms "
+            f"RSS {risultato['picco_rss_mb']} MB")
+
+# --- FLUSSO PRINCIPALE ---
+if __name__ == "__main__":
+    print("Preparazione dei corpora del benchmark...")
+    articoli = carica_campione_articoli(SENTIMENT_BACKEND_SAMPLE_CSVS, SENTIMENT_BENCHMARK_ARTICLES)
+    corpora = {
+        "articoli": articoli,
+        "sintetico": genera_corpus_sintetico(
+            vocabolario_da_testi(articoli), SENTIMENT_BENCHMARK_SYNTH_DOCS,
+            SENTIMENT_BENCHMARK_SYNTH_MEDIAN_WORDS, SENTIMENT_BENCHMARK_SYNTH_SIGMA
+        )
+    }
+    corpora = {nome: testi for nome, testi in corpora.items() if testi}
+    for nome, testi in corpora.items():
+        print(f"  {nome}: {descrivi_corpus(testi)}")
+
+    elenco = list(configurazioni())
+    risultati = []
+    for i, configurazione in enumerate(elenco, start=1):
+        print(f"\n[{i}/{len(elenco)}] {configurazione}")
+        risultati.append(misura_in_processo_separato(SENTIMENT_MODEL_NAME, configurazione, corpora))
+
+    for nome in corpora:
+        print(f"\nRisultati sul corpus '{nome}':")
+        for risultato in risultati:
+            print(riga_riepilogo(risultato, nome))
+
+    report = {
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit_corrente(),
+        "modello": SENTIMENT_MODEL_NAME,
+        "sistema": {"piattaforma": platform.platform(), "processore": platform.processor(), "core": os.cpu_count()},
+        "librerie": versioni_librerie(),
+        "parametri_sintetico": {
+            "mediana_parole": SENTIMENT_BENCHMARK_SYNTH_MEDIAN_WORDS,
+            "sigma": SENTIMENT_BENCHMARK_SYNTH_SIGMA
+        },
+        "corpora": {nome: descrivi_corpus(testi) for nome, testi in corpora.items()},
+        "risultati": risultati
+    }
+    os.makedirs(SENTIMENT_BENCHMARK_DIR, exist_ok=True)
+    percorso = os.path.join(SENTIMENT_BENCHMARK_DIR, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(percorso, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nReport del benchmark salvato in '{percorso}'.")
@@ -20,6 +20,7 @@ from config import (
     LDA_NUM_PASSES_IT,
     LDA_WORKERS_IT
 )
+from topic_registry import registra_modello, colonna_versione
 
 # --- CONFIGURAZIONE SPECIFICA (mantenuta qui o spostata se utile altrove) ---
 # Nomi delle colonne nel CSV preprocessato
@@ -127,12 +128,16 @@ if __name__ == "__main__":
 
                     print("\nTopic identificati per l'inglese (top words per topic):")
                     topics_en = lda_model_en.print_topics(num_words=10)
+                    righe_topic_en = [f"Topic EN #{i}: {topic[1]}\n" for i, topic in enumerate(topics_en)]
                     with open(LDA_TOPICS_EN_TXT, 'w', encoding='utf-8') as f_out_en:
-                        for i, topic in enumerate(topics_en):
-                            print(f"Topic EN #{i}: {topic[1]}")
-                            f_out_en.write(f"Topic EN #{i}: {topic[1]}\n")
+                        for riga in righe_topic_en:
+                            print(riga, end='')
+                            f_out_en.write(riga)
                     print(f"I topic per l'inglese sono stati salvati in '{LDA_TOPICS_EN_TXT}'")
 
+                    versione_en = registra_modello('en', righe_topic_en, lda_model_en)
+                    print(f"Modello LDA EN registrato con versione '{versione_en}'")
+
                     print("\nAssegnazione topic dominanti ai documenti inglesi...")
                     doc_topics_distr_en = [lda_model_en.get_document_topics(bow, minimum_probability=0.0) for bow in corpus_bow_en]
                     dominant_topics_en = []
@@ -141,7 +146,8 @@ if __name__ == "__main__":
                     
                     if len(dominant_topics_en) == len(df_en):
                         df_en['topic_dominante_lda_en'] = dominant_topics_en
-                        df_en_output = df_en[[COLONNA_ID_ORIGINALE, COLONNA_FONTE, COLONNA_DATA_ORIGINALE, COLONNA_TESTO_PROCESSATO, 'topic_dominante_lda_en']]
+                        df_en[colonna_versione('en')] = versione_en
+                        df_en_output = df_en[[COLONNA_ID_ORIGINALE, COLONNA_FONTE, COLONNA_DATA_ORIGINALE, COLONNA_TESTO_PROCESSATO, 'topic_dominante_lda_en', colonna_versione('en')]]
                         df_en_output.to_csv(DOCUMENT_TOPICS_EN_CSV, index=False, encoding='utf-8')
                         print(f"I topic dominanti per i documenti inglesi salvati in '{DOCUMENT_TOPICS_EN_CSV}'")
                     else:
@@ -186,12 +192,16 @@ if __name__ == "__main__":
 
                     print("\nTopic identificati per l'italiano (top words per topic):")
                     topics_it = lda_model_it.print_topics(num_words=10)
+                    righe_topic_it = [f"Topic IT #{i}: {topic[1]}\n" for i, topic in enumerate(topics_it)]
                     with open(LDA_TOPICS_IT_TXT, 'w', encoding='utf-8') as f_out_it:
-                        for i, topic in enumerate(topics_it):
-                            print(f"Topic IT #{i}: {topic[1]}")
-                            f_out_it.write(f"Topic IT #{i}: {topic[1]}\n")
+                        for riga in righe_topic_it:
+                            print(riga, end='')
+                            f_out_it.write(riga)
                     print(f"I topic per l'italiano sono stati salvati in '{LDA_TOPICS_IT_TXT}'")
 
+                    versione_it = registra_modello('it', righe_topic_it, lda_model_it)
+                    print(f"Modello LDA IT registrato con versione '{versione_it}'")
+
                     print("\nAssegnazione topic dominanti ai documenti italiani...")
                     doc_topics_distr_it = [lda_model_it.get_document_topics(bow, minimum_probability=0.0) for bow in corpus_bow_it]
                     dominant_topics_it = []
@@ -200,7 +210,8 @@ if __name__ == "__main__":
                     
                     if len(dominant_topics_it) == len(df_it):
                         df_it['topic_dominante_lda_it'] = dominant_topics_it
-                        df_it_output = df_it[[COLONNA_ID_ORIGINALE, COLONNA_FONTE, COLONNA_DATA_ORIGINALE, COLONNA_TESTO_PROCESSATO, 'topic_dominante_lda_it']]
+                        df_it[colonna_versione('it')] = versione_it
+                        df_it_output = df_it[[COLONNA_ID_ORIGINALE, COLONNA_FONTE, COLONNA_DATA_ORIGINALE, COLONNA_TESTO_PROCESSATO, 'topic_dominante_lda_it', colonna_versione('it')]]
                         df_it_output.to_csv(DOCUMENT_TOPICS_IT_CSV, index=False, encoding='utf-8')
                         print(f"I topic dominanti per i documenti italiani salvati in '{DOCUMENT_TOPICS_IT_CSV}'")
                     else:
@@ -1,118 +1,251 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 
 # Importa le configurazioni dal file config.py
 from config import (
     DOCUMENT_TOPICS_EN_CSV,
     DOCUMENT_TOPICS_IT_CSV,
     DISTRIBUTION_TOPIC_CHART_EN_PNG,
-    DISTRIBUTION_TOPIC_CHART_IT_PNG
+    DISTRIBUTION_TOPIC_CHART_IT_PNG,
+    LDA_TOPICS_EN_TXT,
+    LDA_TOPICS_IT_TXT,
+    CHARTS_HEADLESS,
+    CHART_RENDER_WORKERS,
+    CHART_TIME_WINDOW_FREQ,
+    CHART_RENDER_CACHE_JSON
 )
+from topic_registry import ErroreVersioneTopic, versione_da_df, carica_etichette, applica_etichette
+
+# --- CONFIGURAZIONE SPECIFICA ---
+CHART_DPI = 300
 
-# --- CONFIGURAZIONE SPECIFICA (mantenuta qui o spostata se utile altrove) ---
-# Labels dei topic per le due lingue
-# Assicurati che questi ID corrispondano ai topic nel modello LDA.
-TOPIC_LABELS_EN = {
-    0: "Conflitto Geopolitico e Minaccia Nucleare",
-    1: "Meta-Discussione su Informazione e Fonti Online",
-    2: "Resoconti di Attacchi su Città e Civili",
-    3: "Leader e Incontri Diplomatici (Trump, Putin, Zelensky)",
-    4: "Economia del Conflitto e Ruolo della Cina",
-    5: "Supporto Internazionale e Sicurezza dell'Ucraina",
-    6: "Critica Politica Emotiva (Ungheria/Orbán)",
-    7: "Operazioni Militari e Controllo del Territorio",
-    8: "Narrazioni Storiche e Propaganda (Nazismo)",
-    9: "Risposta e Difesa Europea (EU/NATO)",
-    10: "Opinione Pubblica Social (Chatter Generale)",
-    11: "Jargon di Guerra e Linguaggio Social ('Operazione Speciale')",
-    12: "Politica Interna USA e Ripercussioni (Afghanistan)",
-    13: "Sanzioni, Energia e Negoziati di Pace",
-    14: "Intelligence, Tecnologia e Ruolo di Elon Musk"
-}
-
-TOPIC_LABELS_IT = {
-    0: "Narrazione dell'Operazione Militare e Rischi",
-    1: "Guerra Aerea e Sistemi di Difesa",
-    2: "Impatto del Conflitto sui Civili",
-    3: "Quadro Politico-Diplomatico (Sanzioni Europee)",
-    4: "Attacchi a Infrastrutture e Siti Nucleari (Chernobyl)",
-    5: "Coinvolgimento Leader Europei (Draghi/Macron)",
-    6: "Discorso Politico Generale sul Conflitto (1)",
-    7: "Comunicazioni Ufficiali Russe (Cremlino/Peskov)",
-    8: "Discorso Politico Generale sul Conflitto (2)",
-    9: "Assedio di Mariupol e Corridoi Umanitari",
-    10: "Prospettiva Politica Italiana e Scenario Globale (Gaza)",
-    11: "Adesione NATO (Svezia) e Ruolo UK",
-    12: "Sanzioni, Neutralità e Media Internazionali",
-    13: "Discorso Politico-Militare Generale (Attacchi)",
-    14: "Referendum e Fornitura di Caccia (Svezia)"
-}
-
-# --- FUNZIONE DI ANALISI E VISUALIZZAZIONE ---
-def analizza_e_visualizza_distribuzione(filepath, topic_labels, lingua, output_filename):
+# --- FUNZIONI DI CARICAMENTO ---
+def carica_topic_etichettati(filepath, codice_lingua, topic_txt=None):
     """
-    Carica i dati, calcola la distribuzione dei topic per fonte e crea un grafico.
+    Carica l'output di 01_topic.py e aggiunge la colonna 'topic_label' dal registro dei modelli.
+    Restituisce il DataFrame, o None se il file non è utilizzabile.
     """
-    print(f"\n--- Inizio Analisi Distribuzione Topic per la Lingua: {lingua.upper()} ---")
-    
     try:
         df = pd.read_csv(filepath)
         colonna_topic = [col for col in df.columns if 'topic_dominante' in col][0]
         print(f"  File caricato: {filepath}. Trovata colonna topic: '{colonna_topic}'")
     except FileNotFoundError:
         print(f"  ERRORE: File '{filepath}' non trovato. Salto questa analisi.")
-        return
+        return None
     except IndexError:
         print(f"  ERRORE: Nessuna colonna 'topic_dominante' trovata in '{filepath}'. Salto questa analisi.")
-        return
+        return None
     except Exception as e:
         print(f"  ERRORE durante il caricamento di '{filepath}': {e}")
-        return
+        return None
 
-    df.dropna(subset=[colonna_topic], inplace=True)
-    df['topic_label'] = df[colonna_topic].map(topic_labels)
+    try:
+        versione = versione_da_df(df, codice_lingua, topic_txt)
+        etichette = carica_etichette(codice_lingua, versione)
+        print(f"  Etichette caricate per il modello {codice_lingua} versione '{versione}'.")
+        df.dropna(subset=[colonna_topic], inplace=True)
+        df['topic_label'] = applica_etichette(df[colonna_topic], etichette)
+    except ErroreVersioneTopic as e:
+        print(f"  ERRORE: {e} Salto questa analisi.")
+        return None
     df.dropna(subset=['topic_label'], inplace=True)
-    
+    df['topic_label'] = df['topic_label'].cat.remove_unused_categories()
+    return df
+
+# --- FUNZIONE DI DISEGNO (eseguita anche nei processi worker) ---
+def disegna_grafico(tabella, titolo, etichetta_x, output_filename, headless=True):
+    """
+    Disegna il grafico a barre impilate di una tabella percentuale (righe = barre, colonne = topic).
+    matplotlib e seaborn sono importati qui, così il processo principale non li carica in modalità headless
+    e ogni worker li carica una sola volta.
+    """
+    import matplotlib
+    if headless:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_theme(style="whitegrid")
+
+    ax = tabella.plot(
+        kind='bar',
+        stacked=True,
+        figsize=(16, 10),
+        colormap='viridis'
+    )
+
+    plt.title(titolo, fontsize=18, pad=20)
+    plt.ylabel('Percentuale di Documenti (%)', fontsize=12)
+    plt.xlabel(etichetta_x, fontsize=12)
+    plt.xticks(rotation=45, ha="right")
+
+    plt.legend(title='Topic', bbox_to_anchor=(1.02, 1), loc='upper left')
+
+    plt.tight_layout(rect=[0, 0, 0.85, 1])
+
+    plt.savefig(output_filename, dpi=CHART_DPI, bbox_inches='tight')
+    if headless:
+        plt.close(ax.figure)
+    else:
+        plt.show()
+    return output_filename
+
+# --- FUNZIONE DI ANALISI E VISUALIZZAZIONE (modalità interattiva) ---
+def analizza_e_visualizza_distribuzione(filepath, codice_lingua, lingua, output_filename, topic_txt=None):
+    """
+    Carica i dati, calcola la distribuzione dei topic per fonte e crea un grafico.
+    Le etichette sono lette dal registro dei modelli per la versione che ha prodotto i topic.
+    """
+    print(f"\n--- Inizio Analisi Distribuzione Topic per la Lingua: {lingua.upper()} ---")
+
+    df = carica_topic_etichettati(filepath, codice_lingua, topic_txt)
+    if df is None:
+        return
+
     distribuzione_percentuale = pd.crosstab(df['fonte'], df['topic_label'], normalize='index') * 100
-    
+
     print("\nTabella: Distribuzione Percentuale dei Topic per Fonte (%)")
     print(distribuzione_percentuale.round(2))
 
     print("\nCreazione del grafico a barre impilate...")
     try:
-        sns.set_theme(style="whitegrid")
-        
-        ax = distribuzione_percentuale.plot(
-            kind='bar', 
-            stacked=True, 
-            figsize=(16, 10),
-            colormap='viridis'
+        disegna_grafico(
+            distribuzione_percentuale,
+            f'Distribuzione dei Topic per Fonte (Lingua: {lingua.upper()})',
+            'Fonte dei Dati',
+            output_filename,
+            headless=False
         )
-
-        plt.title(f'Distribuzione dei Topic per Fonte (Lingua: {lingua.upper()})', fontsize=18, pad=20)
-        plt.ylabel('Percentuale di Documenti (%)', fontsize=12)
-        plt.xlabel('Fonte dei Dati', fontsize=12)
-        plt.xticks(rotation=45, ha="right")
-        
-        plt.legend(title='Topic', bbox_to_anchor=(1.02, 1), loc='upper left')
-        
-        plt.tight_layout(rect=[0, 0, 0.85, 1])
-        
-        plt.savefig(output_filename, dpi=300, bbox_inches='tight')
         print(f"Grafico salvato con successo in '{output_filename}'")
-        plt.show()
     except Exception as e:
         print(f"Si è verificato un errore durante la creazione del grafico: {e}")
 
+# --- MODALITÀ HEADLESS: PREPARAZIONE E RENDERING IN PARALLELO ---
+def prepara_grafici_lingua(filepath, codice_lingua, lingua, output_filename, topic_txt=None):
+    """
+    Calcola nel processo principale gli aggregati di tutti i grafici di una lingua:
+    - distribuzione per fonte sull'intero periodo (il grafico storico);
+    - distribuzione per fonte in ogni finestra temporale (CHART_TIME_WINDOW_FREQ);
+    - per ogni fonte, andamento della distribuzione tra le finestre temporali.
+    Restituisce una lista di job (dizionari) pronti per disegna_grafico.
+    """
+    print(f"\n--- Preparazione grafici per la Lingua: {lingua.upper()} ---")
+    df = carica_topic_etichettati(filepath, codice_lingua, topic_txt)
+    if df is None:
+        return []
+
+    base, estensione = os.path.splitext(output_filename)
+    jobs = [{
+        "tabella": pd.crosstab(df['fonte'], df['topic_label'], normalize='index') * 100,
+        "titolo": f'Distribuzione dei Topic per Fonte (Lingua: {lingua.upper()})',
+        "etichetta_x": 'Fonte dei Dati',
+        "output_filename": output_filename
+    }]
+
+    if not CHART_TIME_WINDOW_FREQ:
+        return jobs
+
+    date = pd.to_datetime(df['data_originale_str'], errors='coerce', utc=True)
+    df = df[date.notna()].copy()
+    df['finestra'] = date[date.notna()].dt.tz_localize(None).dt.to_period(CHART_TIME_WINDOW_FREQ).astype(str)
+
+    for finestra, df_finestra in df.groupby('finestra', sort=True):
+        jobs.append({
+            "tabella": pd.crosstab(df_finestra['fonte'], df_finestra['topic_label'], normalize='index') * 100,
+            "titolo": f'Distribuzione dei Topic per Fonte (Lingua: {lingua.upper()}, Periodo: {finestra})',
+            "etichetta_x": 'Fonte dei Dati',
+            # le finestre settimanali sono intervalli ('2024-01-01/2024-01-07'): '/' non può stare nel nome del file
+            "output_filename": f"{base}_{finestra.replace('/', '_')}{estensione}"
+        })
+
+    for fonte, df_fonte in df.groupby('fonte', sort=True):
+        jobs.append({
+            "tabella": pd.crosstab(df_fonte['finestra'], df_fonte['topic_label'], normalize='index') * 100,
+            "titolo": f'Andamento dei Topic per {fonte} (Lingua: {lingua.upper()})',
+            "etichetta_x": 'Periodo',
+            "output_filename": f"{base}_{fonte}_per_periodo{estensione}"
+        })
+
+    print(f"  Preparati {len(jobs)} grafici per la lingua {lingua}.")
+    return jobs
+
+def impronta_job(job):
+    """Impronta dell'aggregato e dei parametri di disegno di un job: se non cambia, il grafico non va rifatto."""
+    contenuto = "\n".join([job["titolo"], job["etichetta_x"], str(CHART_DPI), job["tabella"].round(6).to_csv()])
+    return hashlib.sha1(contenuto.encode("utf-8")).hexdigest()
+
+def carica_cache_rendering():
+    try:
+        with open(CHART_RENDER_CACHE_JSON, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def salva_cache_rendering(cache):
+    with open(CHART_RENDER_CACHE_JSON, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+def renderizza_grafici_headless(jobs, num_workers=CHART_RENDER_WORKERS):
+    """
+    Disegna i grafici con backend non interattivo in processi paralleli,
+    saltando quelli il cui aggregato non è cambiato dall'ultimo rendering.
+    """
+    cache = carica_cache_rendering()
+    da_disegnare = []
+    for job in jobs:
+        impronta = impronta_job(job)
+        if cache.get(job["output_filename"]) == impronta and os.path.exists(job["output_filename"]):
+            continue
+        da_disegnare.append((job, impronta))
+
+    print(f"\nGrafici invariati saltati: {len(jobs) - len(da_disegnare)}. Da disegnare: {len(da_disegnare)} (worker: {num_workers}).")
+    if not da_disegnare:
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {
+            executor.submit(disegna_grafico, job["tabella"], job["titolo"], job["etichetta_x"], job["output_filename"], True): (job, impronta)
+            for job, impronta in da_disegnare
+        }
+        for future in as_completed(futures):
+            job, impronta = futures[future]
+            try:
+                future.result()
+                cache[job["output_filename"]] = impronta
+                print(f"  Grafico salvato in '{job['output_filename']}'")
+            except Exception as e:
+                print(f"  ERRORE durante la creazione del grafico '{job['output_filename']}': {e}")
+
+    salva_cache_rendering(cache)
+
 # --- FLUSSO PRINCIPALE ---
 if __name__ == "__main__":
-    # Analisi per l'inglese
-    analizza_e_visualizza_distribuzione(
-        filepath=DOCUMENT_TOPICS_EN_CSV,
-        topic_labels=TOPIC_LABELS_EN,
-        lingua="Inglese",
-        output_filename=DISTRIBUTION_TOPIC_CHART_EN_PNG
-    )
+    lingue = [
+        {
+            "filepath": DOCUMENT_TOPICS_EN_CSV,
+            "codice_lingua": "en",
+            "lingua": "Inglese",
+            "output_filename": DISTRIBUTION_TOPIC_CHART_EN_PNG,
+            "topic_txt": LDA_TOPICS_EN_TXT
+        },
+        {
+            "filepath": DOCUMENT_TOPICS_IT_CSV,
+            "codice_lingua": "it",
+            "lingua": "Italiano",
+            "output_filename": DISTRIBUTION_TOPIC_CHART_IT_PNG,
+            "topic_txt": LDA_TOPICS_IT_TXT
+        }
+    ]
 
-    # Analisi per
\ No newline at end of file
+    if CHARTS_HEADLESS:
+        jobs = []
+        for parametri in lingue:
+            jobs.extend(prepara_grafici_lingua(**parametri))
+        renderizza_grafici_headless(jobs)
+    else:
+        for parametri in lingue:
+            analizza_e_visualizza_distribuzione(**parametri)
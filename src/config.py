@@ -25,6 +25,7 @@ os.makedirs(RESULTS_DIR, exist_ok=True)
 os.makedirs(CHARTS_DIR, exist_ok=True)
 os.makedirs(os.path.join(RESULTS_DIR, "topic_modeling"), exist_ok=True)
 os.makedirs(os.path.join(RESULTS_DIR, "sentiment_analysis"), exist_ok=True)
+os.makedirs(os.path.join(RESULTS_DIR, "elasticsearch"), exist_ok=True)
 
 
 # --- Percorsi dei file specifici (Input/Output) ---
@@ -46,6 +47,9 @@ TELEGRAM_MESSAGES_COLLECTED_CSV = os.path.join(RAW_DATA_DIR, "telegram_messaggi_
 
 # Lemmatization (Output)
 PROCESSED_CONSOLIDATED_CSV = os.path.join(PROCESSED_DATA_DIR, "dati_testuali_preproc_consolidati.csv")
+# Indice full-text locale (SQLite FTS5) del file consolidato, aggiornato in modo incrementale da 02_ricerca_locale.py
+LOCAL_SEARCH_INPUT_CSV = PROCESSED_CONSOLIDATED_CSV
+LOCAL_SEARCH_DB = os.path.join(PROCESSED_DATA_DIR, "indice_ricerca_locale.sqlite")
 
 # Topic_Modeling (Input/Output)
 # L'input per 01_topic.py è il file consolidato dal preprocessing
@@ -55,15 +59,137 @@ LDA_TOPICS_IT_TXT = os.path.join(RESULTS_DIR, "topic_modeling", "lda_topics_it.t
 DOCUMENT_TOPICS_EN_CSV = os.path.join(RESULTS_DIR, "topic_modeling", "document_topics_en.csv")
 DOCUMENT_TOPICS_IT_CSV = os.path.join(RESULTS_DIR, "topic_modeling", "document_topics_it.csv")
 
+# Parametri di addestramento LDA per lingua
+LDA_NUM_TOPICS_EN = 15
+LDA_NUM_PASSES_EN = 10
+LDA_WORKERS_EN = 3
+LDA_NUM_TOPICS_IT = 15
+LDA_NUM_PASSES_IT = 10
+LDA_WORKERS_IT = 3
+
+# Registro dei modelli LDA persistiti: ogni versione vive in
+# TOPIC_MODEL_REGISTRY_DIR/<lingua>/<versione>/ insieme alla propria tabella di etichette
+# (topic_labels.json). La versione è l'impronta dei topic stampati dal modello, quindi
+# cambia automaticamente a ogni riaddestramento.
+TOPIC_MODEL_REGISTRY_DIR = os.path.join(ROOT_DIR, "Topic_Modeling", "modelli")
+
 # Sentiment_analysis (Input/Output)
 # L'input per 01_sent.py è il file consolidato dal preprocessing
 SENTIMENT_ANALYSIS_INPUT_CSV = PROCESSED_CONSOLIDATED_CSV
 SENTIMENT_FINAL_CSV = os.path.join(RESULTS_DIR, "sentiment_analysis", "dati_con_sentiment_finale.csv")
+SENTIMENT_MODEL_NAME = "cardiffnlp/twitter-xlm-roberta-base-sentiment" # Modello multilingue (en/it) con etichette negative/neutral/positive
+# Modello per lingua di 01_sent.py (lingue senza voce: SENTIMENT_MODEL_NAME). Le righe sono raggruppate
+# per modello e ogni modello è caricato solo se la sua lingua compare nell'input. I modelli devono
+# avere etichette negative/neutral/positive, es. "cardiffnlp/twitter-roberta-base-sentiment-latest"
+# per l'inglese, più leggero del multilingue.
+SENTIMENT_MODELS_BY_LANGUAGE = {
+    "en": SENTIMENT_MODEL_NAME,
+    "it": SENTIMENT_MODEL_NAME
+}
+
+# Inferenza a batch: i testi sono ordinati per lunghezza in token e raggruppati in bucket
+# con padding dinamico. Un bucket si chiude a SENTIMENT_BATCH_SIZE testi oppure quando
+# (numero testi x lunghezza del più lungo) supererebbe SENTIMENT_MAX_TOKENS_PER_BATCH.
+SENTIMENT_BATCH_SIZE = 64
+SENTIMENT_MAX_LENGTH = 512
+SENTIMENT_MAX_TOKENS_PER_BATCH = 16384
+
+# Gestione dei testi lunghi: "troncamento" valuta solo i primi SENTIMENT_MAX_LENGTH token;
+# "finestre" divide i testi in finestre sovrapposte di SENTIMENT_WINDOW_STRIDE token, impacchetta
+# le finestre di molti documenti negli stessi batch e aggrega gli score per documento
+# ("media_pesata" per numero di token della finestra, oppure "max" = finestra più sicura).
+SENTIMENT_LENGTH_MODE = "troncamento"
+SENTIMENT_WINDOW_STRIDE = 64
+SENTIMENT_WINDOW_AGGREGATION = "media_pesata"
+SENTIMENT_WINDOW_MAX_IN_MEMORY = 20000 # Finestre tokenizzate tenute in memoria (circa) per gruppo di documenti
+
+# Backend di inferenza: "pytorch_fp32" (default), "pytorch_int8" (quantizzazione dinamica, CPU)
+# oppure "onnxruntime" (export ONNX con ottimizzazioni del grafo, CPU; richiede onnx e onnxruntime).
+SENTIMENT_BACKEND = "pytorch_fp32"
+SENTIMENT_ARTIFACTS_DIR = os.path.join(RESULTS_DIR, "sentiment_analysis", "modelli_ottimizzati") # Cache dei modelli ONNX esportati
+SENTIMENT_ONNX_THREADS = None # Thread intra-op di ONNX Runtime (None = default della libreria)
+
+# Modalità multi-processo su CPU: 1 = processo singolo (default), N = N processi worker,
+# "auto" = sceglie processi x thread con una breve calibrazione sul corpus da analizzare.
+SENTIMENT_NUM_PROCESSES = 1
+SENTIMENT_THREADS_PER_PROCESS = None # None = core disponibili / numero di processi
+SENTIMENT_SHARD_SIZE = 1000 # Documenti massimi per shard inviato a un worker
+SENTIMENT_CALIBRATION_DOCS = 256 # Documenti usati per ogni prova della calibrazione
+SENTIMENT_CALIBRATION_MAX_PROCESSES = 8 # Processi massimi provati dalla calibrazione (ogni worker carica una copia del modello)
+SENTIMENT_CALIBRATION_MEMORY_FRACTION = 0.8 # Quota della RAM disponibile che i worker aggiunti durante la calibrazione possono occupare
+
+# Pipeline tokenizzazione/inferenza: un thread produttore tokenizza i testi a gruppi di
+# SENTIMENT_PIPELINE_GROUP_DOCS e prepara i batch con padding, tenendone pronti fino a
+# SENTIMENT_PREFETCH_BATCHES in una coda; il ciclo di inferenza li consuma senza attendere la tokenizzazione.
+SENTIMENT_PIPELINE_ENABLED = True
+SENTIMENT_PREFETCH_BATCHES = 8
+SENTIMENT_PIPELINE_GROUP_DOCS = 4096
+
+# Cache persistente dei risultati, indicizzata per (hash del testo normalizzato, modello, revisione, max_length).
+# Oltre SENTIMENT_CACHE_MAX_ENTRIES voci vengono eliminate quelle usate meno di recente.
+SENTIMENT_CACHE_ENABLED = True
+SENTIMENT_CACHE_DB = os.path.join(RESULTS_DIR, "sentiment_analysis", "cache_sentiment.sqlite")
+SENTIMENT_CACHE_MAX_ENTRIES = 2_000_000
+
+# Checkpoint: l'input viene letto a blocchi di SENTIMENT_CHECKPOINT_ROWS righe e ogni blocco analizzato
+# è salvato come shard. Un'esecuzione interrotta riprende saltando le righe già analizzate;
+# al termine gli shard sono uniti in SENTIMENT_FINAL_CSV e la cartella di checkpoint viene rimossa.
+SENTIMENT_CHECKPOINT_DIR = os.path.join(RESULTS_DIR, "sentiment_analysis", "checkpoint")
+SENTIMENT_CHECKPOINT_ROWS = 5000
+
+# Modalità a cascata: un classificatore lineare su n-grammi hashati (addestrato con 03_addestra_cascata.py
+# sulle etichette del transformer) valuta tutti i documenti; al transformer vanno solo quelli con
+# confidenza sotto SENTIMENT_CASCADE_THRESHOLD. Una frazione SENTIMENT_CASCADE_AUDIT_FRACTION dei documenti
+# sicuri è comunque inviata al transformer per stimare la concordanza con le sole etichette del transformer.
+SENTIMENT_CASCADE_ENABLED = False
+SENTIMENT_CASCADE_MODEL = os.path.join(RESULTS_DIR, "sentiment_analysis", "cascata", "primo_livello.joblib")
+SENTIMENT_CASCADE_THRESHOLD = 0.9
+SENTIMENT_CASCADE_AUDIT_FRACTION = 0.02
+SENTIMENT_CASCADE_TRAIN_DOCS = 50000 # Documenti massimi usati per l'addestramento (con 20% di validazione)
+SENTIMENT_CASCADE_REPORT_JSON = os.path.join(RESULTS_DIR, "sentiment_analysis", "cascata", "report_addestramento.json")
+
+# Server di scoring in tempo quasi reale (04_server_sentiment.py): le richieste concorrenti sono
+# raggruppate in micro-batch di al massimo SENTIMENT_SERVER_MAX_BATCH testi, attendendo al più
+# SENTIMENT_SERVER_MAX_WAIT_MS millisecondi dal primo testo in coda prima di avviare l'inferenza.
+SENTIMENT_SERVER_HOST = "127.0.0.1"
+SENTIMENT_SERVER_PORT = 8765
+SENTIMENT_SERVER_MAX_BATCH = 32
+SENTIMENT_SERVER_MAX_WAIT_MS = 10
+
+# Confronto dei backend (02_confronta_backend.py): campione degli articoli inclusi nel repository
+SENTIMENT_BACKEND_SAMPLE_CSVS = [
+    os.path.join(ROOT_DIR, "Build_Dataset", "Papers", "BBC_News_contenuti_articoli_estratti.csv"),
+    os.path.join(ROOT_DIR, "Build_Dataset", "Papers", "Kyiv_Independent_contenuti_articoli_estratti.csv")
+]
+SENTIMENT_BACKEND_SAMPLE_SIZE = 300
+SENTIMENT_BACKEND_MIN_AGREEMENT = 0.97 # Concordanza minima delle etichette rispetto a fp32
+SENTIMENT_BACKEND_REPORT_JSON = os.path.join(RESULTS_DIR, "sentiment_analysis", "confronto_backend.json")
+
+# Benchmark (06_benchmark_sentiment.py): ogni combinazione di backend, batch size, thread e modalità
+# di lunghezza è misurata in un processo separato sugli articoli inclusi nel repository e su un corpus
+# sintetico con lunghezze (in parole) a distribuzione log-normale. Un file JSON per esecuzione.
+SENTIMENT_BENCHMARK_BACKENDS = ["pytorch_fp32", "pytorch_int8", "onnxruntime"]
+SENTIMENT_BENCHMARK_BATCH_SIZES = [16, 64]
+SENTIMENT_BENCHMARK_THREADS = [1, os.cpu_count() or 1]
+SENTIMENT_BENCHMARK_LENGTH_MODES = ["troncamento", "finestre"]
+SENTIMENT_BENCHMARK_ARTICLES = 200 # Articoli campionati dai CSV inclusi nel repository
+SENTIMENT_BENCHMARK_SYNTH_DOCS = 500
+SENTIMENT_BENCHMARK_SYNTH_MEDIAN_WORDS = 40 # Mediana della lunghezza dei documenti sintetici
+SENTIMENT_BENCHMARK_SYNTH_SIGMA = 1.0 # Dispersione (sigma della log-normale): valori alti = più documenti molto lunghi
+SENTIMENT_BENCHMARK_DIR = os.path.join(RESULTS_DIR, "sentiment_analysis", "benchmark")
 
 # Charts (Output)
 DISTRIBUTION_TOPIC_CHART_EN_PNG = os.path.join(CHARTS_DIR, "distribuzione_topic_en.png")
 DISTRIBUTION_TOPIC_CHART_IT_PNG = os.path.join(CHARTS_DIR, "distribuzione_topic_it.png")
 
+# Rendering dei grafici. In modalità headless (es. CHARTS_HEADLESS=1 sui worker senza display)
+# si usa il backend non interattivo 'Agg', niente plt.show(), e i grafici per lingua, fonte e
+# finestra temporale vengono disegnati in parallelo saltando quelli con aggregati invariati.
+CHARTS_HEADLESS = os.environ.get("CHARTS_HEADLESS", "0") == "1"
+CHART_RENDER_WORKERS = os.cpu_count() or 1
+CHART_TIME_WINDOW_FREQ = "M" # Frequenza pandas delle finestre temporali ('M' = mensile, 'W' = settimanale, None = solo periodo intero)
+CHART_RENDER_CACHE_JSON = os.path.join(CHARTS_DIR, "render_cache.json")
+
 # Elasticsearch (Input per gli indexer)
 # L'input per 01_indexer.py è il file con il sentiment
 ELASTICSEARCH_INDEXER_INPUT_CSV = SENTIMENT_FINAL_CSV
@@ -76,6 +202,89 @@ ELASTIC_USER = "elastic"
 ELASTIC_PASSWORD = "elastic" # ### IMPORTANTE: SOSTITUISCI CON LA TUA PASSWORD REALE ###
 INDEX_NAME_MAIN = "semantic_tesi"
 INDEX_NAME_TOPIC = "topic_modeling_tesi"
+INDEX_NAME_COMBINED = "sentiment_topic_tesi" # Un documento per elemento con sentiment e topic (05_indexer_combinato.py)
+
+# Indicizzazione bulk: "parallel" (parallel_bulk, ES_BULK_THREADS richieste in volo) oppure "streaming"
+# (streaming_bulk, una richiesta alla volta). Un chunk si chiude a ES_BULK_CHUNK_SIZE documenti o
+# ES_BULK_MAX_CHUNK_BYTES byte. Il client usa compressione HTTP e un pool di connessioni per nodo.
+ES_BULK_MODE = "parallel"
+ES_BULK_THREADS = 4
+ES_BULK_QUEUE_SIZE = 4 # Chunk pronti in attesa di un thread libero
+ES_BULK_CHUNK_SIZE = 1000
+ES_BULK_MAX_CHUNK_BYTES = 10 * 1024 * 1024
+ES_HTTP_COMPRESS = True
+ES_CONNECTIONS_PER_NODE = 8 # Almeno ES_BULK_THREADS, altrimenti i thread attendono una connessione libera
+ES_REQUEST_TIMEOUT = 60
+# Indexer asincrono (03_indexer_async.py): richieste bulk in volo tra ES_ASYNC_MIN_IN_FLIGHT e ES_ASYNC_MAX_IN_FLIGHT.
+# Il limite si dimezza quando il cluster rifiuta documenti (429 / es_rejected_execution_exception) e cresce di uno
+# dopo un giro completo di richieste senza rifiuti.
+ES_ASYNC_INITIAL_IN_FLIGHT = 4
+ES_ASYNC_MIN_IN_FLIGHT = 1
+ES_ASYNC_MAX_IN_FLIGHT = 16
+ES_ASYNC_QUEUE_CHUNKS = 8 # Chunk già serializzati in attesa di invio (limita la lettura in anticipo)
+# Documenti rifiutati in modo transitorio (status in ES_RETRY_STATUSES): ritentati fino a ES_RETRY_MAX_ATTEMPTS volte
+# con backoff esponenziale e jitter. Quelli che falliscono definitivamente finiscono in un file NDJSON di
+# dead letter in ES_DEAD_LETTER_DIR, reinviabile con 04_rigioca_dead_letter.py.
+ES_RETRY_STATUSES = (429, 502, 503, 504)
+ES_RETRY_MAX_ATTEMPTS = 5
+ES_RETRY_BACKOFF_S = 1.0 # Attesa massima al primo tentativo, raddoppia a ogni tentativo (jitter: attesa casuale fino al massimo)
+ES_RETRY_MAX_BACKOFF_S = 30.0
+ES_DEAD_LETTER_DIR = os.path.join(RESULTS_DIR, "elasticsearch", "dead_letter")
+# Gli input degli indexer (CSV o Parquet, in base all'estensione) sono letti e serializzati a blocchi di righe
+ES_SERIALIZE_CHUNK_ROWS = 20000
+
+# Benchmark degli indexer (07_benchmark_indexer.py) contro un endpoint _bulk finto locale: i CSV inclusi nel
+# repository sono replicati fino a ES_BENCHMARK_DOCS documenti per indice e ogni modalità è misurata in ogni
+# scenario (latenza per richiesta e per documento, quota di documenti rifiutati con 429, richieste in volo
+# oltre cui il server rifiuta l'intera richiesta). "incrementale" invia il delta rispetto a un manifest
+# simulato che differisce dall'input per ES_BENCHMARK_INCREMENTAL_CHANGE_RATIO dei documenti (per tipo di modifica).
+# Una quota ES_BENCHMARK_DUPLICATE_RATIO di righe ripete l'id di una riga vicina: al termine una verifica
+# controlla, per ogni modalità, che di ogni id ripetuto il server finto conservi l'ultima copia.
+ES_BENCHMARK_DOCS = 100000
+ES_BENCHMARK_DUPLICATE_RATIO = 0.01
+ES_BENCHMARK_MODES = ["streaming", "parallel", "async", "incrementale"]
+ES_BENCHMARK_SCENARIOS = [
+    {"nome": "senza_rifiuti", "latenza_ms": 20, "latenza_per_doc_ms": 0.02, "rifiuti_documento": 0.0, "capacita": None},
+    {"nome": "rifiuti_429", "latenza_ms": 20, "latenza_per_doc_ms": 0.02, "rifiuti_documento": 0.02, "capacita": 6}
+]
+ES_BENCHMARK_INCREMENTAL_CHANGE_RATIO = 0.05
+ES_BENCHMARK_DIR = os.path.join(RESULTS_DIR, "elasticsearch", "benchmark")
+
+# Ciclo di vita delle impostazioni: gli indici sono creati in profilo di caricamento (refresh disattivato,
+# nessuna replica, translog asincrono con soglia di flush alta); a caricamento concluso si ripristinano
+# le impostazioni di produzione, si esegue un solo refresh e, se abilitato, un force-merge a un segmento.
+ES_BULK_LOAD_TRANSLOG_FLUSH_THRESHOLD = "1gb"
+ES_INDEX_PRODUCTION_REPLICAS = 1
+ES_INDEX_PRODUCTION_REFRESH_INTERVAL = "1s"
+ES_FORCE_MERGE_AFTER_LOAD = True
+ES_FORCE_MERGE_TIMEOUT = 3600 # Secondi concessi al force-merge
+
+# Reindicizzazione senza interruzioni: INDEX_NAME_MAIN e INDEX_NAME_TOPIC sono alias di lettura.
+# Ogni caricamento scrive in un nuovo indice "<alias>-<AAAAMMGG-hhmmss>"; se il conteggio dei documenti
+# è valido l'alias viene spostato in modo atomico e restano solo le ES_ALIAS_KEEP_GENERATIONS generazioni più recenti.
+ES_ALIAS_KEEP_GENERATIONS = 2 # Generazione attiva + precedente (per un eventuale rollback)
+ES_ALIAS_MIN_COUNT_RATIO = 0.9 # Documenti minimi rispetto alla generazione attiva
+ES_ALIAS_MAX_FAILED_DOCS = 0 # Documenti falliti tollerati nel caricamento
+# Generazioni partizionate per mese ('<generazione>-aaaa.mm', create da un index template): l'alias copre tutte
+# le partizioni e le query su un intervallo di date saltano i mesi esclusi. Non compatibile con la modalità
+# incrementale, che in questo caso ripiega sulla ricostruzione completa.
+ES_MONTHLY_PARTITIONS = False
+# Campi precalcolati negli indici (giorno, settimana ISO, mese, fascia di lunghezza del testo, punteggio del
+# sentiment dominante): le aggregazioni più comuni delle dashboard diventano terms su keyword, senza script.
+# Estremi inferiori delle fasce di lunghezza del testo, in caratteri (l'ultima fascia è aperta).
+ES_TEXT_LENGTH_BINS = [0, 50, 200, 1000]
+# Benchmark delle query tipiche delle dashboard (06_benchmark_query.py): alias o indici da confrontare,
+# per esempio una generazione a indice unico e una partizionata caricate con i due valori di ES_MONTHLY_PARTITIONS.
+ES_QUERY_BENCHMARK_TARGETS = [INDEX_NAME_MAIN]
+ES_QUERY_BENCHMARK_REPETITIONS = 20
+ES_QUERY_BENCHMARK_REPORT_JSON = os.path.join(RESULTS_DIR, "elasticsearch", "benchmark_query.json")
+
+# Indicizzazione incrementale (solo INDEX_NAME_MAIN): un manifest locale (_id, hash del contenuto) per alias
+# permette di inviare solo creazioni, modifiche ed eliminazioni alla generazione attiva, seguite da una
+# riconciliazione di conteggio e checksum. "completo" ricostruisce sempre una nuova generazione; "incrementale"
+# ripiega sulla ricostruzione se manca il manifest o se l'alias punta a un indice diverso da quello del manifest.
+ES_INDEXING_MODE = "incrementale" # "completo" oppure "incrementale"
+ES_MANIFEST_DIR = os.path.join(RESULTS_DIR, "elasticsearch")
 
 # --- Credenziali API (NON caricarle su GitHub se sono reali!) ---
 # È preferibile gestire queste credenziali come variabili d'ambiente o tramite un file .env
@@ -0,0 +1,332 @@
+# es_benchmark.py
+#
+# Strumenti del benchmark degli indexer (07_benchmark_indexer.py) senza un cluster reale:
+# - ServerBulkFinto: endpoint HTTP locale che legge le richieste _bulk (NDJSON, anche gzip) e
+#   conferma ogni documento dopo una latenza configurabile. Può rifiutare singoli documenti (429
+#   es_rejected_execution_exception, come un cluster con la coda di scrittura piena) e intere richieste
+#   oltre una capacità di richieste in volo, così si osservano tentativi, backoff e concorrenza adattiva.
+#   Con registra_documenti conserva l'hash di ogni documento scritto (e risponde 409 a una 'create' su un
+#   documento esistente), per verificare che di un _id ripetuto resti l'ultima copia;
+# - dati sintetici: i CSV inclusi nel repository (commenti dei topic e articoli) replicati fino al numero
+#   di documenti voluto, nello schema degli input di 01_indexer.py e 02_indexer_topic.py.
+
+import gzip
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from config import ES_SERIALIZE_CHUNK_ROWS
+from es_serializzazione import CAMPO_HASH
+
+ETICHETTE_SENTIMENT = np.array(["positive", "negative", "neutral"], dtype=object)
+COLONNE_TESTO_ARTICOLI = ["titolo", "testo_articolo"]
+
+
+# --- SERVER _bulk FINTO ---
+class StatisticheBulk:
+    """Contatori del server finto, azzerabili tra una misura e l'altra."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.azzera()
+
+    def azzera(self):
+        with self.lock:
+            self.richieste = 0
+            self.documenti = 0
+            self.byte_ricevuti = 0
+            self.documenti_rifiutati = 0
+            self.richieste_rifiutate = 0
+            self.in_volo = 0
+            self.picco_in_volo = 0
+
+    def istantanea(self):
+        with self.lock:
+            return {
+                "richieste": self.richieste,
+                "documenti_ricevuti": self.documenti,
+                "mb_ricevuti": round(self.byte_ricevuti / 1e6, 2),
+                "documenti_rifiutati_429": self.documenti_rifiutati,
+                "richieste_rifiutate_429": self.richieste_rifiutate,
+                "picco_richieste_in_volo": self.picco_in_volo
+            }
+
+
+def azioni_bulk(corpo):
+    """Terne (op_type, metadati, _source in byte) del corpo NDJSON di una richiesta _bulk. Le 'delete' non hanno il _source."""
+    righe = [riga for riga in corpo.split(b"\n") if riga.strip()]
+    azioni, i = [], 0
+    while i < len(righe):
+        op_type, meta = next(iter(json.loads(righe[i]).items()))
+        azioni.append((op_type, meta, None if op_type == "delete" else righe[i + 1]))
+        i += 1 if op_type == "delete" else 2
+    return azioni
+
+def elementi_bulk(azioni, rifiuta, documenti=None):
+    """
+    Risposta per ogni azione; rifiuta[i] indica se la i-esima va rifiutata. Con documenti (dizionario
+    (_index, _id) -> hash) le azioni vengono applicate in ordine. Restituisce (elementi, rifiutati).
+    """
+    elementi, rifiutati = [], 0
+    for (op_type, meta, sorgente), rifiutata in zip(azioni, rifiuta):
+        chiave = (meta.get("_index"), meta.get("_id"))
+        base = {"_index": chiave[0], "_id": chiave[1]}
+        if rifiutata:
+            rifiutati += 1
+            elementi.append({op_type: {**base, "status": 429, "error": {
+                "type": "es_rejected_execution_exception", "reason": "rejected execution (simulato dal server di benchmark)"}}})
+        elif documenti is not None and op_type == "create" and chiave in documenti:
+            elementi.append({op_type: {**base, "status": 409, "error": {
+                "type": "version_conflict_engine_exception", "reason": "document already exists (simulato dal server di benchmark)"}}})
+        elif op_type == "delete":
+            if documenti is not None:
+                documenti.pop(chiave, None)
+            elementi.append({op_type: {**base, "status": 200, "result": "deleted"}})
+        else:
+            if documenti is not None:
+                documenti[chiave] = json.loads(sorgente).get(CAMPO_HASH)
+            elementi.append({op_type: {**base, "status": 201, "result": "created"}})
+    return elementi, rifiutati
+
+
+class ServerBulkFinto:
+    """
+    Endpoint _bulk locale in un thread. Parametri dello scenario:
+    latenza_ms (per richiesta), latenza_per_doc_ms, rifiuti_documento (quota di documenti rifiutati con 429),
+    capacita (richieste in volo oltre cui l'intera richiesta riceve un 429; None = illimitata) e
+    registra_documenti (conserva in self.documenti l'hash di ogni documento scritto).
+    """
+
+    def __init__(self, host="127.0.0.1", porta=0, seed=42):
+        self.statistiche = StatisticheBulk()
+        self.rng = np.random.default_rng(seed)
+        self.rng_lock = threading.Lock()
+        self.documenti_lock = threading.Lock()
+        self.imposta_scenario()
+        self.server = ThreadingHTTPServer((host, porta), self._gestore())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, porta = self.server.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def imposta_scenario(self, latenza_ms=0, latenza_per_doc_ms=0, rifiuti_documento=0.0, capacita=None, registra_documenti=False):
+        self.latenza_ms = latenza_ms
+        self.latenza_per_doc_ms = latenza_per_doc_ms
+        self.rifiuti_documento = rifiuti_documento
+        self.capacita = capacita
+        self.documenti = {} if registra_documenti else None
+        self.statistiche.azzera()
+
+    def avvia(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def arresta(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _bulk(self, corpo):
+        """(status, risposta) di una richiesta _bulk, dopo la latenza simulata."""
+        s = self.statistiche
+        with s.lock:
+            s.richieste += 1
+            s.byte_ricevuti += len(corpo)
+            s.in_volo += 1
+            s.picco_in_volo = max(s.picco_in_volo, s.in_volo)
+            sovraccarico = self.capacita is not None and s.in_volo > self.capacita
+        try:
+            if sovraccarico:
+                with s.lock:
+                    s.richieste_rifiutate += 1
+                return 429, {"error": {"type": "es_rejected_execution_exception", "reason": "troppe richieste in volo (simulato)"}, "status": 429}
+            inizio = time.perf_counter()
+            azioni = azioni_bulk(corpo)
+            with self.rng_lock:
+                rifiuta = self.rng.random(len(azioni)) < self.rifiuti_documento
+            if self.documenti is None:
+                elementi, rifiutati = elementi_bulk(azioni, rifiuta)
+            else:
+                with self.documenti_lock: # una richiesta alla volta, come le scritture di uno shard
+                    elementi, rifiutati = elementi_bulk(azioni, rifiuta, self.documenti)
+            attesa = (self.latenza_ms + self.latenza_per_doc_ms * len(elementi)) / 1000 - (time.perf_counter() - inizio)
+            if attesa > 0:
+                time.sleep(attesa)
+            with s.lock:
+                s.documenti += len(elementi)
+                s.documenti_rifiutati += rifiutati
+            return 200, {"took": int((time.perf_counter() - inizio) * 1000), "errors": rifiutati > 0, "items": elementi}
+        finally:
+            with s.lock:
+                s.in_volo -= 1
+
+    def _gestore(self):
+        server_finto = self
+
+        class Gestore(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # connessioni persistenti, come con un cluster reale
+
+            def _rispondi(self, status, risposta):
+                corpo = json.dumps(risposta).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("X-Elastic-Product", "Elasticsearch") # verificato dal client ufficiale
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("X-Elastic-Product", "Elasticsearch")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                self._rispondi(200, {"name": "benchmark", "cluster_name": "finto", "version": {"number": "8.13.0"}, "tagline": "You Know, for Search"})
+
+            def do_POST(self):
+                corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    corpo = gzip.decompress(corpo)
+                if self.path.split("?")[0].endswith("/_bulk"):
+                    self._rispondi(*server_finto._bulk(corpo))
+                else:
+                    self._rispondi(200, {"acknowledged": True})
+
+            do_PUT = do_POST
+
+            def log_message(self, *args):
+                pass # nessuna riga di log per richiesta
+
+        return Gestore
+
+
+# --- DATI SINTETICI ---
+def righe_base(percorso_commenti, percorsi_articoli):
+    """Documenti di partenza: i commenti del file dei topic e gli articoli (titolo + testo), con id, fonte, data e testo."""
+    parti = []
+    if os.path.exists(percorso_commenti):
+        df = pd.read_csv(percorso_commenti, low_memory=False)
+        parti.append(pd.DataFrame({
+            "id_originale": df["id_originale"].astype(str),
+            "fonte": df["fonte"],
+            "data_originale_str": df["data_originale_str"],
+            "testo": df["testo_lemmatizzato"].fillna("").astype(str)
+        }))
+    for percorso in percorsi_articoli:
+        if not os.path.exists(percorso):
+            print(f"  AVVISO: file '{percorso}' non trovato, escluso dai dati sintetici.")
+            continue
+        df = pd.read_csv(percorso, low_memory=False)
+        colonne = [c for c in COLONNE_TESTO_ARTICOLI if c in df.columns]
+        parti.append(pd.DataFrame({
+            "id_originale": df["url"].astype(str),
+            "fonte": os.path.basename(percorso).split("_contenuti")[0],
+            "data_originale_str": df.get("data_pubblicazione_iso"),
+            "testo": df[colonne].fillna("").astype(str).agg(" ".join, axis=1).str.strip()
+        }))
+    base = pd.concat(parti, ignore_index=True) if parti else pd.DataFrame()
+    return base[base["testo"] != ""].reset_index(drop=True) if not base.empty else base
+
+def _id_sintetici(inizio, n, rng, quota_ripetuti):
+    """Id 'sint_<posizione>'; una quota_ripetuti delle righe riprende l'id di una riga precedente qualsiasi."""
+    posizioni = np.arange(inizio, inizio + n)
+    ripetute = (rng.random(n) < quota_ripetuti) & (posizioni > 0)
+    posizioni[ripetute] = rng.integers(0, posizioni[ripetute])
+    return [f"sint_{i}" for i in posizioni]
+
+def _blocco_sintetico(base, inizio, n, rng, quota_ripetuti=0.0):
+    """n righe estratte dalla base con id univoci (salvo quota_ripetuti), date spostate fino a un anno e lingua casuale."""
+    scelte = base.iloc[rng.integers(0, len(base), size=n)].reset_index(drop=True)
+    date = pd.to_datetime(scelte["data_originale_str"], errors="coerce", utc=True)
+    date = date + pd.to_timedelta(rng.integers(-365, 366, size=n), unit="D")
+    return scelte.assign(
+        id_originale=_id_sintetici(inizio, n, rng, quota_ripetuti),
+        data_originale_str=date.dt.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+        lingua=rng.choice(np.array(["en", "it"], dtype=object), size=n)
+    )
+
+def scrivi_dati_sintetici(base, num_documenti, percorso_sentiment, percorso_topic, num_topic=20, seed=42, quota_ripetuti=0.0):
+    """
+    Scrive a blocchi i due input sintetici con num_documenti righe ciascuno: quello dell'indice principale
+    (sentiment) e quello dell'indice dei topic, già con le colonne prodotte da prepara_blocchi_topic.
+    Con quota_ripetuti alcune righe ripetono l'id di una riga precedente (come i message_id di Telegram).
+    """
+    rng = np.random.default_rng(seed)
+    for percorso in (percorso_sentiment, percorso_topic):
+        if os.path.exists(percorso):
+            os.remove(percorso)
+    for inizio in range(0, num_documenti, ES_SERIALIZE_CHUNK_ROWS):
+        blocco = _blocco_sintetico(base, inizio, min(ES_SERIALIZE_CHUNK_ROWS, num_documenti - inizio), rng, quota_ripetuti)
+        punteggi = rng.dirichlet([1.0, 1.0, 1.0], size=len(blocco)).astype(np.float32)
+        sentiment = pd.DataFrame({
+            "id_originale": blocco["id_originale"],
+            "fonte": blocco["fonte"],
+            "data_originale_str": blocco["data_originale_str"],
+            "lingua_rilevata": blocco["lingua"],
+            "testo_pulito_base": blocco["testo"],
+            "testo_lemmatizzato": blocco["testo"].str.lower(),
+            "sentiment_label": ETICHETTE_SENTIMENT[punteggi.argmax(axis=1)],
+            "sentiment_score_positive": punteggi[:, 0],
+            "sentiment_score_negative": punteggi[:, 1],
+            "sentiment_score_neutral": punteggi[:, 2]
+        })
+        topic_id = rng.integers(0, num_topic, size=len(blocco))
+        topic = pd.DataFrame({
+            "id_originale": blocco["id_originale"],
+            "fonte": blocco["fonte"],
+            "data_originale_str": blocco["data_originale_str"],
+            "testo_processato": blocco["testo"].str.lower(),
+            "topic_id": topic_id,
+            "topic_label": [f"Topic sintetico {t}" for t in topic_id],
+            "lingua": blocco["lingua"],
+            "versione_modello_lda": "benchmark"
+        })
+        intestazione = inizio == 0
+        sentiment.to_csv(percorso_sentiment, mode="w" if intestazione else "a", header=intestazione, index=False)
+        topic.to_csv(percorso_topic, mode="w" if intestazione else "a", header=intestazione, index=False)
+
+
+# --- MISURE ---
+def misura_serializzazione(crea_azioni):
+    """Lettura a blocchi e serializzazione delle azioni, senza invio: documenti e MB al secondo."""
+    inizio = time.perf_counter()
+    documenti, byte = 0, 0
+    hash_per_id = {}
+    for azione in crea_azioni():
+        documenti += 1
+        byte += len(azione["_source"])
+        hash_per_id[azione["_id"]] = azione[CAMPO_HASH]
+    durata = time.perf_counter() - inizio
+    return {
+        "documenti": documenti,
+        "secondi": round(durata, 3),
+        "documenti_al_secondo": round(documenti / max(durata, 1e-9), 1),
+        "mb_al_secondo": round(byte / 1e6 / max(durata, 1e-9), 2),
+        "byte_medi_per_documento": round(byte / max(documenti, 1), 1)
+    }, hash_per_id
+
+def manifest_simulato(hash_per_id, quota_modifiche, seed=42):
+    """
+    Stato precedente per la modalità incrementale: rispetto all'input attuale mancano, sono cambiati
+    e sono in più (da eliminare) circa quota_modifiche dei documenti ciascuno.
+    """
+    rng = np.random.default_rng(seed)
+    ids = list(hash_per_id)
+    n = int(len(ids) * quota_modifiche)
+    scelti = rng.permutation(len(ids))
+    precedenti = dict(hash_per_id)
+    for i in scelti[:n]:
+        del precedenti[ids[i]]
+    for i in scelti[n:2 * n]:
+        precedenti[ids[i]] = "hash_precedente"
+    precedenti.update({f"eliminato_{i}": "hash_precedente" for i in range(n)})
+    return precedenti
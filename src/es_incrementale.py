@@ -0,0 +1,155 @@
+# es_incrementale.py
+#
+# Indicizzazione incrementale: un manifest locale (SQLite) conserva, per l'indice fisico
+# a cui si riferisce, le coppie (_id, hash del contenuto) già indicizzate. A ogni esecuzione
+# si inviano solo i documenti nuovi (create), quelli modificati (index, cioè sostituzione
+# completa come in una ricostruzione) e le eliminazioni (delete) dei documenti spariti.
+# La riconciliazione confronta numero di documenti e checksum delle coppie (_id, hash)
+# tra lo stato atteso e quello presente nell'indice.
+# Il manifest registra anche l'impronta di mapping e impostazioni dell'indice: se cambiano, il delta
+# non basta (i campi nuovi avrebbero il tipo scelto dal mapping dinamico) e serve una ricostruzione.
+
+import hashlib
+import json
+import os
+import sqlite3
+
+from elasticsearch.helpers import scan
+
+from config import ES_MANIFEST_DIR
+from es_serializzazione import CAMPO_HASH
+
+MODULO_CHECKSUM = 2 ** 64
+
+
+def checksum_coppie(coppie):
+    """Checksum indipendente dall'ordine di un insieme di coppie (_id, hash)."""
+    totale = 0
+    for _id, h in coppie:
+        totale = (totale + int(hashlib.sha1(f"{_id}\x00{h}".encode("utf-8")).hexdigest()[:16], 16)) % MODULO_CHECKSUM
+    return f"{totale:016x}"
+
+def impronta_schema(mapping, impostazioni):
+    """Impronta di mapping e impostazioni dell'indice, indipendente dall'ordine delle chiavi."""
+    return hashlib.sha1(json.dumps({"mapping": mapping, "impostazioni": impostazioni}, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def percorso_manifest(alias):
+    return os.path.join(ES_MANIFEST_DIR, f"manifest_{alias}.sqlite")
+
+
+class ManifestIndice:
+    """Coppie (_id, hash) indicizzate, nome dell'indice fisico a cui si riferiscono e impronta del suo schema."""
+
+    def __init__(self, percorso):
+        self.connessione = sqlite3.connect(percorso)
+        self.connessione.executescript("""
+            CREATE TABLE IF NOT EXISTS documenti (id TEXT PRIMARY KEY, hash TEXT NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (chiave TEXT PRIMARY KEY, valore TEXT);
+        """)
+
+    def _meta(self, chiave):
+        riga = self.connessione.execute("SELECT valore FROM meta WHERE chiave = ?", (chiave,)).fetchone()
+        return riga[0] if riga else None
+
+    def indice(self):
+        return self._meta("indice")
+
+    def schema(self):
+        return self._meta("schema")
+
+    def documenti(self):
+        return dict(self.connessione.execute("SELECT id, hash FROM documenti"))
+
+    def sostituisci(self, indice, documenti, schema):
+        """Riscrive il manifest in un'unica transazione; schema è l'impronta di impronta_schema."""
+        with self.connessione:
+            self.connessione.execute("DELETE FROM documenti")
+            self.connessione.executemany("INSERT INTO documenti VALUES (?, ?)", documenti.items())
+            self.connessione.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [("indice", indice), ("schema", schema)])
+
+    def aggiorna(self, documenti, eliminati=()):
+        """Aggiunge o aggiorna alcune coppie (_id, hash) e rimuove gli _id eliminati, senza cambiare indice."""
+        with self.connessione:
+            self.connessione.executemany("INSERT OR REPLACE INTO documenti VALUES (?, ?)", documenti.items())
+            self.connessione.executemany("DELETE FROM documenti WHERE id = ?", ((_id,) for _id in eliminati))
+
+    def invalida(self):
+        """Scollega il manifest dall'indice: la prossima esecuzione ricostruirà da zero."""
+        with self.connessione:
+            self.connessione.execute("DELETE FROM meta WHERE chiave = 'indice'")
+
+    def chiudi(self):
+        self.connessione.close()
+
+
+class DeltaIncrementale:
+    """
+    Trasforma le azioni bulk complete di un caricamento (da azioni_da_blocchi) nelle sole azioni
+    necessarie rispetto al manifest. Con un manifest vuoto ogni documento è una creazione (ricostruzione completa).
+    """
+
+    def __init__(self, precedenti):
+        self.precedenti = precedenti
+        self.attuali = {}
+        self.conteggi = {"creati": 0, "aggiornati": 0, "invariati": 0, "eliminati": 0}
+
+    def azioni(self, azioni_complete, index_name):
+        """Le azioni mantengono il proprio _index; index_name serve per le eliminazioni (modalità incrementale, indice unico)."""
+        for azione in azioni_complete:
+            _id = azione["_id"]
+            h = azione[CAMPO_HASH]
+            gia_visto = _id in self.attuali
+            self.attuali[_id] = h
+            if gia_visto:
+                # _id ripetuto nell'input: come nella ricostruzione vince l'ultima occorrenza
+                yield {**azione, "_op_type": "index"}
+            elif _id not in self.precedenti:
+                self.conteggi["creati"] += 1
+                yield {**azione, "_op_type": "create"}
+            elif self.precedenti[_id] != h:
+                self.conteggi["aggiornati"] += 1
+                yield {**azione, "_op_type": "index"}
+            else:
+                self.conteggi["invariati"] += 1
+        for _id in self.precedenti.keys() - self.attuali.keys():
+            self.conteggi["eliminati"] += 1
+            yield {"_op_type": "delete", "_index": index_name, "_id": _id}
+
+    def stato_finale(self, errori):
+        """
+        Stato atteso dell'indice: per i documenti falliti resta quello precedente. L'errore di una copia
+        di un _id ripetuto diversa dall'ultima (riconosciuta dall'hash) non cambia lo stato finale.
+        """
+        stato = dict(self.attuali)
+        for _id in self.precedenti.keys() - self.attuali.keys():
+            stato.pop(_id, None)
+        for errore in errori:
+            dettagli = next(iter(errore.values()), {})
+            _id = dettagli.get("_id")
+            if _id is None:
+                continue
+            if _id in self.attuali and dettagli.get(CAMPO_HASH) not in (None, self.attuali[_id]):
+                continue
+            if _id in self.precedenti:
+                stato[_id] = self.precedenti[_id]
+            else:
+                stato.pop(_id, None)
+        return stato
+
+    def riepilogo(self):
+        c = self.conteggi
+        return f"Delta: {c['creati']} creati, {c['aggiornati']} aggiornati, {c['eliminati']} eliminati, {c['invariati']} invariati."
+
+
+def riconcilia(es_client, index_name, attesi):
+    """Confronta conteggio e checksum (_id, hash) dell'indice con lo stato atteso. Restituisce (ok, messaggio)."""
+    conteggio = es_client.count(index=index_name)["count"]
+    coppie_indice = (
+        (hit["_id"], hit.get("_source", {}).get(CAMPO_HASH))
+        for hit in scan(es_client, index=index_name, query={"query": {"match_all": {}}}, _source=[CAMPO_HASH], size=5000)
+    )
+    checksum_indice = checksum_coppie(coppie_indice)
+    checksum_atteso = checksum_coppie(attesi.items())
+    ok = conteggio == len(attesi) and checksum_indice == checksum_atteso
+    return ok, (f"{conteggio} documenti nell'indice contro {len(attesi)} attesi, "
+                f"checksum {checksum_indice} contro {checksum_atteso}")
@@ -0,0 +1,495 @@
+# es_indexing.py
+#
+# Connessione e indicizzazione bulk condivise dagli indexer Elasticsearch.
+# Il client usa un pool di connessioni e la compressione HTTP; i documenti sono inviati
+# con parallel_bulk (più richieste in volo) o streaming_bulk, con chunk configurabili
+# e report periodico dei documenti al secondo.
+# Gli indici vengono creati in profilo di caricamento e riportati alle impostazioni di
+# produzione solo a caricamento concluso (vedi crea_indice_per_caricamento e finalizza_indice).
+# I documenti rifiutati in modo transitorio sono ritentati con backoff e jitter; quelli che falliscono
+# definitivamente sono scritti in un file di dead letter (DeadLetter) da cui possono essere reinviati.
+# Le azioni con il "_source" già serializzato in byte (es_serializzazione.py) sono inviate senza ricodifica.
+# I nomi degli indici in config.py sono alias: ogni caricamento scrive una nuova generazione
+# e l'alias passa a quest'ultima solo dopo la validazione (vedi pubblica_generazione).
+# Una generazione può essere partizionata per mese (ES_MONTHLY_PARTITIONS): l'alias copre tutte le partizioni.
+
+import json
+import os
+import random
+import re
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from itertools import islice
+
+from elasticsearch import Elasticsearch
+from elasticsearch.helpers import expand_action, parallel_bulk, streaming_bulk
+
+from config import (
+    ELASTICSEARCH_HOST,
+    ELASTIC_USER,
+    ELASTIC_PASSWORD,
+    ES_BULK_MODE,
+    ES_BULK_THREADS,
+    ES_BULK_QUEUE_SIZE,
+    ES_BULK_CHUNK_SIZE,
+    ES_BULK_MAX_CHUNK_BYTES,
+    ES_HTTP_COMPRESS,
+    ES_CONNECTIONS_PER_NODE,
+    ES_REQUEST_TIMEOUT,
+    ES_BULK_LOAD_TRANSLOG_FLUSH_THRESHOLD,
+    ES_INDEX_PRODUCTION_REPLICAS,
+    ES_INDEX_PRODUCTION_REFRESH_INTERVAL,
+    ES_FORCE_MERGE_AFTER_LOAD,
+    ES_FORCE_MERGE_TIMEOUT,
+    ES_ALIAS_KEEP_GENERATIONS,
+    ES_ALIAS_MIN_COUNT_RATIO,
+    ES_ALIAS_MAX_FAILED_DOCS,
+    ES_RETRY_STATUSES,
+    ES_RETRY_MAX_ATTEMPTS,
+    ES_RETRY_BACKOFF_S,
+    ES_RETRY_MAX_BACKOFF_S,
+    ES_DEAD_LETTER_DIR
+)
+from es_serializzazione import CAMPO_HASH, PARTIZIONE_SENZA_DATA
+
+MODALITA_PARALLEL = "parallel"
+MODALITA_STREAMING = "streaming"
+PRIORITA_TEMPLATE_PARTIZIONI = 500 # Sopra i template generici del cluster che corrispondono allo stesso nome
+CHUNK_PER_THREAD_BLOCCO = 4 # In modalità parallela un blocco (vedi indicizza_documenti) tiene occupati tutti i thread
+
+# Durante il caricamento: nessun refresh, nessuna replica da scrivere, fsync del translog non a ogni richiesta
+IMPOSTAZIONI_CARICAMENTO = {
+    "refresh_interval": "-1",
+    "number_of_replicas": 0,
+    "translog": {"durability": "async", "flush_threshold_size": ES_BULK_LOAD_TRANSLOG_FLUSH_THRESHOLD}
+}
+IMPOSTAZIONI_PRODUZIONE = {
+    "refresh_interval": ES_INDEX_PRODUCTION_REFRESH_INTERVAL,
+    "number_of_replicas": ES_INDEX_PRODUCTION_REPLICAS,
+    "translog": {"durability": "request", "flush_threshold_size": None} # None = default del cluster
+}
+
+
+class TempiFasi:
+    """Durata delle fasi di un'indicizzazione (creazione, caricamento, ripristino, refresh, force-merge)."""
+
+    def __init__(self):
+        self.tempi = {}
+
+    @contextmanager
+    def fase(self, nome):
+        inizio = time.time()
+        try:
+            yield
+        finally:
+            self.tempi[nome] = time.time() - inizio
+
+    def riepilogo(self):
+        righe = [f"  {nome:<28} {secondi:>9.2f} s" for nome, secondi in self.tempi.items()]
+        return "Tempi per fase:\n" + "\n".join(righe) + f"\n  {'totale':<28} {sum(self.tempi.values()):>9.2f} s"
+
+
+def connetti_a_elasticsearch():
+    """Tenta di connettersi a un'istanza Elasticsearch sicura (HTTPS)."""
+    print(f"Tentativo di connessione sicura (HTTPS) a Elasticsearch su {ELASTICSEARCH_HOST}...")
+    try:
+        es_client = Elasticsearch(
+            hosts=[ELASTICSEARCH_HOST],
+            basic_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
+            verify_certs=False,
+            http_compress=ES_HTTP_COMPRESS,
+            connections_per_node=ES_CONNECTIONS_PER_NODE,
+            request_timeout=ES_REQUEST_TIMEOUT
+        )
+        es_client.info()
+        print("Connessione a Elasticsearch riuscita!")
+        return es_client
+    except Exception as e:
+        print(f"ERRORE DI CONNESSIONE: {e}")
+        return None
+
+
+def espandi_azione(azione):
+    """
+    Come helpers.expand_action, ma un "_source" in byte è passato così com'è: il serializer del client
+    non ricodifica i byte. Le chiavi non di metadati (es. l'hash del contenuto) non vengono inviate.
+    """
+    sorgente = azione.get("_source")
+    if not isinstance(sorgente, bytes):
+        return expand_action(azione)
+    op_type = azione.get("_op_type", "index")
+    return {op_type: {"_index": azione["_index"], "_id": azione["_id"]}}, sorgente
+
+
+# --- ERRORI, TENTATIVI E DEAD LETTER ---
+def dettagli_errore(info):
+    """Dettagli di un elemento fallito ({'index'|'create'|'delete': {...}})."""
+    return next(iter(info.values()), {})
+
+def eliminazione_assente(info):
+    """Eliminazione di un documento già assente: lo stato finale è quello voluto, non è un errore."""
+    return info.get("delete", {}).get("status") == 404
+
+def ritentabile(info):
+    dettagli = dettagli_errore(info)
+    errore = dettagli.get("error")
+    tipo = errore.get("type") if isinstance(errore, dict) else str(errore or "")
+    return dettagli.get("status") in ES_RETRY_STATUSES or "es_rejected_execution_exception" in tipo
+
+def categoria_errore(info):
+    """Categoria di un errore per il riepilogo, es. 'mapper_parsing_exception (400)'."""
+    dettagli = dettagli_errore(info)
+    errore = dettagli.get("error")
+    tipo = errore.get("type", "sconosciuto") if isinstance(errore, dict) else "errore di richiesta"
+    return f"{tipo} ({dettagli.get('status', 'N/A')})"
+
+def riepilogo_errori(errori):
+    conteggi = Counter(categoria_errore(info) for info in errori)
+    return "Errori per categoria:\n" + "\n".join(f"  {categoria:<50} {n:>8}" for categoria, n in conteggi.most_common())
+
+def attesa_backoff(tentativo, base=ES_RETRY_BACKOFF_S, massimo=ES_RETRY_MAX_BACKOFF_S):
+    """Backoff esponenziale con jitter completo: attesa casuale tra 0 e base * 2^tentativo (al più massimo)."""
+    return random.uniform(0, min(massimo, base * 2 ** tentativo))
+
+
+class DeadLetter:
+    """
+    File NDJSON dei documenti falliti definitivamente: una riga per documento con l'azione bulk
+    (_op_type, _index, _id, _source), l'alias di destinazione e l'errore. Il file viene creato solo
+    al primo documento fallito; 04_rigioca_dead_letter.py lo reinvia.
+    """
+
+    creati = 0
+
+    def __init__(self, alias, cartella=ES_DEAD_LETTER_DIR):
+        self.alias = alias
+        # pid e contatore: più dead letter aperti nello stesso secondo (anche da processi diversi) non si sovrascrivono
+        DeadLetter.creati += 1
+        self.percorso = os.path.join(cartella, f"{alias}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{DeadLetter.creati}.ndjson")
+        self.file = None
+        self.scritti = 0
+
+    def registra(self, azione, info):
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.percorso), exist_ok=True)
+            self.file = open(self.percorso, "xb")
+        dettagli = dettagli_errore(info)
+        testata = {
+            "_op_type": azione.get("_op_type", "index"),
+            "_index": azione.get("_index"),
+            "_id": azione.get("_id"),
+            "alias": self.alias,
+            "errore": {"status": dettagli.get("status"), "error": dettagli.get("error"), "categoria": categoria_errore(info)}
+        }
+        riga = json.dumps(testata, ensure_ascii=False, default=str).encode("utf-8")
+        sorgente = azione.get("_source")
+        if sorgente is not None:
+            if not isinstance(sorgente, bytes):
+                sorgente = json.dumps(sorgente, ensure_ascii=False, default=str).encode("utf-8")
+            riga = riga[:-1] + b',"_source":' + sorgente + b"}"
+        self.file.write(riga + b"\n")
+        self.scritti += 1
+
+    def chiudi(self):
+        if self.file is not None:
+            self.file.close()
+            print(f"{self.scritti} documenti falliti salvati nel dead letter '{self.percorso}'.")
+
+
+# --- INDICIZZAZIONE ---
+def _risultati_in_ordine(es_client, azioni, modalita, thread, chunk_size, max_chunk_bytes):
+    """
+    Genera (azione, ok, info) per ogni azione. Gli helpers bulk restituiscono i risultati nell'ordine
+    delle azioni, quindi basta una coda delle azioni già consegnate all'helper e non ancora confermate.
+    """
+    consegnate = deque()
+
+    def registra():
+        for azione in azioni:
+            consegnate.append(azione)
+            yield azione
+
+    if modalita == MODALITA_PARALLEL:
+        risultati = parallel_bulk(
+            es_client, registra(), thread_count=thread, queue_size=ES_BULK_QUEUE_SIZE,
+            chunk_size=chunk_size, max_chunk_bytes=max_chunk_bytes, expand_action_callback=espandi_azione,
+            raise_on_error=False, raise_on_exception=False
+        )
+    else:
+        risultati = streaming_bulk(
+            es_client, registra(), chunk_size=chunk_size, max_chunk_bytes=max_chunk_bytes, expand_action_callback=espandi_azione,
+            raise_on_error=False, raise_on_exception=False
+        )
+    for ok, info in risultati:
+        yield consegnate.popleft(), ok, info
+
+def azioni_superate(azioni):
+    """
+    Posizioni delle azioni seguite da un'altra azione sullo stesso _id (vince l'ultima, come in una ricostruzione).
+    Le azioni di una chiamata vanno tutte alla stessa generazione: il confronto usa solo l'_id, anche tra partizioni.
+    """
+    ultime = {azione.get("_id"): i for i, azione in enumerate(azioni)}
+    return {i for i, azione in enumerate(azioni) if azione.get("_id") is not None and ultime[azione["_id"]] != i}
+
+def registra_fallimento(errori, azione, info, dead_letter=None):
+    """
+    Aggiunge l'errore alla lista (con l'hash della copia fallita, per DeltaIncrementale.stato_finale)
+    e lo registra nel dead letter, se indicato.
+    """
+    dettagli = dettagli_errore(info)
+    if isinstance(dettagli, dict) and azione.get(CAMPO_HASH) is not None:
+        dettagli.setdefault(CAMPO_HASH, azione[CAMPO_HASH])
+    errori.append(info)
+    if dead_letter is not None:
+        dead_letter.registra(azione, info)
+
+def indicizza_documenti(es_client, azioni, modalita=ES_BULK_MODE, thread=ES_BULK_THREADS,
+                        chunk_size=ES_BULK_CHUNK_SIZE, max_chunk_bytes=ES_BULK_MAX_CHUNK_BYTES,
+                        ogni_n_documenti=10000, dead_letter=None, max_tentativi=ES_RETRY_MAX_ATTEMPTS):
+    """
+    Invia le azioni bulk e restituisce (documenti indicizzati, lista degli errori), come helpers.bulk
+    con raise_on_error=False. Ogni ogni_n_documenti stampa l'avanzamento e i documenti al secondo.
+    Le azioni sono lette a blocchi (un chunk, o CHUNK_PER_THREAD_BLOCCO chunk per thread in modalità parallela):
+    i documenti di un blocco rifiutati in modo transitorio sono reinviati con backoff, fino a max_tentativi
+    volte, prima di leggere il blocco successivo. Così la memoria resta limitata e il flusso rallenta quando
+    il cluster è sotto pressione. Di un _id ripetuto nel blocco si invia solo l'ultima copia: i chunk di un
+    blocco viaggiano in parallelo e l'ordine di arrivo delle copie non sarebbe garantito; tra blocchi
+    successivi l'ordine è quello dell'input. Quelli falliti definitivamente sono registrati nel dead_letter, se indicato.
+    """
+    if modalita == MODALITA_PARALLEL:
+        print(f"Indicizzazione parallela: {thread} thread, chunk da {chunk_size} documenti / {max_chunk_bytes // 1024} KB.")
+        dimensione_blocco = chunk_size * thread * CHUNK_PER_THREAD_BLOCCO
+    elif modalita == MODALITA_STREAMING:
+        print(f"Indicizzazione in streaming: chunk da {chunk_size} documenti / {max_chunk_bytes // 1024} KB.")
+        dimensione_blocco = chunk_size
+    else:
+        raise ValueError(f"Modalità di indicizzazione sconosciuta '{modalita}'. Disponibili: {[MODALITA_PARALLEL, MODALITA_STREAMING]}")
+
+    successi = 0
+    errori = []
+    ritentati = 0
+
+    def fallito(azione, info):
+        registra_fallimento(errori, azione, info, dead_letter)
+
+    def invia(blocco):
+        """Invia il blocco; restituisce le azioni rifiutate in modo transitorio, con il loro errore."""
+        nonlocal successi
+        rifiutati = []
+        for azione, ok, info in _risultati_in_ordine(es_client, blocco, modalita, thread, chunk_size, max_chunk_bytes):
+            if ok or eliminazione_assente(info):
+                successi += 1
+            elif ritentabile(info):
+                rifiutati.append((azione, info))
+            else:
+                fallito(azione, info)
+        return rifiutati
+
+    start_time = time.time()
+    prossimo_report = ogni_n_documenti
+    azioni = iter(azioni)
+    while True:
+        blocco = list(islice(azioni, dimensione_blocco))
+        if not blocco:
+            break
+        superate = azioni_superate(blocco)
+        successi += len(superate) # sostituite dall'ultima copia dello stesso _id nel blocco
+        rifiutati = invia([azione for i, azione in enumerate(blocco) if i not in superate] if superate else blocco)
+        for tentativo in range(max_tentativi):
+            if not rifiutati:
+                break
+            ritentati += len(rifiutati)
+            time.sleep(attesa_backoff(tentativo))
+            rifiutati = invia([azione for azione, _ in rifiutati])
+        for azione, info in rifiutati: # ancora rifiutati dopo l'ultimo tentativo
+            fallito(azione, info)
+
+        elaborati = successi + len(errori)
+        if elaborati >= prossimo_report:
+            elapsed_time = time.time() - start_time
+            print(f"  Indicizzati {elaborati} documenti ({len(errori)} errori, {ritentati} reinvii)... (Tempo trascorso: {elapsed_time:.2f} secondi, {elaborati / max(elapsed_time, 1e-9):.0f} doc/s)")
+            prossimo_report = (elaborati // ogni_n_documenti + 1) * ogni_n_documenti
+
+    elapsed_time = time.time() - start_time
+    print(f"Indicizzazione terminata: {successi + len(errori)} documenti in {elapsed_time:.2f} secondi ({(successi + len(errori)) / max(elapsed_time, 1e-9):.0f} doc/s, {ritentati} reinvii).")
+    if errori:
+        print(riepilogo_errori(errori))
+    return successi, errori
+
+
+def _impostazioni_caricamento(impostazioni):
+    return {**IMPOSTAZIONI_CARICAMENTO, **(impostazioni or {})}
+
+def crea_indice_per_caricamento(es_client, index_name, mapping, impostazioni=None):
+    """Crea l'indice con il mapping indicato, le impostazioni di caricamento bulk e quelle aggiuntive (analisi, ordinamento)."""
+    print(f"Creazione del nuovo indice '{index_name}' con mapping (profilo di caricamento: refresh disattivato, 0 repliche)...")
+    es_client.indices.create(index=index_name, mappings=mapping, settings=_impostazioni_caricamento(impostazioni))
+
+def crea_modello_partizioni(es_client, nome, mapping, impostazioni=None):
+    """
+    Generazione partizionata per mese: un index template per '<nome>-*' fa nascere ogni partizione
+    (es. '<nome>-2024.01') al primo documento, con lo stesso mapping e profilo di caricamento.
+    """
+    print(f"Creazione del template delle partizioni mensili '{nome}-*' (profilo di caricamento)...")
+    es_client.indices.put_index_template(
+        name=nome, index_patterns=[f"{nome}-*"], priority=PRIORITA_TEMPLATE_PARTIZIONI,
+        template={"mappings": mapping, "settings": _impostazioni_caricamento(impostazioni)}
+    )
+
+def elimina_modello_partizioni(es_client, nome):
+    """Il template serve solo durante il caricamento: partizioni create dopo non devono ereditarne il profilo."""
+    es_client.indices.delete_index_template(name=nome)
+
+def prepara_generazione(es_client, alias, mapping, impostazioni=None, partizionata=False):
+    """Crea la nuova generazione dell'alias (indice unico o template delle partizioni mensili) e ne restituisce il nome."""
+    nome = nome_generazione(alias)
+    if partizionata:
+        crea_modello_partizioni(es_client, nome, mapping, impostazioni)
+    else:
+        crea_indice_per_caricamento(es_client, nome, mapping, impostazioni)
+    return nome
+
+def finalizza_indice(es_client, index_name, tempi, force_merge=ES_FORCE_MERGE_AFTER_LOAD):
+    """
+    Un solo refresh, force-merge opzionale a un segmento e ripristino delle impostazioni di produzione.
+    Il force-merge precede il ripristino delle repliche: le repliche vengono costruite copiando
+    i segmenti già uniti invece di ripetere il merge. index_name può essere anche una lista di indici.
+    """
+    with tempi.fase("refresh"):
+        es_client.indices.refresh(index=index_name)
+    if force_merge:
+        with tempi.fase("force-merge"):
+            print(f"Force-merge di '{index_name}' a un segmento...")
+            es_client.options(request_timeout=ES_FORCE_MERGE_TIMEOUT).indices.forcemerge(index=index_name, max_num_segments=1)
+    with tempi.fase("ripristino impostazioni"):
+        print(f"Ripristino delle impostazioni di produzione su '{index_name}' "
+              f"(refresh {ES_INDEX_PRODUCTION_REFRESH_INTERVAL}, {ES_INDEX_PRODUCTION_REPLICAS} repliche)...")
+        es_client.indices.put_settings(index=index_name, settings=IMPOSTAZIONI_PRODUZIONE)
+
+
+def finalizza_generazione(es_client, alias, nome, tempi, partizionata=False):
+    """Finalizza tutti gli indici della generazione (rimuovendo prima il template delle partizioni) e li restituisce."""
+    if partizionata:
+        elimina_modello_partizioni(es_client, nome)
+    indici = indici_di_generazione(es_client, alias, nome)
+    if partizionata:
+        print(f"Generazione '{nome}' caricata in {len(indici)} partizioni mensili.")
+    if indici: # una lista vuota coinvolgerebbe tutti gli indici del cluster
+        finalizza_indice(es_client, indici, tempi)
+    return indici
+
+
+# --- GENERAZIONI E ALIAS ---
+# Una generazione è un indice unico '<alias>-<timestamp>' oppure, se partizionata per mese,
+# l'insieme degli indici '<alias>-<timestamp>-<aaaa.mm>' (più '<alias>-<timestamp>-senza-data').
+def nome_generazione(alias):
+    """Nome della nuova generazione per l'alias, es. 'semantic_tesi-20240131-235959'."""
+    return f"{alias}-{time.strftime('%Y%m%d-%H%M%S')}"
+
+def _schema_indici(alias):
+    return re.compile(rf"^({re.escape(alias)}-\d{{8}}-\d{{6}})(-\d{{4}}\.\d{{2}}|-{PARTIZIONE_SENZA_DATA})?$")
+
+def generazione_e_partizione(alias, indice):
+    """
+    Generazione e suffisso della partizione di un indice fisico dell'alias, es. ('semantic_tesi-20240131-235959', '-2024.01');
+    il suffisso è vuoto per una generazione non partizionata. None se il nome non è di una generazione dell'alias.
+    """
+    corrispondenza = _schema_indici(alias).match(indice or "")
+    return (corrispondenza.group(1), corrispondenza.group(2) or "") if corrispondenza else None
+
+def indici_per_generazione(es_client, alias):
+    """Indici fisici dell'alias raggruppati per generazione, dalla più vecchia alla più recente (il timestamp è ordinabile)."""
+    indici = es_client.indices.get(index=f"{alias}-*", expand_wildcards="open,closed", ignore_unavailable=True)
+    per_generazione = {}
+    for indice in indici:
+        parti = generazione_e_partizione(alias, indice)
+        if parti:
+            per_generazione.setdefault(parti[0], []).append(indice)
+    return {nome: sorted(per_generazione[nome]) for nome in sorted(per_generazione)}
+
+def generazioni(es_client, alias):
+    """Generazioni dell'alias, dalla più vecchia alla più recente."""
+    return list(indici_per_generazione(es_client, alias))
+
+def indici_di_generazione(es_client, alias, nome):
+    """Indici fisici di una generazione (uno solo se non partizionata)."""
+    return indici_per_generazione(es_client, alias).get(nome, [])
+
+def indici_attivi(es_client, alias):
+    """Indici a cui punta l'alias (vuoto se l'alias non esiste ancora)."""
+    if not es_client.indices.exists_alias(name=alias):
+        return []
+    return list(es_client.indices.get_alias(name=alias).keys())
+
+def valida_generazione(es_client, alias, nome, errori):
+    """
+    La nuova generazione è pubblicabile se contiene documenti, se i documenti falliti non superano
+    ES_ALIAS_MAX_FAILED_DOCS e se non ne ha meno di ES_ALIAS_MIN_COUNT_RATIO rispetto a quella attiva.
+    Restituisce (valida, messaggio).
+    """
+    indici = indici_di_generazione(es_client, alias, nome)
+    if not indici:
+        return False, f"nessun indice per la generazione '{nome}'"
+    conteggio = es_client.count(index=indici)["count"]
+    if conteggio == 0:
+        return False, f"la generazione '{nome}' è vuota"
+    if len(errori) > ES_ALIAS_MAX_FAILED_DOCS:
+        return False, f"{len(errori)} documenti falliti (massimo tollerato: {ES_ALIAS_MAX_FAILED_DOCS})"
+    attivi = indici_attivi(es_client, alias)
+    if attivi:
+        conteggio_attivo = es_client.count(index=alias)["count"]
+        if conteggio < ES_ALIAS_MIN_COUNT_RATIO * conteggio_attivo:
+            return False, (f"{conteggio} documenti contro {conteggio_attivo} della generazione attiva "
+                           f"(minimo {ES_ALIAS_MIN_COUNT_RATIO:.0%})")
+        return True, f"{conteggio} documenti (generazione attiva: {conteggio_attivo})"
+    return True, f"{conteggio} documenti"
+
+def pubblica_generazione(es_client, alias, nome, errori, tempi):
+    """
+    Valida la nuova generazione e sposta l'alias su di essa con un'unica chiamata atomica,
+    poi elimina le generazioni in eccesso. Un indice legacy con lo stesso nome dell'alias
+    (creato prima dell'uso degli alias) viene rimosso nella stessa chiamata.
+    Una generazione che non supera la validazione viene eliminata. Restituisce True se l'alias è stato spostato.
+    """
+    with tempi.fase("validazione"):
+        valida, messaggio = valida_generazione(es_client, alias, nome, errori)
+    if not valida:
+        print(f"VALIDAZIONE FALLITA per '{nome}': {messaggio}. L'alias '{alias}' resta sulla generazione attuale.")
+        elimina_generazione_non_pubblicata(es_client, alias, nome, "validazione fallita")
+        return False
+    print(f"Validazione superata per '{nome}': {messaggio}.")
+
+    with tempi.fase("cambio alias"):
+        azioni = [{"remove": {"index": attivo, "alias": alias}} for attivo in indici_attivi(es_client, alias)]
+        if es_client.indices.exists(index=alias) and not es_client.indices.exists_alias(name=alias):
+            print(f"  L'indice legacy '{alias}' verrà sostituito dall'alias.")
+            azioni.append({"remove_index": {"index": alias}})
+        indici = indici_di_generazione(es_client, alias, nome)
+        azioni.append({"add": {"indices": indici, "alias": alias}})
+        es_client.indices.update_aliases(actions=azioni)
+    print(f"Alias '{alias}' spostato su '{nome}' ({len(indici)} indici).")
+
+    with tempi.fase("pulizia generazioni"):
+        elimina_vecchie_generazioni(es_client, alias)
+    return True
+
+def elimina_generazione_non_pubblicata(es_client, alias, nome, motivo):
+    """
+    Elimina una generazione scartata (mai quella attiva): altrimenti occuperebbe uno dei posti di
+    ES_ALIAS_KEEP_GENERATIONS e al caricamento successivo farebbe eliminare la generazione del rollback.
+    """
+    indici = indici_di_generazione(es_client, alias, nome)
+    if not indici or set(indici_attivi(es_client, alias)).intersection(indici):
+        return
+    es_client.indices.delete(index=indici)
+    print(f"  Eliminata la generazione non pubblicata '{nome}' ({len(indici)} indici): {motivo}.")
+
+def elimina_vecchie_generazioni(es_client, alias, da_tenere=ES_ALIAS_KEEP_GENERATIONS):
+    """Elimina le generazioni più vecchie oltre le da_tenere più recenti (mai quella attiva)."""
+    attivi = set(indici_attivi(es_client, alias))
+    per_generazione = indici_per_generazione(es_client, alias)
+    vecchie = [nome for nome in list(per_generazione)[:-da_tenere] if not attivi.intersection(per_generazione[nome])]
+    for nome in vecchie:
+        es_client.indices.delete(index=per_generazione[nome])
+        print(f"  Eliminata la generazione '{nome}' ({len(per_generazione[nome])} indici).")
@@ -0,0 +1,210 @@
+# es_indexing_async.py
+#
+# Indicizzazione asincrona con AsyncElasticsearch e async_streaming_bulk.
+# Un produttore legge e serializza i documenti in un thread e accoda chunk pronti (coda limitata:
+# se l'invio rallenta, rallenta anche la lettura). Ogni chunk è inviato da un task separato e il
+# numero di richieste in volo è regolato da ConcorrenzaAdattiva: si dimezza quando il cluster
+# rifiuta documenti (429 / es_rejected_execution_exception) e cresce di uno dopo un giro completo
+# di richieste senza rifiuti. I documenti rifiutati sono ritentati con backoff esponenziale e jitter
+# e quelli falliti definitivamente vanno nel dead letter, come in indicizza_documenti.
+
+import asyncio
+import itertools
+import time
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_streaming_bulk
+
+from config import (
+    ELASTICSEARCH_HOST,
+    ELASTIC_USER,
+    ELASTIC_PASSWORD,
+    ES_BULK_CHUNK_SIZE,
+    ES_BULK_MAX_CHUNK_BYTES,
+    ES_HTTP_COMPRESS,
+    ES_REQUEST_TIMEOUT,
+    ES_ASYNC_INITIAL_IN_FLIGHT,
+    ES_ASYNC_MIN_IN_FLIGHT,
+    ES_ASYNC_MAX_IN_FLIGHT,
+    ES_ASYNC_QUEUE_CHUNKS,
+    ES_RETRY_MAX_ATTEMPTS
+)
+from es_indexing import (
+    espandi_azione,
+    eliminazione_assente,
+    ritentabile,
+    attesa_backoff,
+    riepilogo_errori,
+    azioni_superate,
+    registra_fallimento
+)
+
+
+def connetti_async(host=ELASTICSEARCH_HOST):
+    """
+    Client asincrono con le stesse credenziali del client sincrono e una connessione per richiesta in volo.
+    Il trasporto non ritenta le risposte 429 (riproverebbe subito, senza backoff): arrivano a
+    indicizza_documenti_async, che riduce la concorrenza e ritenta i documenti con attesa_backoff.
+    """
+    return AsyncElasticsearch(
+        hosts=[host],
+        basic_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
+        verify_certs=False,
+        http_compress=ES_HTTP_COMPRESS,
+        connections_per_node=ES_ASYNC_MAX_IN_FLIGHT,
+        request_timeout=ES_REQUEST_TIMEOUT,
+        retry_on_status=()
+    )
+
+
+class ConcorrenzaAdattiva:
+    """Limite alle richieste in volo, con crescita additiva e riduzione moltiplicativa."""
+
+    def __init__(self, iniziale=ES_ASYNC_INITIAL_IN_FLIGHT, minimo=ES_ASYNC_MIN_IN_FLIGHT, massimo=ES_ASYNC_MAX_IN_FLIGHT):
+        self.minimo = minimo
+        self.massimo = massimo
+        self.limite = max(minimo, min(iniziale, massimo))
+        self.in_volo = 0
+        self.senza_rifiuti = 0
+        self.riduzioni = 0
+        self.picco = self.limite
+        self.condizione = asyncio.Condition()
+
+    async def acquisisci(self):
+        async with self.condizione:
+            await self.condizione.wait_for(lambda: self.in_volo < self.limite)
+            self.in_volo += 1
+
+    async def rilascia(self, rifiutato):
+        async with self.condizione:
+            self.in_volo -= 1
+            if rifiutato:
+                self.limite = max(self.minimo, self.limite // 2)
+                self.senza_rifiuti = 0
+                self.riduzioni += 1
+            else:
+                self.senza_rifiuti += 1
+                if self.senza_rifiuti >= self.limite and self.limite < self.massimo:
+                    self.limite += 1
+                    self.senza_rifiuti = 0
+                    self.picco = max(self.picco, self.limite)
+            self.condizione.notify_all()
+
+
+async def _invia_chunk(client, chunk):
+    """Invia un chunk; restituisce (successi, errori, rifiutate da ritentare), con errori e rifiutate come coppie (azione, info)."""
+    successi, errori, rifiutate = 0, [], []
+    risultati = async_streaming_bulk(
+        client, chunk, chunk_size=len(chunk), max_chunk_bytes=ES_BULK_MAX_CHUNK_BYTES,
+        expand_action_callback=espandi_azione, max_retries=0,
+        raise_on_error=False, raise_on_exception=False
+    )
+    posizione = 0
+    async for ok, info in risultati: # i risultati seguono l'ordine delle azioni del chunk
+        azione = chunk[posizione]
+        posizione += 1
+        if ok or eliminazione_assente(info):
+            successi += 1
+        elif ritentabile(info):
+            rifiutate.append((azione, info))
+        else:
+            errori.append((azione, info))
+    return successi, errori, rifiutate
+
+async def _produttore(azioni, coda, chunk_size):
+    """Legge e serializza i chunk in un thread, per non bloccare il ciclo di eventi."""
+    iteratore = iter(azioni)
+    try:
+        while True:
+            chunk = await asyncio.to_thread(lambda: list(itertools.islice(iteratore, chunk_size)))
+            if not chunk:
+                break
+            await coda.put(chunk)
+    finally:
+        await coda.put(None) # anche in caso di errore, che viene poi sollevato da gather
+
+async def indicizza_documenti_async(client, azioni, chunk_size=ES_BULK_CHUNK_SIZE, concorrenza=None, ogni_n_documenti=10000,
+                                    dead_letter=None, max_tentativi=ES_RETRY_MAX_ATTEMPTS):
+    """
+    Invia le azioni bulk con concorrenza adattiva. Restituisce (documenti indicizzati, lista degli errori)
+    come indicizza_documenti; i documenti ancora rifiutati dopo max_tentativi tentativi sono errori.
+    Di un _id ripetuto nel chunk si invia solo l'ultima copia, e un chunk con _id ancora in sospeso in
+    un altro chunk (in volo o in attesa di un nuovo tentativo) parte solo quando quello è concluso:
+    così una copia ritentata non sovrascrive mai una copia successiva già indicizzata.
+    """
+    concorrenza = concorrenza or ConcorrenzaAdattiva()
+    coda = asyncio.Queue(maxsize=ES_ASYNC_QUEUE_CHUNKS)
+    stato = {"successi": 0, "errori": [], "ritentati": 0, "prossimo_report": ogni_n_documenti}
+    start_time = time.time()
+    print(f"Indicizzazione asincrona: chunk da {chunk_size} documenti, richieste in volo tra "
+          f"{concorrenza.minimo} e {concorrenza.massimo} (iniziali {concorrenza.limite}).")
+
+    in_sospeso = set() # _id dei chunk in volo o in attesa di un nuovo tentativo
+    liberati = asyncio.Condition()
+
+    def fallito(azione, info):
+        registra_fallimento(stato["errori"], azione, info, dead_letter)
+
+    async def invia(chunk, tentativo):
+        try:
+            successi, errori, rifiutate = await _invia_chunk(client, chunk)
+        except BaseException:
+            await concorrenza.rilascia(rifiutato=False)
+            raise
+        await concorrenza.rilascia(rifiutato=bool(rifiutate))
+        stato["successi"] += successi
+        for azione, info in errori:
+            fallito(azione, info)
+        elaborati = stato["successi"] + len(stato["errori"])
+        if elaborati >= stato["prossimo_report"]:
+            elapsed_time = time.time() - start_time
+            print(f"  Indicizzati {elaborati} documenti ({len(stato['errori'])} errori, {stato['ritentati']} ritentati, "
+                  f"{concorrenza.limite} richieste in volo)... ({elapsed_time:.2f} secondi, {elaborati / max(elapsed_time, 1e-9):.0f} doc/s)")
+            stato["prossimo_report"] += ogni_n_documenti
+        if not rifiutate:
+            return
+        if tentativo >= max_tentativi:
+            for azione, info in rifiutate:
+                fallito(azione, info)
+            return
+        stato["ritentati"] += len(rifiutate)
+        await asyncio.sleep(attesa_backoff(tentativo))
+        await concorrenza.acquisisci()
+        await invia([azione for azione, _ in rifiutate], tentativo + 1)
+
+    async def invia_e_libera(chunk, ids):
+        try:
+            await invia(chunk, 0)
+        finally:
+            async with liberati:
+                in_sospeso.difference_update(ids)
+                liberati.notify_all()
+
+    produttore = asyncio.create_task(_produttore(azioni, coda, chunk_size))
+    in_volo = set()
+    while True:
+        chunk = await coda.get()
+        if chunk is None:
+            break
+        superate = azioni_superate(chunk)
+        if superate:
+            stato["successi"] += len(superate) # sostituite dall'ultima copia dello stesso _id nel chunk
+            chunk = [azione for i, azione in enumerate(chunk) if i not in superate]
+        ids = {azione.get("_id") for azione in chunk} - {None}
+        async with liberati:
+            await liberati.wait_for(lambda: in_sospeso.isdisjoint(ids))
+            in_sospeso.update(ids)
+        await concorrenza.acquisisci()
+        task = asyncio.create_task(invia_e_libera(chunk, ids))
+        in_volo.add(task)
+        task.add_done_callback(in_volo.discard)
+    await asyncio.gather(produttore, *list(in_volo))
+
+    elapsed_time = time.time() - start_time
+    elaborati = stato["successi"] + len(stato["errori"])
+    print(f"Indicizzazione terminata: {elaborati} documenti in {elapsed_time:.2f} secondi ({elaborati / max(elapsed_time, 1e-9):.0f} doc/s); "
+          f"{stato['ritentati']} documenti ritentati, {concorrenza.riduzioni} riduzioni della concorrenza, "
+          f"massimo {concorrenza.picco} richieste in volo.")
+    if stato["errori"]:
+        print(riepilogo_errori(stato["errori"]))
+    return stato["successi"], stato["errori"]
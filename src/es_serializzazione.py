@@ -0,0 +1,111 @@
+# es_serializzazione.py
+#
+# Serializzazione veloce dei documenti per gli indexer Elasticsearch.
+# I file di input (CSV o Parquet) sono letti a blocchi di righe, senza mai tenerli interi in memoria;
+# per ogni blocco i NaN diventano None colonna per colonna e ogni riga è codificata una sola volta
+# in JSON (orjson se installato). Le azioni risultanti hanno il "_source" già in byte:
+# indicizza_documenti le passa agli helpers bulk così come sono (vedi espandi_azione).
+
+import hashlib
+import itertools
+import json
+import os
+
+import pandas as pd
+
+from config import ES_SERIALIZE_CHUNK_ROWS
+
+try:
+    import orjson
+except ImportError: # fallback sul modulo json della libreria standard, più lento
+    orjson = None
+
+CAMPO_HASH = "hash_contenuto" # Hash del _source, salvato nel documento per la riconciliazione incrementale
+PARTIZIONE_SENZA_DATA = "senza-data" # Partizione mensile dei documenti senza una data valida
+COLONNE_ID = ("id_originale",) # Colonne di id lette sempre come testo (vedi leggi_a_blocchi)
+
+
+def codifica_json(documento):
+    """Codifica un documento in JSON compatto (byte UTF-8)."""
+    if orjson is not None:
+        return orjson.dumps(documento, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(documento, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+# --- LETTURA A BLOCCHI ---
+def _is_parquet(percorso):
+    return os.path.splitext(percorso)[1].lower() in (".parquet", ".pq")
+
+def colonne_file(percorso):
+    """Colonne di un file CSV o Parquet, senza leggerne le righe."""
+    if _is_parquet(percorso):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(percorso).schema_arrow.names
+    return pd.read_csv(percorso, nrows=0).columns.tolist()
+
+def leggi_a_blocchi(percorso, colonne=None, righe_per_blocco=ES_SERIALIZE_CHUNK_ROWS, colonne_id=COLONNE_ID):
+    """
+    Genera DataFrame di al più righe_per_blocco righe da un file CSV o Parquet (in base all'estensione).
+    Le colonne_id sono lette come testo: il tipo dedotto blocco per blocco trasformerebbe un id numerico
+    in float nei blocchi con valori mancanti ("123" -> "123.0"), cambiando l'_id dei documenti.
+    """
+    if _is_parquet(percorso):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(percorso).iter_batches(batch_size=righe_per_blocco, columns=colonne):
+            tabella = pa.Table.from_batches([batch])
+            for nome in colonne_id:
+                if nome in tabella.column_names and not pa.types.is_string(tabella.schema.field(nome).type):
+                    posizione = tabella.column_names.index(nome)
+                    tabella = tabella.set_column(posizione, nome, tabella.column(posizione).cast(pa.string()))
+            yield tabella.to_pandas()
+    else:
+        yield from pd.read_csv(percorso, usecols=colonne, chunksize=righe_per_blocco, low_memory=False,
+                               dtype={nome: str for nome in colonne_id})
+
+
+# --- AZIONI BULK ---
+def valori_colonna(serie):
+    """Valori Python della colonna, con None al posto di NaN/NaT/NA."""
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+def nome_partizione(index_name, mese):
+    """Indice della partizione mensile, es. '<index_name>-2024.01' (mese None: documenti senza data)."""
+    return f"{index_name}-{mese or PARTIZIONE_SENZA_DATA}"
+
+def indici_partizioni(df, index_name, colonna_data):
+    """Indice di destinazione di ogni riga in base al mese della colonna data, calcolato sull'intera colonna."""
+    if colonna_data not in df.columns:
+        return [nome_partizione(index_name, None)] * len(df)
+    mesi = valori_colonna(pd.to_datetime(df[colonna_data], errors='coerce', utc=True).dt.strftime("%Y.%m"))
+    return [nome_partizione(index_name, mese) for mese in mesi]
+
+def azioni_da_blocchi(blocchi, index_name, id_column, prefisso_id="doc_", colonna_partizione=None):
+    """
+    Genera le azioni bulk per i documenti di una sequenza di DataFrame. L'_id è il valore di id_column,
+    o prefisso_id più la posizione globale della riga se la colonna manca o è vuota.
+    Con colonna_partizione ogni documento va nella partizione mensile della sua data.
+    Ogni azione riporta anche l'hash del _source (CAMPO_HASH), usato dall'indicizzazione incrementale.
+    """
+    inizio = 0
+    for df in blocchi:
+        nomi = df.columns.tolist()
+        colonne = [valori_colonna(df[nome]) for nome in nomi]
+        if id_column in df.columns:
+            ids = colonne[nomi.index(id_column)]
+        else:
+            ids = [None] * len(df)
+        if colonna_partizione is not None:
+            indici = indici_partizioni(df, index_name, colonna_partizione)
+        else:
+            indici = itertools.repeat(index_name)
+        for posizione, (_id, indice, valori) in enumerate(zip(ids, indici, zip(*colonne)), start=inizio):
+            sorgente = codifica_json(dict(zip(nomi, valori)))
+            h = hashlib.sha1(sorgente).hexdigest()
+            yield {
+                "_index": indice,
+                "_id": str(_id) if _id is not None else f"{prefisso_id}{posizione}",
+                "_source": sorgente[:-1] + (b"," if len(sorgente) > 2 else b"") + f'"{CAMPO_HASH}":"{h}"}}'.encode("utf-8"),
+                CAMPO_HASH: h
+            }
+        inizio += len(df)
@@ -0,0 +1,200 @@
+# es_sorgenti.py
+#
+# Mapping e documenti degli indici Elasticsearch, condivisi dagli indexer sincroni
+# (01_indexer.py, 02_indexer_topic.py, 05_indexer_combinato.py) e da quello asincrono (03_indexer_async.py):
+# - indice principale: output del sentiment (ELASTICSEARCH_INDEXER_INPUT_CSV);
+# - indice dei topic: output LDA inglese e italiano, con etichette dal registro dei topic;
+# - indice combinato: output del sentiment arricchito con il topic di ogni documento (hash join con pyarrow).
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from config import ES_TEXT_LENGTH_BINS
+from es_serializzazione import CAMPO_HASH, colonne_file, leggi_a_blocchi, azioni_da_blocchi
+from topic_registry import colonna_versione, versione_da_df, carica_etichette, applica_etichette
+
+COLONNA_DATA = "data_originale_str"
+COLONNE_PUNTEGGI_SENTIMENT = ["sentiment_score_positive", "sentiment_score_negative", "sentiment_score_neutral"]
+
+# Impostazioni comuni agli indici: i testi lemmatizzati sono già tokenizzati dal preprocessing (basta
+# separare sugli spazi) e i segmenti sono ordinati per data, così le query su intervalli recenti e
+# ordinate per data possono fermarsi presto.
+IMPOSTAZIONI_INDICE = {
+    "analysis": {"analyzer": {"lemmi_pretokenizzati": {"type": "custom", "tokenizer": "whitespace", "filter": ["lowercase"]}}},
+    "sort.field": COLONNA_DATA,
+    "sort.order": "desc"
+}
+
+# Campi calcolati durante la generazione dei documenti (vedi aggiungi_campi_precalcolati)
+CAMPI_PRECALCOLATI = {
+    "giorno": {"type": "keyword", "doc_values": True},
+    "settimana": {"type": "keyword", "doc_values": True},
+    "mese": {"type": "keyword", "doc_values": True},
+    "fascia_lunghezza_testo": {"type": "keyword", "doc_values": True}
+}
+
+# Campi usati solo in aggregazioni e ordinamenti: "index": False (niente indice invertito, restano i doc_values).
+# Campi usati come filtri o bucket: keyword con doc_values espliciti.
+MAPPING_PRINCIPALE = {
+    "properties": {
+        "id_originale": {"type": "keyword"},
+        "fonte": {"type": "keyword", "doc_values": True},
+        COLONNA_DATA: {"type": "date", "format": "date_optional_time||epoch_second"},
+        "lingua_rilevata": {"type": "keyword", "doc_values": True},
+        "testo_pulito_base": {"type": "text", "analyzer": "standard"},
+        "testo_lemmatizzato": {"type": "text", "analyzer": "lemmi_pretokenizzati"},
+        "sentiment_label": {"type": "keyword", "doc_values": True},
+        "sentiment_score_positive": {"type": "float", "index": False},
+        "sentiment_score_negative": {"type": "float", "index": False},
+        "sentiment_score_neutral": {"type": "float", "index": False},
+        "sentiment_score_dominante": {"type": "float", "index": False},
+        **CAMPI_PRECALCOLATI,
+        CAMPO_HASH: {"type": "keyword", "index": False} # Solo per la riconciliazione incrementale
+    }
+}
+
+MAPPING_TOPIC = {
+    "properties": {
+        "id_originale": {"type": "keyword"},
+        "fonte": {"type": "keyword", "doc_values": True},
+        COLONNA_DATA: {"type": "date", "format": "date_optional_time||epoch_second"},
+        "lingua": {"type": "keyword", "doc_values": True},
+        "testo_processato": {"type": "text", "analyzer": "lemmi_pretokenizzati"},
+        "topic_id": {"type": "integer"},
+        "topic_label": {"type": "keyword", "doc_values": True},
+        "versione_modello_lda": {"type": "keyword"},
+        **CAMPI_PRECALCOLATI,
+        CAMPO_HASH: {"type": "keyword", "index": False}
+    }
+}
+
+
+# --- CAMPI PRECALCOLATI ---
+def etichette_fasce(estremi):
+    """Etichette delle fasce di lunghezza, es. [0, 50, 200] -> ['0-49', '50-199', '200+']."""
+    return [f"{a}-{b - 1}" for a, b in zip(estremi, estremi[1:])] + [f"{estremi[-1]}+"]
+
+def aggiungi_campi_precalcolati(df, colonna_testo, estremi_lunghezza=ES_TEXT_LENGTH_BINS):
+    """
+    Aggiunge al blocco i campi per le aggregazioni delle dashboard: giorno ('2024-01-31'), settimana ISO
+    ('2024-W05') e mese ('2024-01') della data in UTC, fascia di lunghezza del testo e, se ci sono i
+    punteggi del sentiment, il punteggio dell'etichetta dominante. Senza data i campi temporali restano vuoti.
+    """
+    if COLONNA_DATA in df.columns:
+        date = pd.to_datetime(df[COLONNA_DATA], errors='coerce', utc=True)
+    else:
+        date = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns, UTC]")
+    iso = date.dt.isocalendar()
+    df["giorno"] = date.dt.strftime("%Y-%m-%d")
+    df["settimana"] = (iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)).where(date.notna(), None)
+    df["mese"] = date.dt.strftime("%Y-%m")
+    if colonna_testo in df.columns:
+        lunghezze = df[colonna_testo].fillna("").astype(str).str.len()
+        df["fascia_lunghezza_testo"] = pd.cut(lunghezze, bins=list(estremi_lunghezza) + [np.inf], right=False,
+                                              labels=etichette_fasce(estremi_lunghezza))
+    if all(colonna in df.columns for colonna in COLONNE_PUNTEGGI_SENTIMENT):
+        df["sentiment_score_dominante"] = df[COLONNE_PUNTEGGI_SENTIMENT].max(axis=1)
+    return df
+
+
+# --- INDICE PRINCIPALE ---
+def _colonna_partizione(partizionata):
+    return COLONNA_DATA if partizionata else None
+
+def azioni_principale(percorso, index_name, id_column="id_originale", partizionata=False):
+    """Azioni bulk già serializzate, lette a blocchi dal file del sentiment (CSV o Parquet)."""
+    blocchi = (aggiungi_campi_precalcolati(df, "testo_pulito_base") for df in leggi_a_blocchi(percorso, colonne_id=[id_column]))
+    return azioni_da_blocchi(blocchi, index_name, id_column, prefisso_id="doc_",
+                             colonna_partizione=_colonna_partizione(partizionata))
+
+
+# --- INDICE DEI TOPIC ---
+def versione_da_file(percorso, lingua, percorso_topic_txt):
+    """Versione del modello LDA di un file di topic, leggendo a blocchi solo la colonna di versione."""
+    colonna = colonna_versione(lingua)
+    if colonna not in colonne_file(percorso):
+        return versione_da_df(pd.DataFrame(), lingua, percorso_topic_txt)
+    valori = pd.concat(blocco[colonna].dropna().astype(str).drop_duplicates() for blocco in leggi_a_blocchi(percorso, colonne=[colonna]))
+    return versione_da_df(valori.to_frame(), lingua, percorso_topic_txt)
+
+def blocchi_topic(percorso, lingua, versione, etichette):
+    """Blocchi del file di topic di una lingua, con etichetta, lingua e versione del modello."""
+    for df in leggi_a_blocchi(percorso):
+        df.rename(columns={f'topic_dominante_lda_{lingua}': 'topic_id', 'testo_lemmatizzato': 'testo_processato'}, inplace=True)
+        df['topic_label'] = applica_etichette(df['topic_id'], etichette)
+        df['lingua'] = lingua
+        df['versione_modello_lda'] = versione
+        df.drop(columns=[colonna_versione(lingua)], inplace=True, errors='ignore')
+        yield df
+
+def prepara_blocchi_topic(percorsi_per_lingua):
+    """
+    Verifica versione ed etichette di ogni lingua prima di indicizzare (solleva ErroreVersioneTopic),
+    poi restituisce (blocchi di tutte le lingue in sequenza, versioni per lingua).
+    percorsi_per_lingua: {lingua: (file dei topic per documento, file lda_topics_<lingua>.txt)}.
+    """
+    sorgenti, versioni = [], {}
+    for lingua, (percorso, percorso_topic_txt) in percorsi_per_lingua.items():
+        print(f"Verifica della versione dei topic ({lingua}) in '{percorso}'...")
+        versioni[lingua] = versione_da_file(percorso, lingua, percorso_topic_txt)
+        sorgenti.append(blocchi_topic(percorso, lingua, versioni[lingua], carica_etichette(lingua, versioni[lingua])))
+    return itertools.chain(*sorgenti), versioni
+
+def azioni_topic(blocchi, index_name, id_column="id_originale", partizionata=False):
+    """Azioni bulk già serializzate per i blocchi di documenti dei topic."""
+    blocchi = (aggiungi_campi_precalcolati(df, "testo_processato") for df in blocchi)
+    return azioni_da_blocchi(blocchi, index_name, id_column, prefisso_id="topic_doc_",
+                             colonna_partizione=_colonna_partizione(partizionata))
+
+
+# --- INDICE COMBINATO ---
+COLONNE_TOPIC_COMBINATO = ["topic_id", "topic_label", "versione_modello_lda"]
+
+MAPPING_COMBINATO = {
+    "properties": {
+        **MAPPING_PRINCIPALE["properties"],
+        **{colonna: MAPPING_TOPIC["properties"][colonna] for colonna in COLONNE_TOPIC_COMBINATO}
+    }
+}
+
+def tabella_topic(blocchi, id_column="id_originale"):
+    """
+    Lato piccolo del join: solo id e colonne dei topic di tutte le lingue, come tabella pyarrow.
+    Un id presente più volte tiene l'ultima occorrenza, così il join non duplica i documenti.
+    """
+    import pyarrow as pa
+
+    parti = []
+    for df in blocchi:
+        parte = df[[id_column] + COLONNE_TOPIC_COMBINATO].dropna(subset=[id_column]).assign(**{
+            id_column: lambda d: d[id_column].astype(str),
+            'topic_label': lambda d: d['topic_label'].astype(object) # il join non accetta colonne dictionary come payload
+        })
+        parti.append(parte)
+    topic = pd.concat(parti, ignore_index=True).drop_duplicates(subset=[id_column], keep="last")
+    return pa.Table.from_pandas(topic, preserve_index=False)
+
+def blocchi_combinati(percorso_sentiment, topic, id_column="id_originale"):
+    """
+    Blocchi del sentiment arricchiti con il topic: hash join (left outer) di ogni blocco con la tabella
+    dei topic, costruita una sola volta. I documenti senza topic restano, con le colonne dei topic vuote.
+    Il join di Arrow non conserva l'ordine delle righe: lo ripristina il numero di riga, così gli id di
+    ripiego ('doc_<posizione>') restano quelli del file.
+    """
+    import pyarrow as pa
+
+    colonna_riga = "__riga"
+    for df in leggi_a_blocchi(percorso_sentiment, colonne_id=[id_column]):
+        df[id_column] = df[id_column].astype(str).where(df[id_column].notna(), None)
+        tabella = pa.Table.from_pandas(df, preserve_index=False)
+        tabella = tabella.append_column(colonna_riga, pa.array(range(len(df)), type=pa.int64()))
+        unito = tabella.join(topic, keys=id_column, join_type="left outer", use_threads=True).sort_by(colonna_riga)
+        yield unito.to_pandas().drop(columns=[colonna_riga])
+
+def azioni_combinate(blocchi, index_name, id_column="id_originale", partizionata=False):
+    """Azioni bulk già serializzate per i documenti combinati sentiment + topic."""
+    blocchi = (aggiungi_campi_precalcolati(df, "testo_pulito_base") for df in blocchi)
+    return azioni_da_blocchi(blocchi, index_name, id_column, prefisso_id="doc_",
+                             colonna_partizione=_colonna_partizione(partizionata))
@@ -0,0 +1,187 @@
+# ricerca_locale.py
+#
+# Indice full-text locale (SQLite FTS5) sul file consolidato del preprocessing, alternativa
+# a Elasticsearch per le analisi veloci (frequenza delle parole chiave, post di esempio).
+# L'indice si aggiorna in modo incrementale: ogni documento porta l'hash del proprio contenuto
+# e a ogni aggiornamento si scrivono solo i documenti nuovi o modificati e si eliminano quelli spariti.
+# Le ricerche usano la sintassi MATCH di FTS5 (parole, "frasi esatte", AND/OR/NOT, prefissi*,
+# colonna:parola) e possono essere filtrate per fonte, lingua e intervallo di date.
+
+import hashlib
+import sqlite3
+
+from config import LOCAL_SEARCH_DB
+
+COLONNE_TESTO = ["testo_pulito_base", "testo_lemmatizzato"]
+COLONNE_META = ["fonte", "data", "lingua"]
+RAGGRUPPAMENTI = {"fonte": "d.fonte", "lingua": "d.lingua", "giorno": "substr(d.data, 1, 10)", "mese": "substr(d.data, 1, 7)", "anno": "substr(d.data, 1, 4)"}
+
+
+def frase(testo):
+    """Espressione FTS5 per la frase esatta (o la singola parola) indicata, senza interpretarne la sintassi."""
+    return '"' + testo.replace('"', '""') + '"'
+
+def hash_documento(valori):
+    return hashlib.sha1("\x00".join("" if v is None else str(v) for v in valori).encode("utf-8")).hexdigest()
+
+
+class IndiceLocale:
+    """
+    Metadati dei documenti in una tabella ordinaria (con id, hash e indici su data e fonte) e testi
+    in una tabella FTS5 con lo stesso rowid. Le date sono stringhe ISO in UTC, confrontabili come testo.
+    """
+
+    def __init__(self, percorso=LOCAL_SEARCH_DB):
+        self.connessione = sqlite3.connect(percorso)
+        self.connessione.executescript(f"""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS documenti (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                fonte TEXT,
+                data TEXT,
+                lingua TEXT,
+                hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_documenti_data ON documenti (data);
+            CREATE INDEX IF NOT EXISTS idx_documenti_fonte_data ON documenti (fonte, data);
+            CREATE VIRTUAL TABLE IF NOT EXISTS testi USING fts5({", ".join(COLONNE_TESTO)}, tokenize = 'unicode61 remove_diacritics 2');
+        """)
+
+    # --- AGGIORNAMENTO ---
+    def hash_presenti(self):
+        return dict(self.connessione.execute("SELECT id, hash FROM documenti"))
+
+    def aggiorna(self, righe, elimina_assenti=True):
+        """
+        Allinea l'indice alle righe indicate: dizionari con 'id', COLONNE_META e COLONNE_TESTO, anche
+        a blocchi (generatore). Un id ripetuto tiene l'ultima occorrenza. Con elimina_assenti i documenti
+        non presenti nelle righe vengono rimossi. Restituisce i conteggi di creati, aggiornati, invariati, eliminati.
+        """
+        presenti = self.hash_presenti()
+        visti = set()
+        conteggi = {"creati": 0, "aggiornati": 0, "invariati": 0, "eliminati": 0}
+        with self.connessione:
+            for riga in righe:
+                _id = str(riga["id"])
+                valori_meta = [riga.get(c) for c in COLONNE_META]
+                valori_testo = [riga.get(c) or "" for c in COLONNE_TESTO]
+                h = hash_documento(valori_meta + valori_testo)
+                gia_visto = _id in visti
+                visti.add(_id)
+                if presenti.get(_id) == h:
+                    if not gia_visto:
+                        conteggi["invariati"] += 1
+                    continue
+                if _id in presenti:
+                    self._elimina(_id)
+                    if not gia_visto:
+                        conteggi["aggiornati"] += 1
+                elif not gia_visto:
+                    conteggi["creati"] += 1
+                cursore = self.connessione.execute(
+                    "INSERT INTO documenti (id, fonte, data, lingua, hash) VALUES (?, ?, ?, ?, ?)", (_id, *valori_meta, h)
+                )
+                self.connessione.execute(
+                    f"INSERT INTO testi (rowid, {', '.join(COLONNE_TESTO)}) VALUES (?, ?, ?)", (cursore.lastrowid, *valori_testo)
+                )
+                presenti[_id] = h
+            if elimina_assenti:
+                for _id in presenti.keys() - visti:
+                    self._elimina(_id)
+                    conteggi["eliminati"] += 1
+        return conteggi
+
+    def _elimina(self, _id):
+        riga = self.connessione.execute("SELECT rowid FROM documenti WHERE id = ?", (_id,)).fetchone()
+        if riga:
+            self.connessione.execute("DELETE FROM testi WHERE rowid = ?", riga)
+            self.connessione.execute("DELETE FROM documenti WHERE rowid = ?", riga)
+
+    def ottimizza(self):
+        """Unisce i segmenti dell'indice FTS5 (utile dopo aggiornamenti grandi)."""
+        with self.connessione:
+            self.connessione.execute("INSERT INTO testi (testi) VALUES ('optimize')")
+
+    # --- RICERCA ---
+    def _sorgente(self, espressione):
+        """
+        Con un'espressione la ricerca FTS5 deve precedere il join (CROSS JOIN fissa l'ordine): partendo
+        dall'indice sulla fonte SQLite valuterebbe il MATCH documento per documento. Senza, bastano i metadati.
+        """
+        return "testi CROSS JOIN documenti d ON d.rowid = testi.rowid" if espressione else "documenti d"
+
+    def _filtri(self, espressione, fonte=None, lingua=None, dal=None, al=None):
+        """Clausola WHERE e parametri comuni: MATCH (opzionale) più i filtri sui metadati."""
+        condizioni, parametri = [], []
+        if espressione:
+            condizioni.append("testi MATCH ?")
+            parametri.append(espressione)
+        if fonte:
+            condizioni.append("d.fonte = ?")
+            parametri.append(fonte)
+        if lingua:
+            condizioni.append("d.lingua = ?")
+            parametri.append(lingua)
+        if dal:
+            condizioni.append("d.data >= ?")
+            parametri.append(dal)
+        if al:
+            condizioni.append("d.data < ?") # 'al' escluso: al='2024-02' comprende tutto gennaio se dal='2024-01'
+            parametri.append(al)
+        return (" WHERE " + " AND ".join(condizioni)) if condizioni else "", parametri
+
+    def conta(self, espressione=None, **filtri):
+        """Numero di documenti che corrispondono all'espressione FTS5 e ai filtri (fonte, lingua, dal, al)."""
+        where, parametri = self._filtri(espressione, **filtri)
+        return self.connessione.execute(f"SELECT count(*) FROM {self._sorgente(espressione)}{where}", parametri).fetchone()[0]
+
+    def conta_per(self, espressione=None, per="fonte", **filtri):
+        """Conteggi raggruppati per fonte, lingua, giorno, mese o anno, dal gruppo più numeroso."""
+        if per not in RAGGRUPPAMENTI:
+            raise ValueError(f"Raggruppamento sconosciuto '{per}'. Disponibili: {list(RAGGRUPPAMENTI)}")
+        where, parametri = self._filtri(espressione, **filtri)
+        return self.connessione.execute(
+            f"SELECT {RAGGRUPPAMENTI[per]} AS gruppo, count(*) AS n FROM {self._sorgente(espressione)}{where} "
+            f"GROUP BY gruppo ORDER BY n DESC, gruppo", parametri
+        ).fetchall()
+
+    def frequenze(self, parole, **filtri):
+        """Documenti in cui compare ogni parola o frase, come in Build_Dataset/Reddit/02_reddit.py."""
+        return {parola: self.conta(frase(parola), **filtri) for parola in parole}
+
+    def esempi(self, espressione, n=5, **filtri):
+        """I documenti più pertinenti (bm25) con un estratto del testo: (id, fonte, data, estratto)."""
+        where, parametri = self._filtri(espressione, **filtri)
+        return self.connessione.execute(
+            f"SELECT d.id, d.fonte, d.data, snippet(testi, 0, '[', ']', '...', 16) FROM {self._sorgente(espressione)}"
+            f"{where} ORDER BY bm25(testi) LIMIT ?", (*parametri, n)
+        ).fetchall()
+
+    def chiudi(self):
+        self.connessione.close()
+
+
+def righe_da_file(percorso):
+    """Righe del file consolidato del preprocessing (CSV o Parquet), lette a blocchi, con la data normalizzata in UTC."""
+    import pandas as pd
+    from es_serializzazione import leggi_a_blocchi, valori_colonna
+
+    inizio = 0
+    for df in leggi_a_blocchi(percorso):
+        ids = df["id_originale"].astype(str).where(df["id_originale"].notna(), None) if "id_originale" in df.columns else pd.Series(None, index=df.index)
+        if "data_originale_str" in df.columns:
+            date = valori_colonna(pd.to_datetime(df["data_originale_str"], errors='coerce', utc=True).dt.strftime("%Y-%m-%dT%H:%M:%S"))
+        else:
+            date = [None] * len(df)
+        colonne = {
+            "id": [i if i is not None else f"doc_{posizione}" for posizione, i in enumerate(valori_colonna(ids), start=inizio)],
+            "fonte": valori_colonna(df["fonte"]) if "fonte" in df.columns else [None] * len(df),
+            "data": date,
+            "lingua": valori_colonna(df["lingua_rilevata"]) if "lingua_rilevata" in df.columns else [None] * len(df),
+            **{c: valori_colonna(df[c]) if c in df.columns else [None] * len(df) for c in COLONNE_TESTO}
+        }
+        inizio += len(df)
+        for valori in zip(*colonne.values()):
+            yield dict(zip(colonne.keys(), valori))
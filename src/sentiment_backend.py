@@ -0,0 +1,168 @@
+# sentiment_backend.py
+#
+# Backend di inferenza selezionabili per il modello di sentiment:
+#   - "pytorch_fp32": PyTorch eager in fp32 (comportamento storico);
+#   - "pytorch_int8": quantizzazione dinamica int8 dei layer Linear (solo CPU);
+#   - "onnxruntime":  export ONNX eseguito con ONNX Runtime e ottimizzazioni del grafo (solo CPU).
+# I modelli ONNX esportati sono messi in cache in SENTIMENT_ARTIFACTS_DIR; la quantizzazione int8
+# costa poco (solo i pesi dei Linear) ed è ricalcolata a ogni caricamento.
+
+import json
+import os
+import re
+
+import torch
+import transformers
+
+from config import SENTIMENT_ARTIFACTS_DIR, SENTIMENT_ONNX_THREADS
+
+BACKEND_FP32 = "pytorch_fp32"
+BACKEND_INT8 = "pytorch_int8"
+BACKEND_ONNX = "onnxruntime"
+BACKEND_DISPONIBILI = [BACKEND_FP32, BACKEND_INT8, BACKEND_ONNX]
+BACKEND_SOLO_CPU = [BACKEND_INT8, BACKEND_ONNX]
+
+FILE_MANIFEST = "manifest.json"
+
+
+# --- CACHE DEGLI ARTEFATTI ---
+def cartella_artefatti(model_name, backend):
+    """Cartella di cache degli artefatti di un modello per un backend."""
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+    return os.path.join(SENTIMENT_ARTIFACTS_DIR, slug, backend)
+
+def _manifest_atteso(model, backend):
+    return {
+        "backend": backend,
+        "model_name": model.config.name_or_path,
+        "revisione": getattr(model.config, "_commit_hash", None),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__
+    }
+
+def _cache_valida(cartella, manifest, file_artefatto):
+    """Un artefatto è riutilizzabile solo se prodotto dallo stesso modello con le stesse librerie."""
+    percorso_manifest = os.path.join(cartella, FILE_MANIFEST)
+    if not (os.path.exists(percorso_manifest) and os.path.exists(os.path.join(cartella, file_artefatto))):
+        return False
+    with open(percorso_manifest, "r", encoding="utf-8") as f:
+        return json.load(f) == manifest
+
+def _temporaneo(cartella, nome_file):
+    """File temporaneo del processo corrente accanto a quello definitivo, con la stessa estensione."""
+    return os.path.join(cartella, f"{os.getpid()}_{nome_file}")
+
+def _scrivi_manifest(cartella, manifest):
+    temporaneo = _temporaneo(cartella, FILE_MANIFEST)
+    with open(temporaneo, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporaneo, os.path.join(cartella, FILE_MANIFEST))
+
+
+# --- BACKEND ---
+class BackendPytorch:
+    """Esegue il modello PyTorch sul dispositivo indicato (fp32 o già quantizzato)."""
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def __call__(self, batch):
+        batch = {k: v.to(self.device) for k, v in batch.items()}
+        return self.model(**batch).logits
+
+    def imposta_thread(self, num_thread):
+        """Nulla da fare: i thread PyTorch sono globali al processo e li imposta già MotoreSentiment."""
+
+
+def quantizza_int8(model):
+    """
+    Quantizzazione dinamica int8 dei layer Linear. Non usa cache: quantize_dynamic serve comunque a
+    costruire i moduli quantizzati e calcolare scale e pesi int8 richiede pochi secondi.
+    """
+    model_int8 = torch.ao.quantization.quantize_dynamic(model.to("cpu"), {torch.nn.Linear}, dtype=torch.qint8)
+    model_int8.eval()
+    return model_int8
+
+
+class BackendOnnx:
+    """Sessione ONNX Runtime con ottimizzazioni del grafo; restituisce i logit come tensore torch."""
+
+    def __init__(self, model, tokenizer, model_name, num_thread=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("Il backend 'onnxruntime' richiede i pacchetti 'onnx' e 'onnxruntime' (pip install onnx onnxruntime).")
+
+        cartella = cartella_artefatti(model_name, BACKEND_ONNX)
+        file_onnx = "model.onnx"
+        file_ottimizzato = "model_ottimizzato.onnx"
+        manifest = _manifest_atteso(model, BACKEND_ONNX)
+        self.percorso_ottimizzato = os.path.join(cartella, file_ottimizzato)
+        self.nomi_input = [n for n in tokenizer.model_input_names if n in ("input_ids", "attention_mask", "token_type_ids")]
+
+        opzioni = ort.SessionOptions()
+        if num_thread or SENTIMENT_ONNX_THREADS:
+            opzioni.intra_op_num_threads = num_thread or SENTIMENT_ONNX_THREADS
+
+        if _cache_valida(cartella, manifest, file_ottimizzato):
+            print(f"  Caricamento del modello ONNX ottimizzato dalla cache '{cartella}'...")
+            # il grafo in cache è già ottimizzato: evitiamo di ripetere le trasformazioni
+            opzioni.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            self.sessione = ort.InferenceSession(os.path.join(cartella, file_ottimizzato), sess_options=opzioni, providers=["CPUExecutionProvider"])
+        else:
+            # più worker possono esportare insieme: ognuno scrive file propri e li sposta al loro posto con
+            # os.replace (atomico); il manifest, scritto per ultimo, rende valida la cache solo a file completi
+            os.makedirs(cartella, exist_ok=True)
+            temporaneo_onnx, temporaneo_ottimizzato = _temporaneo(cartella, file_onnx), _temporaneo(cartella, file_ottimizzato)
+            self._esporta(model, tokenizer, temporaneo_onnx)
+            opzioni.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            opzioni.optimized_model_filepath = temporaneo_ottimizzato
+            self.sessione = ort.InferenceSession(temporaneo_onnx, sess_options=opzioni, providers=["CPUExecutionProvider"])
+            os.replace(temporaneo_onnx, os.path.join(cartella, file_onnx))
+            os.replace(temporaneo_ottimizzato, os.path.join(cartella, file_ottimizzato))
+            _scrivi_manifest(cartella, manifest)
+            print(f"  Modello ONNX esportato e ottimizzato in '{cartella}'.")
+
+    def imposta_thread(self, num_thread):
+        """Ricrea la sessione dal modello ottimizzato in cache con un altro numero di thread intra-op."""
+        import onnxruntime as ort
+        opzioni = ort.SessionOptions()
+        opzioni.intra_op_num_threads = num_thread
+        opzioni.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        self.sessione = ort.InferenceSession(self.percorso_ottimizzato, sess_options=opzioni, providers=["CPUExecutionProvider"])
+
+    def _esporta(self, model, tokenizer, percorso):
+        esempio = tokenizer(["esempio di testo"], return_tensors="pt")
+        assi_dinamici = {nome: {0: "batch", 1: "sequenza"} for nome in self.nomi_input}
+        assi_dinamici["logits"] = {0: "batch"}
+        model.to("cpu")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(esempio[nome] for nome in self.nomi_input),
+                percorso,
+                input_names=self.nomi_input,
+                output_names=["logits"],
+                dynamic_axes=assi_dinamici,
+                opset_version=17
+            )
+
+    def __call__(self, batch):
+        ingressi = {nome: batch[nome].cpu().numpy().astype("int64") for nome in self.nomi_input}
+        logits = self.sessione.run(["logits"], ingressi)[0]
+        return torch.from_numpy(logits)
+
+
+def crea_backend(nome, model, tokenizer, model_name, device, num_thread=None):
+    """
+    Costruisce il backend richiesto a partire dal modello fp32 già caricato.
+    num_thread limita i thread intra-op di ONNX Runtime (per PyTorch vale torch.set_num_threads).
+    """
+    if nome not in BACKEND_DISPONIBILI:
+        raise ValueError(f"Backend di sentiment sconosciuto '{nome}'. Disponibili: {BACKEND_DISPONIBILI}")
+    if nome == BACKEND_FP32:
+        return BackendPytorch(model, device)
+    if nome == BACKEND_INT8:
+        return BackendPytorch(quantizza_int8(model), torch.device("cpu"))
+    return BackendOnnx(model, tokenizer, model_name, num_thread)
@@ -0,0 +1,127 @@
+# sentiment_benchmark.py
+#
+# Corpora e misure per il benchmark del sentiment (06_benchmark_sentiment.py) e il confronto
+# dei backend (02_confronta_backend.py). Ogni configurazione è misurata in un processo nuovo:
+# il picco di memoria (RSS) e le impostazioni dei thread non sono influenzati dalle precedenti.
+
+import multiprocessing
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from sentiment_engine import MotoreSentiment, ETICHETTA_ERRORE
+
+try:
+    import resource
+except ImportError: # non disponibile su Windows
+    resource = None
+
+COLONNE_TESTO_ARTICOLI = ["titolo", "testo_articolo"]
+
+
+# --- CORPORA ---
+def carica_campione_articoli(percorsi_csv, dimensione, random_state=42):
+    """Estrae un campione casuale riproducibile di articoli (titolo + testo) dai CSV inclusi nel repository."""
+    testi = []
+    for percorso in percorsi_csv:
+        try:
+            df = pd.read_csv(percorso, low_memory=False)
+        except FileNotFoundError:
+            print(f"  AVVISO: file '{percorso}' non trovato, escluso dal campione.")
+            continue
+        colonne = [c for c in COLONNE_TESTO_ARTICOLI if c in df.columns]
+        testo = df[colonne].fillna("").astype(str).agg(" ".join, axis=1).str.strip()
+        testi.extend(testo[testo != ""].tolist())
+    campione = pd.Series(testi)
+    if len(campione) > dimensione:
+        campione = campione.sample(n=dimensione, random_state=random_state)
+    return campione.tolist()
+
+def genera_corpus_sintetico(vocabolario, num_documenti, mediana_parole, sigma, random_state=42):
+    """
+    Documenti di parole estratte dal vocabolario, con lunghezza log-normale:
+    la mediana fissa il documento tipico, sigma la coda di documenti lunghi.
+    """
+    rng = np.random.default_rng(random_state)
+    lunghezze = np.maximum(1, rng.lognormal(np.log(mediana_parole), sigma, size=num_documenti).astype(int))
+    vocabolario = np.asarray(vocabolario, dtype=object)
+    return [" ".join(rng.choice(vocabolario, size=n)) for n in lunghezze]
+
+def vocabolario_da_testi(testi, minimo=1000):
+    """Parole distinte dei testi; se sono poche si aggiungono parole fittizie."""
+    parole = sorted({p for t in testi for p in re.findall(r"\w+", t.lower())})
+    if len(parole) < minimo:
+        parole += [f"parola{i}" for i in range(minimo - len(parole))]
+    return parole
+
+def descrivi_corpus(testi):
+    lunghezze = np.array([len(t.split()) for t in testi])
+    return {
+        "documenti": len(testi),
+        "parole_mediana": float(np.median(lunghezze)) if len(testi) else 0,
+        "parole_p95": float(np.percentile(lunghezze, 95)) if len(testi) else 0,
+        "parole_max": int(lunghezze.max()) if len(testi) else 0
+    }
+
+
+# --- MISURE ---
+def picco_rss_mb():
+    """Picco della memoria residente del processo corrente (ru_maxrss: KB su Linux, byte su macOS)."""
+    if resource is None:
+        return None
+    picco = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(picco / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+def misura_corpus(motore, testi):
+    """Throughput e latenza per batch di un'analisi completa del corpus."""
+    motore.tempi_batch = []
+    inizio = time.perf_counter()
+    risultati = motore.analizza_testi(testi, ogni_n_documenti=10**9)
+    durata = time.perf_counter() - inizio
+    tempi = np.array([t for t, _, _ in motore.tempi_batch]) * 1000
+    token = sum(n for _, _, n in motore.tempi_batch)
+    motore.tempi_batch = None
+    return {
+        "secondi": round(durata, 3),
+        "documenti_al_secondo": round(len(testi) / durata, 2),
+        "token_al_secondo": round(token / durata, 1),
+        "batch": len(tempi),
+        "latenza_batch_ms": {
+            "p50": round(float(np.percentile(tempi, 50)), 2),
+            "p95": round(float(np.percentile(tempi, 95)), 2),
+            "p99": round(float(np.percentile(tempi, 99)), 2)
+        } if len(tempi) else {},
+        "errori": int((risultati['sentiment_label'] == ETICHETTA_ERRORE).sum())
+    }
+
+def misura_configurazione(model_name, configurazione, corpora):
+    """Eseguita nel processo figlio: carica il modello con la configurazione e misura ogni corpus."""
+    inizio = time.perf_counter()
+    motore = MotoreSentiment(
+        model_name,
+        backend=configurazione["backend"],
+        batch_size=configurazione["batch_size"],
+        num_thread=configurazione["thread"],
+        modalita_lunghezza=configurazione["modalita_lunghezza"]
+    )
+    caricamento = time.perf_counter() - inizio
+    motore.analizza_testi(["riscaldamento del modello"] * 8, ogni_n_documenti=10**9)
+    return {
+        **configurazione,
+        "dispositivo": str(motore.device),
+        "pipeline": motore.pipeline,
+        "secondi_caricamento": round(caricamento, 2),
+        "corpora": {nome: misura_corpus(motore, testi) for nome, testi in corpora.items()},
+        "picco_rss_mb": picco_rss_mb()
+    }
+
+def misura_in_processo_separato(model_name, configurazione, corpora):
+    """Misura una configurazione in un processo nuovo; un errore (es. backend non installato) viene riportato."""
+    with multiprocessing.get_context("spawn").Pool(processes=1) as pool:
+        try:
+            return pool.apply(misura_configurazione, (model_name, configurazione, corpora))
+        except Exception as e:
+            return {**configurazione, "errore": f"{e.__class__.__name__} - {e}"}
@@ -0,0 +1,155 @@
+# sentiment_cache.py
+#
+# Cache persistente (SQLite) dei risultati di sentiment, indicizzata per
+# (hash del testo normalizzato, nome del modello, revisione del modello, max_length).
+# Solo i testi non in cache vengono inviati al modello; le voci meno usate di recente
+# vengono eliminate oltre SENTIMENT_CACHE_MAX_ENTRIES.
+
+import hashlib
+import re
+import sqlite3
+import time
+import unicodedata
+
+import pandas as pd
+
+from config import SENTIMENT_CACHE_DB, SENTIMENT_CACHE_MAX_ENTRIES
+from sentiment_engine import COLONNE_RISULTATO, ETICHETTA_ERRORE
+
+PARAMETRI_PER_QUERY = 500 # Limite prudente di variabili per singola query SQLite
+
+
+def normalizza_testo(testo):
+    """Normalizzazione usata per la chiave: Unicode NFC e spazi compattati."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", testo)).strip()
+
+def hash_testo(testo):
+    return hashlib.sha1(normalizza_testo(testo).encode("utf-8")).hexdigest()
+
+
+class CacheSentiment:
+    """Accesso alla tabella dei risultati in cache per un modello (nome, revisione, max_length)."""
+
+    def __init__(self, model_name, revisione, max_length, percorso=SENTIMENT_CACHE_DB, max_voci=SENTIMENT_CACHE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.revisione = revisione or ""
+        self.max_length = max_length
+        self.max_voci = max_voci
+        self.connessione = sqlite3.connect(percorso)
+        self.connessione.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS risultati (
+                hash_testo TEXT NOT NULL,
+                modello TEXT NOT NULL,
+                revisione TEXT NOT NULL,
+                max_length INTEGER NOT NULL,
+                sentiment_label TEXT NOT NULL,
+                sentiment_score_positive REAL,
+                sentiment_score_negative REAL,
+                sentiment_score_neutral REAL,
+                ultimo_accesso REAL NOT NULL,
+                PRIMARY KEY (hash_testo, modello, revisione, max_length)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_risultati_accesso ON risultati (ultimo_accesso);
+        """)
+
+    def _chiave_modello(self):
+        return (self.model_name, self.revisione, self.max_length)
+
+    def cerca(self, hashes):
+        """Restituisce {hash: (label, positive, negative, neutral)} per gli hash presenti, aggiornandone l'accesso."""
+        trovati = {}
+        unici = list(dict.fromkeys(hashes))
+        adesso = time.time()
+        for inizio in range(0, len(unici), PARAMETRI_PER_QUERY):
+            gruppo = unici[inizio:inizio + PARAMETRI_PER_QUERY]
+            segnaposto = ",".join("?" * len(gruppo))
+            righe = self.connessione.execute(
+                f"SELECT hash_testo, sentiment_label, sentiment_score_positive, sentiment_score_negative, sentiment_score_neutral "
+                f"FROM risultati WHERE modello = ? AND revisione = ? AND max_length = ? AND hash_testo IN ({segnaposto})",
+                (*self._chiave_modello(), *gruppo)
+            ).fetchall()
+            for riga in righe:
+                trovati[riga[0]] = riga[1:]
+            if righe:
+                self.connessione.execute(
+                    f"UPDATE risultati SET ultimo_accesso = ? WHERE modello = ? AND revisione = ? AND max_length = ? "
+                    f"AND hash_testo IN ({','.join('?' * len(righe))})",
+                    (adesso, *self._chiave_modello(), *[r[0] for r in righe])
+                )
+        self.connessione.commit()
+        return trovati
+
+    def salva(self, hashes, risultati):
+        """Inserisce i risultati calcolati (gli errori non vengono messi in cache) ed applica l'eviction."""
+        adesso = time.time()
+        righe = [
+            (h, *self._chiave_modello(), r.sentiment_label, r.sentiment_score_positive, r.sentiment_score_negative, r.sentiment_score_neutral, adesso)
+            for h, r in zip(hashes, risultati[COLONNE_RISULTATO].itertuples(index=False))
+            if r.sentiment_label != ETICHETTA_ERRORE
+        ]
+        self.connessione.executemany("INSERT OR REPLACE INTO risultati VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", righe)
+        self.connessione.commit()
+        self.applica_eviction()
+
+    def applica_eviction(self):
+        """Elimina le voci con accesso meno recente oltre il limite di dimensione."""
+        totale = self.connessione.execute("SELECT COUNT(*) FROM risultati").fetchone()[0]
+        eccesso = totale - self.max_voci
+        if eccesso > 0:
+            self.connessione.execute(
+                "DELETE FROM risultati WHERE (hash_testo, modello, revisione, max_length) IN ("
+                "SELECT hash_testo, modello, revisione, max_length FROM risultati ORDER BY ultimo_accesso LIMIT ?)",
+                (eccesso,)
+            )
+            self.connessione.commit()
+            print(f"  Cache sentiment: eliminate {eccesso} voci meno recenti (limite {self.max_voci}).")
+
+    def numero_voci(self):
+        return self.connessione.execute("SELECT COUNT(*) FROM risultati").fetchone()[0]
+
+    def chiudi(self):
+        self.connessione.close()
+
+
+class AnalizzatoreConCache:
+    """
+    Avvolge un analizzatore (MotoreSentiment o PoolSentiment): i testi già visti sono
+    restituiti dalla cache, i mancanti (deduplicati) vengono analizzati a batch dal modello.
+    """
+
+    def __init__(self, analizzatore, cache):
+        self.analizzatore = analizzatore
+        self.cache = cache
+        self.hit_totali = 0
+        self.miss_totali = 0
+
+    def analizza_testi(self, testi, ogni_n_documenti=1000):
+        hashes = [hash_testo(t) for t in testi]
+        in_cache = self.cache.cerca(hashes)
+
+        # testi mancanti deduplicati: i ripetuti nello stesso input si calcolano una volta sola
+        mancanti = {}
+        for h, testo in zip(hashes, testi):
+            if h not in in_cache and h not in mancanti:
+                mancanti[h] = testo
+
+        hit = sum(1 for h in hashes if h in in_cache)
+        self.hit_totali += hit
+        self.miss_totali += len(hashes) - hit
+        print(f"  Cache sentiment: {hit}/{len(hashes)} hit ({hit / max(len(hashes), 1):.1%}), "
+              f"{len(mancanti)} testi unici da analizzare con il modello.")
+
+        if mancanti:
+            calcolati = self.analizzatore.analizza_testi(list(mancanti.values()), ogni_n_documenti)
+            self.cache.salva(list(mancanti.keys()), calcolati)
+            for h, riga in zip(mancanti.keys(), calcolati[COLONNE_RISULTATO].itertuples(index=False, name=None)):
+                in_cache[h] = riga
+
+        return pd.DataFrame([in_cache[h] for h in hashes], columns=COLONNE_RISULTATO)
+
+    def riepilogo(self):
+        totale = self.hit_totali + self.miss_totali
+        return (f"Cache sentiment: {self.hit_totali} hit su {totale} documenti "
+                f"(hit rate {self.hit_totali / max(totale, 1):.1%}), {self.cache.numero_voci()} voci in cache.")
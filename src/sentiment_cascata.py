@@ -0,0 +1,129 @@
+# sentiment_cascata.py
+#
+# Sentiment a cascata: un classificatore lineare su n-grammi hashati (primo livello),
+# distillato dalle etichette del transformer sul nostro corpus, valuta ogni documento;
+# solo i documenti con confidenza sotto soglia vengono inviati al transformer.
+# AnalizzatoreCascata espone la stessa interfaccia di MotoreSentiment.analizza_testi.
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from config import SENTIMENT_CASCADE_THRESHOLD, SENTIMENT_CASCADE_AUDIT_FRACTION
+from sentiment_engine import COLONNE_RISULTATO, ETICHETTA_ERRORE
+
+RANDOM_STATE = 42
+
+
+class ClassificatorePrimoLivello:
+    """
+    Regressione logistica (SGD) su unigrammi e bigrammi di parole hashati: nessun vocabolario
+    da salvare e costo di inferenza trascurabile rispetto al transformer.
+    """
+
+    def __init__(self, model_name, n_features=2**20):
+        self.model_name = model_name # Transformer da cui sono state distillate le etichette
+        self.vettorizzatore = HashingVectorizer(ngram_range=(1, 2), n_features=n_features, alternate_sign=False, lowercase=True)
+        self.classificatore = SGDClassifier(loss="log_loss", alpha=1e-6, max_iter=30, random_state=RANDOM_STATE)
+
+    @property
+    def etichette(self):
+        return self.classificatore.classes_
+
+    def addestra(self, testi, etichette):
+        self.classificatore.fit(self.vettorizzatore.transform(testi), etichette)
+        return self
+
+    def probabilita(self, testi):
+        """Matrice (n x classi) delle probabilità, colonne nell'ordine di `etichette`."""
+        return self.classificatore.predict_proba(self.vettorizzatore.transform(testi))
+
+    def componi_risultati(self, probabilita):
+        """Converte le probabilità nelle colonne di COLONNE_RISULTATO (score mancanti a NaN)."""
+        risultati = pd.DataFrame({'sentiment_label': self.etichette[probabilita.argmax(axis=1)]})
+        for colonna in COLONNE_RISULTATO[1:]:
+            risultati[colonna] = np.nan
+        for k, etichetta in enumerate(self.etichette):
+            colonna = f"sentiment_score_{str(etichetta).lower()}"
+            if colonna in risultati.columns:
+                risultati[colonna] = probabilita[:, k]
+        return risultati
+
+    def salva(self, percorso):
+        os.makedirs(os.path.dirname(percorso), exist_ok=True)
+        joblib.dump(self, percorso)
+
+    @staticmethod
+    def carica(percorso):
+        return joblib.load(percorso)
+
+
+def concordanza_cascata(etichette_primo, confidenza, etichette_transformer, soglia):
+    """Frazione inviata al transformer e concordanza con le sole etichette del transformer a una data soglia."""
+    escalati = confidenza < soglia
+    finali = np.where(escalati, etichette_transformer, etichette_primo)
+    return float(escalati.mean()), float((finali == etichette_transformer).mean())
+
+
+class AnalizzatoreCascata:
+    """
+    Avvolge un analizzatore transformer (MotoreSentiment, PoolSentiment o AnalizzatoreConCache).
+    I documenti sicuri ricevono l'etichetta del primo livello, gli incerti quella del transformer.
+    Una piccola frazione casuale dei documenti sicuri (audit) viene inviata anche al transformer
+    per stimare la concordanza della cascata con le sole etichette del transformer.
+    """
+
+    def __init__(self, analizzatore, primo_livello, soglia=SENTIMENT_CASCADE_THRESHOLD, frazione_audit=SENTIMENT_CASCADE_AUDIT_FRACTION):
+        self.analizzatore = analizzatore
+        self.primo_livello = primo_livello
+        self.soglia = soglia
+        self.frazione_audit = frazione_audit
+        self.rng = np.random.default_rng(RANDOM_STATE)
+        self.statistiche = {"documenti": 0, "escalati": 0, "audit": 0, "audit_concordi": 0}
+
+    def analizza_testi(self, testi, ogni_n_documenti=1000):
+        n = len(testi)
+        if n == 0:
+            return pd.DataFrame(columns=COLONNE_RISULTATO)
+
+        probabilita = self.primo_livello.probabilita(testi)
+        risultati = self.primo_livello.componi_risultati(probabilita)
+        incerti = probabilita.max(axis=1) < self.soglia
+        audit = ~incerti & (self.rng.random(n) < self.frazione_audit)
+        al_transformer = np.flatnonzero(incerti | audit)
+        print(f"  Cascata: {int(incerti.sum())}/{n} documenti sotto la soglia {self.soglia} inviati al transformer "
+              f"({incerti.mean():.1%}), più {int(audit.sum())} di audit.")
+
+        if len(al_transformer):
+            etichette_primo = risultati['sentiment_label'].to_numpy()[al_transformer]
+            trasformati = self.analizzatore.analizza_testi([testi[i] for i in al_transformer], ogni_n_documenti)
+            for colonna in COLONNE_RISULTATO:
+                risultati.loc[al_transformer, colonna] = trasformati[colonna].values
+
+            # concordanza dell'audit, escludendo i documenti su cui il transformer è fallito
+            etichette_transformer = trasformati['sentiment_label'].to_numpy()
+            in_audit = audit[al_transformer] & (etichette_transformer != ETICHETTA_ERRORE)
+            self.statistiche["audit"] += int(in_audit.sum())
+            self.statistiche["audit_concordi"] += int((etichette_primo[in_audit] == etichette_transformer[in_audit]).sum())
+
+        self.statistiche["documenti"] += n
+        self.statistiche["escalati"] += int(incerti.sum())
+        return risultati
+
+    def riepilogo(self):
+        stat = self.statistiche
+        if not stat["documenti"]:
+            return "Cascata: nessun documento elaborato."
+        quota_sicuri = 1 - stat["escalati"] / stat["documenti"]
+        testo = (f"Cascata: {stat['escalati']} documenti su {stat['documenti']} inviati al transformer "
+                 f"({stat['escalati'] / stat['documenti']:.1%}), soglia {self.soglia}.")
+        if stat["audit"]:
+            concordanza_audit = stat["audit_concordi"] / stat["audit"]
+            # gli incerti hanno l'etichetta del transformer: il disaccordo può venire solo dai sicuri
+            testo += (f" Concordanza con il solo transformer sui {stat['audit']} documenti di audit: {concordanza_audit:.1%}"
+                      f" (stimata sull'intero corpus: {1 - quota_sicuri * (1 - concordanza_audit):.1%}).")
+        return testo
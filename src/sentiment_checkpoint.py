@@ -0,0 +1,97 @@
+# sentiment_checkpoint.py
+#
+# Checkpoint delle esecuzioni di 01_sent.py: ogni blocco di righe analizzato viene scritto
+# su disco come shard. Al riavvio le righe già presenti negli shard vengono saltate e,
+# a fine esecuzione, gli shard sono uniti in streaming nel CSV finale.
+# Le righe sono identificate dalla loro posizione nel file di input, valida solo finché
+# il file non cambia: l'impronta dell'input (dimensione, data di modifica, parametri di
+# lettura) è salvata nel manifest e un input diverso invalida il checkpoint. In quel caso
+# i testi già visti vengono comunque recuperati subito dalla cache dei risultati.
+
+import glob
+import json
+import os
+import shutil
+
+import pandas as pd
+
+COLONNA_POSIZIONE = "posizione_input"
+FILE_MANIFEST = "manifest.json"
+PREFISSO_SHARD = "shard_"
+
+
+def impronta_input(percorso, **parametri):
+    """Identifica il file di input e i parametri con cui viene letto."""
+    stat = os.stat(percorso)
+    return {"percorso": os.path.abspath(percorso), "dimensione": stat.st_size, "modificato_ns": stat.st_mtime_ns, **parametri}
+
+
+class CheckpointSentiment:
+    """Shard completati di un'esecuzione, con ripresa automatica."""
+
+    def __init__(self, cartella, impronta):
+        self.cartella = cartella
+        os.makedirs(cartella, exist_ok=True)
+        percorso_manifest = os.path.join(cartella, FILE_MANIFEST)
+
+        manifest = None
+        if os.path.exists(percorso_manifest):
+            with open(percorso_manifest, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        if manifest != impronta:
+            if self.shard():
+                print(f"  AVVISO: il checkpoint in '{cartella}' appartiene a un input diverso e verrà scartato.")
+            self.svuota()
+            with open(percorso_manifest, "w", encoding="utf-8") as f:
+                json.dump(impronta, f, indent=2)
+
+        self.posizioni_completate = set()
+        for percorso in self.shard():
+            self.posizioni_completate.update(pd.read_csv(percorso, usecols=[COLONNA_POSIZIONE])[COLONNA_POSIZIONE].tolist())
+        self.prossimo_shard = len(self.shard())
+        if self.posizioni_completate:
+            print(f"  Ripresa da checkpoint: {len(self.posizioni_completate)} righe già analizzate in {self.prossimo_shard} shard.")
+
+    def shard(self):
+        return sorted(glob.glob(os.path.join(self.cartella, f"{PREFISSO_SHARD}*.csv")))
+
+    def da_analizzare(self, blocco):
+        """Righe del blocco non ancora presenti in uno shard completato."""
+        if not self.posizioni_completate:
+            return blocco
+        return blocco[~blocco[COLONNA_POSIZIONE].isin(self.posizioni_completate)]
+
+    def salva_shard(self, df_shard):
+        """Scrive uno shard in modo atomico: un'interruzione non lascia mai shard parziali."""
+        percorso = os.path.join(self.cartella, f"{PREFISSO_SHARD}{self.prossimo_shard:06d}.csv")
+        temporaneo = percorso + ".tmp"
+        df_shard.to_csv(temporaneo, index=False, encoding="utf-8")
+        os.replace(temporaneo, percorso)
+        self.posizioni_completate.update(df_shard[COLONNA_POSIZIONE].tolist())
+        self.prossimo_shard += 1
+
+    def unisci_shard(self, percorso_output):
+        """Unisce gli shard nel file finale uno alla volta, in ordine di posizione nell'input."""
+        shard = self.shard()
+        # gli shard successivi a una ripresa possono contenere righe precedenti: ordiniamo per posizione minima,
+        # letta dall'intera colonna. Gli shard vuoti (blocchi senza testi) non hanno posizioni e sono saltati.
+        minime = [(pd.read_csv(p, usecols=[COLONNA_POSIZIONE])[COLONNA_POSIZIONE].min(), p) for p in shard]
+        da_unire = sorted((minima, p) for minima, p in minime if pd.notna(minima))
+        righe = 0
+        temporaneo = percorso_output + ".tmp"
+        if shard and not da_unire: # solo shard vuoti: il file finale ha comunque l'intestazione
+            pd.read_csv(shard[0], nrows=0).drop(columns=[COLONNA_POSIZIONE]).to_csv(temporaneo, index=False, encoding="utf-8")
+        for i, (_, percorso) in enumerate(da_unire):
+            df_shard = pd.read_csv(percorso, low_memory=False).sort_values(COLONNA_POSIZIONE)
+            df_shard.drop(columns=[COLONNA_POSIZIONE]).to_csv(temporaneo, mode="w" if i == 0 else "a", header=(i == 0), index=False, encoding="utf-8")
+            righe += len(df_shard)
+        if shard:
+            os.replace(temporaneo, percorso_output)
+        return righe
+
+    def svuota(self):
+        for percorso in self.shard():
+            os.remove(percorso)
+
+    def elimina(self):
+        shutil.rmtree(self.cartella, ignore_errors=True)
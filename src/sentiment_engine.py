@@ -0,0 +1,362 @@
+# sentiment_engine.py
+#
+# Caricamento del modello di sentiment e inferenza a batch, condivisi da 01_sent.py
+# e dagli altri script della fase di Sentiment Analysis.
+
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from config import (
+    SENTIMENT_BACKEND,
+    SENTIMENT_BATCH_SIZE,
+    SENTIMENT_MAX_LENGTH,
+    SENTIMENT_MAX_TOKENS_PER_BATCH,
+    SENTIMENT_LENGTH_MODE,
+    SENTIMENT_WINDOW_STRIDE,
+    SENTIMENT_WINDOW_AGGREGATION,
+    SENTIMENT_WINDOW_MAX_IN_MEMORY,
+    SENTIMENT_PIPELINE_ENABLED,
+    SENTIMENT_PREFETCH_BATCHES,
+    SENTIMENT_PIPELINE_GROUP_DOCS
+)
+from sentiment_backend import BACKEND_FP32, BACKEND_SOLO_CPU, crea_backend
+from sentiment_pipeline import (
+    CodaPrefetch,
+    accumula_statistiche_pipeline,
+    descrivi_statistiche_pipeline,
+    nuove_statistiche_pipeline
+)
+
+COLONNE_RISULTATO = [
+    'sentiment_label',
+    'sentiment_score_positive',
+    'sentiment_score_negative',
+    'sentiment_score_neutral'
+]
+ETICHETTA_ERRORE = "errore_generico_analisi"
+
+MODALITA_TRONCAMENTO = "troncamento"
+MODALITA_FINESTRE = "finestre"
+AGGREGAZIONE_MEDIA_PESATA = "media_pesata"
+AGGREGAZIONE_MAX = "max"
+
+# Batch pronto per l'inferenza, con il contesto del gruppo di testi da cui proviene.
+# `errore` è valorizzato se la preparazione del batch è fallita; `ultimo` chiude il gruppo.
+BatchPronto = namedtuple("BatchPronto", ["inizio", "gruppo", "lunghezze", "documento_di_finestra", "indici", "batch", "errore", "ultimo"])
+
+
+def seleziona_dispositivo():
+    """Sceglie CUDA, poi MPS, poi CPU."""
+    if torch.cuda.is_available():
+        print("Trovata GPU NVIDIA (CUDA). Verrà utilizzata questa.")
+        return torch.device("cuda")
+    if torch.backends.mps.is_available():
+        print("Trovata GPU Apple (MPS). Verrà utilizzata questa.")
+        return torch.device("mps")
+    print("Nessuna GPU compatibile trovata. Verrà utilizzata la CPU (più lento).")
+    return torch.device("cpu")
+
+
+def descrivi_statistiche_finestre(stat):
+    """Costo aggiuntivo della modalità finestre rispetto al semplice troncamento."""
+    if not stat["documenti"]:
+        return "Modalità finestre: nessun documento elaborato."
+    return (f"Modalità finestre: {stat['finestre']} finestre per {stat['documenti']} documenti "
+            f"({stat['finestre'] / stat['documenti']:.2f} per documento), {stat['token_finestre']} token elaborati "
+            f"contro {stat['token_troncamento']} con il troncamento (x{stat['token_finestre'] / max(stat['token_troncamento'], 1):.2f}).")
+
+
+class MotoreSentiment:
+    """
+    Modello di sentiment pronto per l'inferenza a batch.
+    I testi vengono tokenizzati una sola volta, ordinati per lunghezza e raggruppati in
+    bucket con padding dinamico (ogni batch è lungo quanto il suo testo più lungo).
+    In modalità "finestre" i testi lunghi sono divisi in finestre di token sovrapposte:
+    le finestre di molti documenti condividono gli stessi batch e i loro score vengono
+    poi aggregati per documento.
+    Il forward pass è delegato al backend scelto (vedi sentiment_backend.py).
+    Con la pipeline attiva tokenizzazione e padding avvengono in un thread produttore
+    (vedi sentiment_pipeline.py) mentre il thread principale esegue solo l'inferenza.
+    """
+
+    def __init__(self, model_name, device=None, batch_size=SENTIMENT_BATCH_SIZE,
+                 max_length=SENTIMENT_MAX_LENGTH, max_tokens_per_batch=SENTIMENT_MAX_TOKENS_PER_BATCH,
+                 backend=SENTIMENT_BACKEND, num_thread=None, modalita_lunghezza=SENTIMENT_LENGTH_MODE,
+                 stride=SENTIMENT_WINDOW_STRIDE, aggregazione=SENTIMENT_WINDOW_AGGREGATION,
+                 max_finestre_in_memoria=SENTIMENT_WINDOW_MAX_IN_MEMORY, pipeline=SENTIMENT_PIPELINE_ENABLED,
+                 prefetch_batch=SENTIMENT_PREFETCH_BATCHES, documenti_per_gruppo=SENTIMENT_PIPELINE_GROUP_DOCS):
+        print(f"Caricamento del modello e tokenizer: {model_name} (backend: {backend}, modalità: {modalita_lunghezza})...")
+        if modalita_lunghezza not in (MODALITA_TRONCAMENTO, MODALITA_FINESTRE):
+            raise ValueError(f"Modalità di gestione della lunghezza sconosciuta: '{modalita_lunghezza}'")
+        if aggregazione not in (AGGREGAZIONE_MEDIA_PESATA, AGGREGAZIONE_MAX):
+            raise ValueError(f"Aggregazione delle finestre sconosciuta: '{aggregazione}'")
+        self.model_name = model_name
+        self.backend_name = backend
+        if num_thread:
+            torch.set_num_threads(num_thread)
+        if backend in BACKEND_SOLO_CPU:
+            device = torch.device("cpu")
+        self.device = device if device is not None else seleziona_dispositivo()
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.modalita_lunghezza = modalita_lunghezza
+        self.stride = stride
+        self.aggregazione = aggregazione
+        self.max_finestre_in_memoria = max_finestre_in_memoria
+        self.pipeline = pipeline
+        self.prefetch_batch = prefetch_batch
+        self.documenti_per_gruppo = documenti_per_gruppo
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.to(self.device)
+        self.model.eval()
+        print(f"Modello spostato su dispositivo: {self.device}")
+
+        self.config = self.model.config
+        self.revisione = getattr(self.config, "_commit_hash", None)
+        self.label_mapping = self.config.id2label
+        self.label_mapping_reverse = {v.lower(): k for k, v in self.label_mapping.items()}
+        print(f"Mapping delle etichette del modello: {self.label_mapping}")
+
+        self.backend = crea_backend(backend, self.model, self.tokenizer, model_name, self.device, num_thread)
+        if backend != BACKEND_FP32:
+            # il backend ha la propria copia (quantizzata o esportata): liberiamo il modello fp32
+            self.model = None
+
+        # Etichette indicizzabili per id e colonne delle probabilità nell'ordine di COLONNE_RISULTATO
+        self._etichette = np.array([self.label_mapping[i] for i in range(len(self.label_mapping))], dtype=object)
+        self._indici_score = [
+            self.label_mapping_reverse.get('positive', 2),
+            self.label_mapping_reverse.get('negative', 0),
+            self.label_mapping_reverse.get('neutral', 1)
+        ]
+        self.statistiche_finestre = {"documenti": 0, "finestre": 0, "token_finestre": 0, "token_troncamento": 0}
+        self.statistiche_pipeline = nuove_statistiche_pipeline()
+        # Se impostato a una lista, ogni batch eseguito vi aggiunge (secondi, sequenze, token non di padding): usato dal benchmark
+        self.tempi_batch = None
+
+    @property
+    def variante_cache(self):
+        """
+        Identifica i parametri che cambiano i risultati oltre a modello e max_length (usato dalla cache):
+        il backend (int8 e ONNX danno punteggi diversi da fp32) e la gestione dei testi lunghi.
+        Vuota per fp32 con troncamento, così le voci già in cache restano valide.
+        """
+        parti = []
+        if self.backend_name != BACKEND_FP32:
+            parti.append(self.backend_name)
+        if self.modalita_lunghezza != MODALITA_TRONCAMENTO:
+            parti.append(f"{MODALITA_FINESTRE}-{self.stride}-{self.aggregazione}")
+        return "+".join(parti)
+
+    # --- TOKENIZZAZIONE E BUCKET ---
+    def tokenizza(self, testi):
+        """
+        Tokenizza tutti i testi con l'API batch del tokenizer veloce, senza padding.
+        Restituisce le codifiche (solo gli input del modello) e, in modalità finestre,
+        per ogni finestra l'indice del documento di provenienza.
+        """
+        if self.modalita_lunghezza == MODALITA_FINESTRE:
+            codifiche = self.tokenizer(
+                list(testi), truncation=True, max_length=self.max_length,
+                stride=self.stride, return_overflowing_tokens=True
+            )
+            documento_di_finestra = np.asarray(codifiche["overflow_to_sample_mapping"], dtype=np.int64)
+        else:
+            codifiche = self.tokenizer(list(testi), truncation=True, max_length=self.max_length)
+            documento_di_finestra = None
+        codifiche = {k: codifiche[k] for k in self.tokenizer.model_input_names if k in codifiche}
+        return codifiche, documento_di_finestra
+
+    def forma_bucket(self, lunghezze):
+        """
+        Ordina gli indici per lunghezza in token e li divide in batch che rispettano sia
+        batch_size sia il budget max_tokens_per_batch (testi corti -> batch più grandi).
+        """
+        ordine = np.argsort(lunghezze, kind="stable")
+        bucket = []
+        corrente = []
+        for i in ordine:
+            # in ordine crescente il testo corrente è il più lungo del bucket: fissa il padding
+            if corrente and (len(corrente) >= self.batch_size or (len(corrente) + 1) * lunghezze[i] > self.max_tokens_per_batch):
+                bucket.append(corrente)
+                corrente = []
+            corrente.append(i)
+        if corrente:
+            bucket.append(corrente)
+        return bucket
+
+    def prepara_batch(self, codifiche, indici):
+        """Costruisce i tensori di un bucket con padding dinamico."""
+        features = {k: [codifiche[k][i] for i in indici] for k in codifiche.keys()}
+        return self.tokenizer.pad(features, padding=True, return_tensors="pt")
+
+    # --- INFERENZA ---
+    def calcola_logits(self, batch):
+        return self.backend(batch)
+
+    def imposta_thread(self, num_thread):
+        """Cambia i thread di inferenza senza ricaricare il modello (usato dalla calibrazione del pool)."""
+        torch.set_num_threads(num_thread)
+        self.backend.imposta_thread(num_thread)
+
+    def probabilita_batch(self, batch):
+        """Restituisce le probabilità del batch come array numpy (una sola copia dal dispositivo)."""
+        with torch.inference_mode():
+            logits = self.calcola_logits(batch)
+            return torch.nn.functional.softmax(logits.float(), dim=-1).cpu().numpy()
+
+    def genera_batch(self, testi, dimensione_gruppo):
+        """
+        Tokenizza i testi a gruppi e produce, bucket per bucket, i batch pronti per il modello.
+        Un errore nella preparazione di un batch è riportato nel BatchPronto invece di
+        interrompere la generazione.
+        """
+        for inizio in range(0, len(testi), dimensione_gruppo):
+            gruppo = testi[inizio:inizio + dimensione_gruppo]
+            codifiche, documento_di_finestra = self.tokenizza(gruppo)
+            lunghezze = np.fromiter((len(ids) for ids in codifiche["input_ids"]), dtype=np.int64, count=len(codifiche["input_ids"]))
+            bucket = self.forma_bucket(lunghezze)
+            for k, indici in enumerate(bucket):
+                try:
+                    batch, errore = self.prepara_batch(codifiche, indici), None
+                except Exception as e:
+                    batch, errore = None, e
+                yield BatchPronto(inizio, gruppo, lunghezze, documento_di_finestra, indici, batch, errore, k == len(bucket) - 1)
+
+    def aggrega_finestre(self, probabilita, fallite, lunghezze, documento_di_finestra, n_documenti):
+        """
+        Riporta gli score delle finestre sui documenti:
+        - media_pesata: media delle probabilità pesata per il numero di token di ogni finestra;
+        - max: probabilità della finestra più sicura (massima probabilità di classe).
+        Un documento con una finestra fallita è marcato come fallito.
+        """
+        doc_falliti = np.zeros(n_documenti, dtype=bool)
+        np.logical_or.at(doc_falliti, documento_di_finestra, fallite)
+        probabilita = np.nan_to_num(probabilita)
+
+        if self.aggregazione == AGGREGAZIONE_MEDIA_PESATA:
+            pesi = lunghezze.astype(np.float32)
+            somme = np.zeros((n_documenti, probabilita.shape[1]), dtype=np.float32)
+            np.add.at(somme, documento_di_finestra, probabilita * pesi[:, None])
+            totale_pesi = np.bincount(documento_di_finestra, weights=pesi, minlength=n_documenti)
+            risultato = somme / np.maximum(totale_pesi, 1e-9)[:, None]
+        else:
+            confidenza = probabilita.max(axis=1)
+            # ordinando per (documento, confidenza) l'ultima finestra di ogni documento è la più sicura
+            ordine = np.lexsort((confidenza, documento_di_finestra))
+            ultima = np.r_[documento_di_finestra[ordine][1:] != documento_di_finestra[ordine][:-1], True]
+            risultato = np.zeros((n_documenti, probabilita.shape[1]), dtype=np.float32)
+            risultato[documento_di_finestra[ordine][ultima]] = probabilita[ordine][ultima]
+
+        risultato[doc_falliti] = np.nan
+        return risultato, doc_falliti
+
+    def componi_risultati(self, probabilita):
+        """Converte una matrice di probabilità (n x classi) nelle colonne di COLONNE_RISULTATO."""
+        return pd.DataFrame({
+            'sentiment_label': self._etichette[probabilita.argmax(axis=1)],
+            'sentiment_score_positive': probabilita[:, self._indici_score[0]],
+            'sentiment_score_negative': probabilita[:, self._indici_score[1]],
+            'sentiment_score_neutral': probabilita[:, self._indici_score[2]]
+        })
+
+    def analizza_testi(self, testi, ogni_n_documenti=1000):
+        """
+        Analizza una lista di testi non vuoti e restituisce un DataFrame con COLONNE_RISULTATO
+        nello stesso ordine dei testi. Un batch fallito marca i suoi documenti come errore
+        senza interrompere gli altri.
+        In modalità finestre i testi sono elaborati a gruppi, così che le finestre in memoria
+        restino intorno a max_finestre_in_memoria.
+        """
+        n = len(testi)
+        if n == 0:
+            return self._risultati_finali(np.zeros((0, len(self._etichette)), dtype=np.float32), np.zeros(0, dtype=bool))
+
+        # in modalità finestre un documento produce in media più sequenze: gruppi più piccoli
+        if self.modalita_lunghezza == MODALITA_FINESTRE:
+            dimensione_gruppo = max(1, self.max_finestre_in_memoria // 4)
+        else:
+            # con la pipeline gruppi limitati: il primo batch è pronto senza tokenizzare tutto l'input
+            dimensione_gruppo = min(n, self.documenti_per_gruppo) if self.pipeline else n
+
+        sorgente = self.genera_batch(testi, dimensione_gruppo)
+        prefetch = None
+        if self.pipeline:
+            prefetch = CodaPrefetch(sorgente, self.prefetch_batch)
+            sorgente = prefetch
+
+        parti_probabilita = []
+        parti_falliti = []
+        start_time = time.time()
+        prossimo_report = ogni_n_documenti
+        gruppo_corrente = None
+        try:
+            for lavoro in sorgente:
+                if lavoro.inizio != gruppo_corrente:
+                    # primo batch di un nuovo gruppo: i batch arrivano gruppo dopo gruppo
+                    gruppo_corrente = lavoro.inizio
+                    probabilita = np.full((len(lavoro.lunghezze), len(self._etichette)), np.nan, dtype=np.float32)
+                    fallite = np.zeros(len(lavoro.lunghezze), dtype=bool)
+                    parti_probabilita.append(probabilita)
+                    parti_falliti.append(fallite)
+
+                try:
+                    if lavoro.errore is not None:
+                        raise lavoro.errore
+                    inizio_batch = time.perf_counter()
+                    probabilita[lavoro.indici] = self.probabilita_batch(lavoro.batch)
+                    if self.tempi_batch is not None:
+                        self.tempi_batch.append((time.perf_counter() - inizio_batch, len(lavoro.indici), int(lavoro.lunghezze[lavoro.indici].sum())))
+                except Exception as e:
+                    primo = lavoro.indici[0] if lavoro.documento_di_finestra is None else lavoro.documento_di_finestra[lavoro.indici[0]]
+                    print(f"    ERRORE durante l'analisi di un batch di {len(lavoro.indici)} sequenze (es. '{lavoro.gruppo[primo][:70]}...'). Errore: {e.__class__.__name__} - {e}")
+                    fallite[lavoro.indici] = True
+
+                if not lavoro.ultimo:
+                    continue
+                if lavoro.documento_di_finestra is None:
+                    parti_falliti[-1] = fallite
+                else:
+                    parti_probabilita[-1], parti_falliti[-1] = self.aggrega_finestre(probabilita, fallite, lavoro.lunghezze, lavoro.documento_di_finestra, len(lavoro.gruppo))
+                    self._aggiorna_statistiche_finestre(lavoro.lunghezze, lavoro.documento_di_finestra, len(lavoro.gruppo))
+
+                completati = lavoro.inizio + len(lavoro.gruppo)
+                if completati >= prossimo_report or completati == n:
+                    elapsed_time = time.time() - start_time
+                    print(f"  Analizzati {completati}/{n} documenti... (Tempo trascorso: {elapsed_time:.2f} secondi, {completati / max(elapsed_time, 1e-9):.1f} doc/s)")
+                    while prossimo_report <= completati:
+                        prossimo_report += ogni_n_documenti
+        finally:
+            if prefetch is not None:
+                prefetch.chiudi()
+                accumula_statistiche_pipeline(self.statistiche_pipeline, prefetch.statistiche)
+
+        return self._risultati_finali(np.concatenate(parti_probabilita), np.concatenate(parti_falliti))
+
+    def _aggiorna_statistiche_finestre(self, lunghezze, documento_di_finestra, n_documenti):
+        """Accumula il costo delle finestre rispetto al troncamento (la prima finestra di ogni documento)."""
+        prima_finestra = np.r_[True, documento_di_finestra[1:] != documento_di_finestra[:-1]]
+        self.statistiche_finestre["documenti"] += n_documenti
+        self.statistiche_finestre["finestre"] += len(lunghezze)
+        self.statistiche_finestre["token_finestre"] += int(lunghezze.sum())
+        self.statistiche_finestre["token_troncamento"] += int(lunghezze[prima_finestra].sum())
+
+    def riepilogo_finestre(self):
+        return descrivi_statistiche_finestre(self.statistiche_finestre)
+
+    def riepilogo_pipeline(self):
+        return descrivi_statistiche_pipeline(self.statistiche_pipeline, self.prefetch_batch)
+
+    def _risultati_finali(self, probabilita, falliti):
+        risultati = self.componi_risultati(np.nan_to_num(probabilita))
+        risultati.loc[falliti, 'sentiment_label'] = ETICHETTA_ERRORE
+        risultati.loc[falliti, COLONNE_RISULTATO[1:]] = None
+        return risultati
@@ -0,0 +1,283 @@
+# sentiment_parallelo.py
+#
+# Sentiment data-parallel su CPU: l'input viene diviso in shard analizzati da N processi worker,
+# ognuno con il proprio modello caricato una sola volta e un numero di thread PyTorch dedicato.
+# PoolSentiment espone la stessa interfaccia di MotoreSentiment.analizza_testi; ogni worker è un
+# executor a processo singolo, così il pool può crescere o ridursi senza ricaricare i modelli
+# già caricati (la calibrazione riusa gli stessi worker tra una prova e l'altra).
+
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+import torch
+
+try:
+    import resource
+except ImportError:
+    resource = None # non disponibile su Windows: la calibrazione non potrà stimare la memoria dei worker
+
+from config import (
+    SENTIMENT_BACKEND,
+    SENTIMENT_PREFETCH_BATCHES,
+    SENTIMENT_SHARD_SIZE,
+    SENTIMENT_CALIBRATION_DOCS,
+    SENTIMENT_CALIBRATION_MAX_PROCESSES,
+    SENTIMENT_CALIBRATION_MEMORY_FRACTION
+)
+from sentiment_engine import MotoreSentiment, COLONNE_RISULTATO, descrivi_statistiche_finestre
+from sentiment_pipeline import accumula_statistiche_pipeline, descrivi_statistiche_pipeline, nuove_statistiche_pipeline
+
+TESTI_RISCALDAMENTO = ["riscaldamento del modello"] * 4
+
+# --- LATO WORKER ---
+_motore_worker = None
+
+def _inizializza_worker(model_name, backend, num_thread):
+    """Eseguita una volta per processo: fissa i thread e carica il modello."""
+    global _motore_worker
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass # già impostato in questo processo
+    _motore_worker = MotoreSentiment(model_name, device=torch.device("cpu"), backend=backend, num_thread=num_thread)
+
+def _memoria_picco():
+    """Picco di memoria residente del processo in MB (None se non misurabile)."""
+    if resource is None:
+        return None
+    picco = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss è in KB su Linux e in byte su macOS
+    return picco / (1024 * 1024) if sys.platform == "darwin" else picco / 1024
+
+def _info_worker(testi_riscaldamento):
+    """Riscalda il modello del worker e ne restituisce i parametri utili al processo principale."""
+    _motore_worker.analizza_testi(testi_riscaldamento, ogni_n_documenti=10**9)
+    return {
+        "pid": os.getpid(),
+        "revisione": _motore_worker.revisione,
+        "max_length": _motore_worker.max_length,
+        "modalita_lunghezza": _motore_worker.modalita_lunghezza,
+        "variante_cache": _motore_worker.variante_cache,
+        "memoria_mb": _memoria_picco()
+    }
+
+def _imposta_thread_worker(num_thread, testi_riscaldamento):
+    """Cambia i thread del modello già caricato e lo riscalda con la nuova configurazione."""
+    _motore_worker.imposta_thread(num_thread)
+    _motore_worker.analizza_testi(testi_riscaldamento, ogni_n_documenti=10**9)
+
+def _analizza_shard(inizio, testi):
+    """Analizza uno shard; restituisce anche le statistiche di finestre e pipeline accumulate nel frattempo."""
+    risultati = _motore_worker.analizza_testi(testi, ogni_n_documenti=10**9)
+    statistiche = dict(_motore_worker.statistiche_finestre)
+    for chiave in _motore_worker.statistiche_finestre:
+        _motore_worker.statistiche_finestre[chiave] = 0
+    statistiche_pipeline = _motore_worker.statistiche_pipeline
+    _motore_worker.statistiche_pipeline = nuove_statistiche_pipeline()
+    return inizio, risultati, statistiche, statistiche_pipeline
+
+
+# --- LATO PROCESSO PRINCIPALE ---
+def memoria_disponibile():
+    """RAM disponibile sulla macchina in MB (None se non misurabile)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for riga in f:
+                if riga.startswith("MemAvailable:"):
+                    return int(riga.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+class PoolSentiment:
+    """Pool di processi worker con un modello di sentiment ciascuno."""
+
+    def __init__(self, model_name, num_processi, thread_per_processo, backend=SENTIMENT_BACKEND, shard_size=SENTIMENT_SHARD_SIZE):
+        print(f"Avvio di {num_processi} processi worker x {thread_per_processo} thread (backend: {backend})...")
+        self.model_name = model_name
+        self.backend = backend
+        self.num_processi = 0
+        self.thread_per_processo = thread_per_processo
+        self.shard_size = shard_size
+        self.worker = []
+        self.info_worker = []
+        self.ridimensiona(num_processi)
+        self.revisione = self.info_worker[0]["revisione"]
+        self.max_length = self.info_worker[0]["max_length"]
+        self.modalita_lunghezza = self.info_worker[0]["modalita_lunghezza"]
+        self.variante_cache = self.info_worker[0]["variante_cache"]
+        self.statistiche_finestre = {"documenti": 0, "finestre": 0, "token_finestre": 0, "token_troncamento": 0}
+        self.statistiche_pipeline = nuove_statistiche_pipeline()
+
+    def _nuovo_worker(self):
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_inizializza_worker,
+            initargs=(self.model_name, self.backend, self.thread_per_processo)
+        )
+
+    def ridimensiona(self, num_processi):
+        """
+        Porta il pool a num_processi worker: i mancanti caricano il modello in parallelo
+        (con i thread correnti) e vengono riscaldati, quelli in eccesso vengono chiusi.
+        """
+        nuovi = [self._nuovo_worker() for _ in range(num_processi - self.num_processi)]
+        if nuovi:
+            futures = [worker.submit(_info_worker, TESTI_RISCALDAMENTO) for worker in nuovi]
+            wait(futures)
+            try:
+                info = [f.result() for f in futures]
+            except Exception:
+                for worker in nuovi:
+                    worker.shutdown()
+                raise
+            self.worker += nuovi
+            self.info_worker += info
+        for worker in self.worker[num_processi:]:
+            worker.shutdown()
+        del self.worker[num_processi:]
+        del self.info_worker[num_processi:]
+        self.num_processi = num_processi
+
+    def imposta_thread(self, thread_per_processo):
+        """Cambia i thread di tutti i worker senza ricaricarne i modelli; i worker avviati in seguito useranno lo stesso valore."""
+        if thread_per_processo == self.thread_per_processo:
+            return
+        self.thread_per_processo = thread_per_processo
+        futures = [worker.submit(_imposta_thread_worker, thread_per_processo, TESTI_RISCALDAMENTO) for worker in self.worker]
+        wait(futures)
+        for f in futures:
+            f.result()
+
+    def memoria_worker(self):
+        """Picco di memoria residente (MB) del worker più pesante, None se non misurabile."""
+        futures = [worker.submit(_memoria_picco) for worker in self.worker]
+        misure = [f.result() for f in futures]
+        return max(misure) if misure and None not in misure else None
+
+    def analizza_testi(self, testi, ogni_n_documenti=1000):
+        """
+        Divide i testi in shard, li distribuisce ai worker e ricompone i risultati
+        nell'ordine originale dei testi.
+        """
+        n = len(testi)
+        if n == 0:
+            return pd.DataFrame(columns=COLONNE_RISULTATO)
+
+        # shard piccoli rispetto all'input: i worker più veloci ne prendono di più
+        dimensione = max(1, min(self.shard_size, -(-n // (self.num_processi * 4))))
+        inizi = list(range(0, n, dimensione))
+        # due shard per worker in coda: mentre uno viene analizzato il successivo è già arrivato al processo
+        liberi = self.worker * 2
+        in_corso = {}
+        prossimo = 0
+
+        parti = {}
+        start_time = time.time()
+        completati = 0
+        prossimo_report = ogni_n_documenti
+        while prossimo < len(inizi) or in_corso:
+            while liberi and prossimo < len(inizi):
+                worker = liberi.pop()
+                inizio = inizi[prossimo]
+                in_corso[worker.submit(_analizza_shard, inizio, testi[inizio:inizio + dimensione])] = worker
+                prossimo += 1
+            terminati, _ = wait(in_corso, return_when=FIRST_COMPLETED)
+            for future in terminati:
+                liberi.append(in_corso.pop(future))
+                inizio, risultati, statistiche, statistiche_pipeline = future.result()
+                parti[inizio] = risultati
+                for chiave, valore in statistiche.items():
+                    self.statistiche_finestre[chiave] += valore
+                accumula_statistiche_pipeline(self.statistiche_pipeline, statistiche_pipeline)
+                completati += len(risultati)
+                if completati >= prossimo_report or completati == n:
+                    elapsed_time = time.time() - start_time
+                    print(f"  Analizzati {completati}/{n} documenti su {self.num_processi} processi... (Tempo trascorso: {elapsed_time:.2f} secondi, {completati / max(elapsed_time, 1e-9):.1f} doc/s)")
+                    prossimo_report += ogni_n_documenti
+
+        # gli shard sono contigui: riordinarli per posizione di partenza ripristina l'ordine dei testi
+        return pd.concat([parti[inizio] for inizio in sorted(parti)], ignore_index=True)
+
+    def riepilogo_finestre(self):
+        return descrivi_statistiche_finestre(self.statistiche_finestre)
+
+    def riepilogo_pipeline(self):
+        return descrivi_statistiche_pipeline(self.statistiche_pipeline, SENTIMENT_PREFETCH_BATCHES)
+
+    def chiudi(self):
+        for worker in self.worker:
+            worker.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.chiudi()
+
+
+# --- CALIBRAZIONE ---
+def configurazioni_candidate(core_totali, max_processi=SENTIMENT_CALIBRATION_MAX_PROCESSES):
+    """Combinazioni processi x thread che usano tutti i core (processi in potenze di 2, al massimo max_processi)."""
+    candidati = []
+    processi = 1
+    while processi <= min(core_totali, max_processi):
+        candidati.append((processi, max(1, core_totali // processi)))
+        processi *= 2
+    return candidati
+
+def calibra_processi_thread(testi, model_name, backend=SENTIMENT_BACKEND, core_totali=None, num_documenti=SENTIMENT_CALIBRATION_DOCS,
+                            max_processi=SENTIMENT_CALIBRATION_MAX_PROCESSES, quota_memoria=SENTIMENT_CALIBRATION_MEMORY_FRACTION):
+    """
+    Prova rapidamente le combinazioni processi x thread su un campione dei testi
+    (escludendo il caricamento dei modelli) e restituisce un PoolSentiment già portato
+    alla combinazione con più documenti al secondo.
+    Le prove usano un unico pool che cresce da una combinazione alla successiva: ogni
+    worker carica il modello una sola volta, e il pool smette di crescere quando i worker
+    aggiunti non starebbero nella RAM disponibile o quando la velocità smette di salire.
+    """
+    core_totali = core_totali or os.cpu_count() or 1
+    rng = np.random.default_rng(0)
+    indici = rng.choice(len(testi), size=min(num_documenti, len(testi)), replace=False)
+    campione = [testi[i] for i in sorted(indici)]
+
+    candidati = configurazioni_candidate(core_totali, max_processi)
+    print(f"\nCalibrazione processi x thread su {len(campione)} documenti ({core_totali} core, al massimo {candidati[-1][0]} processi)...")
+    pool = PoolSentiment(model_name, candidati[0][0], candidati[0][1], backend=backend)
+    migliore = None
+    for num_processi, num_thread in candidati:
+        if num_processi > pool.num_processi:
+            per_worker, disponibile = pool.memoria_worker(), memoria_disponibile()
+            if per_worker is not None and disponibile is not None and (num_processi - pool.num_processi) * per_worker > disponibile * quota_memoria:
+                print(f"  {num_processi:>3} processi: memoria insufficiente (~{per_worker:.0f} MB per worker, {disponibile:.0f} MB disponibili), calibrazione interrotta.")
+                break
+            try:
+                # prima si riducono i thread dei worker esistenti, così i nuovi partono già con il valore giusto
+                pool.imposta_thread(num_thread)
+                pool.ridimensiona(num_processi)
+            except Exception as e:
+                print(f"  {num_processi:>3} processi x {num_thread:>2} thread: ERRORE {e}")
+                break
+        inizio = time.perf_counter()
+        pool.analizza_testi(campione, ogni_n_documenti=10**9)
+        velocita = len(campione) / (time.perf_counter() - inizio)
+        print(f"  {num_processi:>3} processi x {num_thread:>2} thread: {velocita:.1f} doc/s")
+        if migliore is None or velocita > migliore[2]:
+            migliore = (num_processi, num_thread, velocita)
+        else:
+            print("  Velocità in calo: calibrazione interrotta.")
+            break
+
+    print(f"Configurazione scelta: {migliore[0]} processi x {migliore[1]} thread ({migliore[2]:.1f} doc/s).")
+    pool.ridimensiona(migliore[0])
+    pool.imposta_thread(migliore[1])
+    return pool
@@ -0,0 +1,110 @@
+# sentiment_pipeline.py
+#
+# Prefetch dei batch per MotoreSentiment: un thread produttore esegue la tokenizzazione
+# (API batch del tokenizer veloce, che rilascia il GIL) e costruisce i tensori con padding,
+# mettendoli in una coda limitata; il thread principale esegue solo i forward pass.
+# Le metriche della coda (profondità, attese dell'inferenza, attese del produttore)
+# servono a dimensionare SENTIMENT_PREFETCH_BATCHES.
+
+import queue
+import threading
+import time
+
+_FINE = object()
+INTERVALLO_CONTROLLO = 0.1 # Secondi tra due controlli della richiesta di interruzione
+
+
+def nuove_statistiche_pipeline():
+    return {
+        "batch": 0,
+        "attese_inferenza": 0,
+        "secondi_attesa_inferenza": 0.0,
+        "secondi_attesa_produttore": 0.0,
+        "somma_profondita": 0,
+        "profondita_max": 0
+    }
+
+def accumula_statistiche_pipeline(totale, parziale):
+    """Somma le statistiche di un'esecuzione a quelle complessive (la profondità massima non si somma)."""
+    for chiave, valore in parziale.items():
+        if chiave == "profondita_max":
+            totale[chiave] = max(totale[chiave], valore)
+        else:
+            totale[chiave] += valore
+
+def descrivi_statistiche_pipeline(stat, capienza):
+    """Riepilogo leggibile: molte attese dell'inferenza indicano un produttore troppo lento, una coda sempre piena il contrario."""
+    if not stat["batch"]:
+        return "Pipeline di tokenizzazione: nessun batch elaborato."
+    return (f"Pipeline di tokenizzazione: {stat['batch']} batch, profondità media della coda "
+            f"{stat['somma_profondita'] / stat['batch']:.1f}/{capienza} (massima {stat['profondita_max']}), "
+            f"inferenza in attesa di batch {stat['attese_inferenza']} volte per {stat['secondi_attesa_inferenza']:.2f} s, "
+            f"produttore bloccato a coda piena per {stat['secondi_attesa_produttore']:.2f} s.")
+
+
+class CodaPrefetch:
+    """
+    Esegue un generatore di batch in un thread produttore e ne rende disponibili i
+    risultati, nello stesso ordine, attraverso una coda di al massimo `capienza` elementi.
+    Un'eccezione del produttore viene rilanciata nel thread che consuma.
+    """
+
+    def __init__(self, generatore, capienza):
+        self.capienza = capienza
+        self.coda = queue.Queue(maxsize=capienza)
+        self.interrompi = threading.Event()
+        self.statistiche = nuove_statistiche_pipeline()
+        self.thread = threading.Thread(target=self._produci, args=(generatore,), name="tokenizzazione-sentiment", daemon=True)
+        self.thread.start()
+
+    def _metti(self, elemento):
+        """Inserisce in coda; restituisce False se il consumatore ha chiesto l'interruzione."""
+        inizio = time.perf_counter()
+        while not self.interrompi.is_set():
+            try:
+                self.coda.put(elemento, timeout=INTERVALLO_CONTROLLO)
+                self.statistiche["secondi_attesa_produttore"] += time.perf_counter() - inizio
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produci(self, generatore):
+        try:
+            for elemento in generatore:
+                if not self._metti(elemento):
+                    return
+        except BaseException as e:
+            self._metti(e)
+            return
+        self._metti(_FINE)
+
+    def __iter__(self):
+        while True:
+            profondita = self.coda.qsize()
+            if profondita == 0:
+                inizio = time.perf_counter()
+                elemento = self.coda.get()
+                self.statistiche["attese_inferenza"] += 1
+                self.statistiche["secondi_attesa_inferenza"] += time.perf_counter() - inizio
+            else:
+                elemento = self.coda.get()
+            if elemento is _FINE:
+                return
+            if isinstance(elemento, BaseException):
+                raise elemento
+            self.statistiche["batch"] += 1
+            self.statistiche["somma_profondita"] += profondita
+            self.statistiche["profondita_max"] = max(self.statistiche["profondita_max"], profondita)
+            yield elemento
+
+    def chiudi(self):
+        """Ferma il produttore (anche se bloccato su una coda piena) e attende la fine del thread."""
+        self.interrompi.set()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.chiudi()
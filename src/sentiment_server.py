@@ -0,0 +1,252 @@
+# sentiment_server.py
+#
+# Servizio asyncio di scoring del sentiment con micro-batching: le richieste concorrenti
+# vengono accodate e raggruppate in batch di al massimo max_batch testi, attendendo al più
+# max_attesa_ms dal primo testo in coda. L'inferenza gira in un thread dedicato, così che
+# il loop continui ad accettare richieste (e a riempire il batch successivo) durante il forward pass.
+# Il protocollo è un HTTP/1.1 minimale con corpi JSON, senza dipendenze oltre la libreria standard:
+#   POST /analizza  {"testo": "..."} oppure {"testi": [...]}, con "lingua" opzionale
+#   GET  /metriche  contatori di throughput e latenza
+#   GET  /salute
+
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from sentiment_engine import COLONNE_RISULTATO
+
+FINESTRA_LATENZE = 10000 # Latenze recenti conservate per i percentili
+FINESTRA_THROUGHPUT_S = 60
+
+MESSAGGI_STATO = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+# --- METRICHE ---
+class MetricheServer:
+    """Contatori cumulativi, latenze recenti e documenti completati nell'ultimo minuto."""
+
+    def __init__(self):
+        self.avvio = time.time()
+        self.richieste = 0
+        self.documenti = 0
+        self.batch = 0
+        self.errori = 0
+        self.latenze_ms = deque(maxlen=FINESTRA_LATENZE)
+        self.completamenti = deque() # (istante, documenti) dei batch recenti
+
+    def registra_batch(self, dimensione, latenze_ms):
+        adesso = time.time()
+        self.batch += 1
+        self.documenti += dimensione
+        self.latenze_ms.extend(latenze_ms)
+        self.completamenti.append((adesso, dimensione))
+        while self.completamenti and self.completamenti[0][0] < adesso - FINESTRA_THROUGHPUT_S:
+            self.completamenti.popleft()
+
+    def istantanea(self):
+        durata = max(time.time() - self.avvio, 1e-9)
+        latenze = np.fromiter(self.latenze_ms, dtype=float) if self.latenze_ms else None
+        recenti = sum(d for t, d in self.completamenti if t >= time.time() - FINESTRA_THROUGHPUT_S)
+        return {
+            "secondi_attivo": round(durata, 1),
+            "richieste": self.richieste,
+            "documenti": self.documenti,
+            "batch": self.batch,
+            "errori": self.errori,
+            "dimensione_media_batch": round(self.documenti / self.batch, 2) if self.batch else 0,
+            "documenti_al_secondo": round(self.documenti / durata, 2),
+            "documenti_al_secondo_ultimo_minuto": round(recenti / min(durata, FINESTRA_THROUGHPUT_S), 2),
+            "latenza_ms": {
+                "p50": round(float(np.percentile(latenze, 50)), 2),
+                "p95": round(float(np.percentile(latenze, 95)), 2),
+                "p99": round(float(np.percentile(latenze, 99)), 2),
+                "max": round(float(latenze.max()), 2)
+            } if latenze is not None else {}
+        }
+
+
+# --- MICRO-BATCHING ---
+def risultato_json(riga):
+    """Riga di COLONNE_RISULTATO serializzabile in JSON (score numpy -> float, NaN -> null)."""
+    risultato = {'sentiment_label': riga[0]}
+    for colonna, valore in zip(COLONNE_RISULTATO[1:], riga[1:]):
+        risultato[colonna] = None if valore is None or np.isnan(valore) else float(valore)
+    return risultato
+
+
+class MicroBatcher:
+    """
+    Raggruppa i testi in arrivo per un analizzatore (MotoreSentiment o compatibile).
+    Ogni testo attende il risultato su un future; un batch fallito propaga l'errore ai suoi testi.
+    """
+
+    def __init__(self, analizzatore, metriche, max_batch, max_attesa_ms):
+        self.analizzatore = analizzatore
+        self.metriche = metriche
+        self.max_batch = max_batch
+        self.max_attesa = max_attesa_ms / 1000
+        self.coda = asyncio.Queue()
+        # un solo thread: i batch di uno stesso modello vengono eseguiti uno alla volta
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.task = None
+
+    def avvia(self):
+        self.task = asyncio.get_running_loop().create_task(self._ciclo())
+
+    async def analizza(self, testo):
+        future = asyncio.get_running_loop().create_future()
+        await self.coda.put((testo, future, time.perf_counter()))
+        return await future
+
+    async def _raccogli_batch(self):
+        """Attende il primo testo, poi raccoglie gli altri fino a max_batch o alla scadenza."""
+        loop = asyncio.get_running_loop()
+        batch = [await self.coda.get()]
+        scadenza = loop.time() + self.max_attesa
+        while len(batch) < self.max_batch:
+            # i testi già in coda (arrivati durante l'inferenza precedente) entrano senza attese
+            if not self.coda.empty():
+                batch.append(self.coda.get_nowait())
+                continue
+            residuo = scadenza - loop.time()
+            if residuo <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.coda.get(), residuo))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _ciclo(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._raccogli_batch()
+            testi = [testo for testo, _, _ in batch]
+            try:
+                risultati = await loop.run_in_executor(self.executor, self.analizzatore.analizza_testi, testi, 10**9)
+            except Exception as e:
+                self.metriche.errori += len(batch)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            fine = time.perf_counter()
+            for (_, future, arrivo), riga in zip(batch, risultati[COLONNE_RISULTATO].itertuples(index=False)):
+                if not future.done():
+                    future.set_result(risultato_json(riga))
+            self.metriche.registra_batch(len(batch), [(fine - arrivo) * 1000 for _, _, arrivo in batch])
+
+    def chiudi(self):
+        if self.task is not None:
+            self.task.cancel()
+        self.executor.shutdown(wait=False)
+
+
+# --- HTTP MINIMALE ---
+async def leggi_messaggio_http(reader):
+    """Legge riga iniziale, header e corpo (Content-Length). Restituisce None a connessione chiusa."""
+    riga = await reader.readline()
+    if not riga:
+        return None
+    header = {}
+    while True:
+        linea = await reader.readline()
+        if linea in (b"\r\n", b"\n", b""):
+            break
+        nome, _, valore = linea.decode("latin-1").partition(":")
+        header[nome.strip().lower()] = valore.strip()
+    lunghezza = int(header.get("content-length", 0))
+    corpo = await reader.readexactly(lunghezza) if lunghezza else b""
+    return riga.decode("latin-1").strip(), header, corpo
+
+def componi_messaggio_http(riga_iniziale, corpo_json, header_extra=None):
+    corpo = json.dumps(corpo_json, ensure_ascii=False).encode("utf-8")
+    header = {"Content-Type": "application/json; charset=utf-8", "Content-Length": str(len(corpo)), **(header_extra or {})}
+    testa = riga_iniziale + "\r\n" + "".join(f"{k}: {v}\r\n" for k, v in header.items()) + "\r\n"
+    return testa.encode("latin-1") + corpo
+
+
+class ServerSentiment:
+    """
+    Server HTTP asyncio con un MicroBatcher per modello. analizzatori_per_lingua associa ogni lingua
+    all'analizzatore del suo modello; le richieste senza lingua (o con lingua sconosciuta) usano lingua_default.
+    """
+
+    def __init__(self, analizzatori_per_lingua, lingua_default, max_batch, max_attesa_ms):
+        self.metriche = MetricheServer()
+        self.lingua_default = lingua_default
+        batcher_per_analizzatore = {}
+        self.batcher_per_lingua = {}
+        for lingua, analizzatore in analizzatori_per_lingua.items():
+            # lingue che condividono il modello condividono anche i micro-batch
+            if id(analizzatore) not in batcher_per_analizzatore:
+                batcher_per_analizzatore[id(analizzatore)] = MicroBatcher(analizzatore, self.metriche, max_batch, max_attesa_ms)
+            self.batcher_per_lingua[lingua] = batcher_per_analizzatore[id(analizzatore)]
+        self.batcher = list(batcher_per_analizzatore.values())
+
+    async def _analizza(self, corpo):
+        richiesta = json.loads(corpo or b"{}")
+        if not isinstance(richiesta, dict):
+            return 400, {"errore": "il corpo della richiesta deve essere un oggetto JSON"}
+        if not isinstance(richiesta.get("lingua"), (str, type(None))):
+            return 400, {"errore": "'lingua' deve essere una stringa"}
+        testi = richiesta.get("testi", [richiesta["testo"]] if "testo" in richiesta else None)
+        if not isinstance(testi, list) or not testi or not all(isinstance(t, str) and t.strip() for t in testi):
+            return 400, {"errore": "specificare 'testo' (stringa non vuota) oppure 'testi' (lista di stringhe non vuote)"}
+        batcher = self.batcher_per_lingua.get(richiesta.get("lingua"), self.batcher_per_lingua[self.lingua_default])
+        risultati = await asyncio.gather(*(batcher.analizza(t) for t in testi))
+        return 200, {"risultati": risultati}
+
+    async def _gestisci_richiesta(self, metodo, percorso, corpo):
+        if percorso == "/analizza":
+            if metodo != "POST":
+                return 405, {"errore": "usare POST"}
+            self.metriche.richieste += 1
+            try:
+                return await self._analizza(corpo)
+            except (ValueError, KeyError) as e:
+                return 400, {"errore": f"richiesta non valida: {e}"}
+        if percorso == "/metriche":
+            return 200, self.metriche.istantanea()
+        if percorso == "/salute":
+            return 200, {"stato": "ok"}
+        return 404, {"errore": f"percorso sconosciuto '{percorso}'"}
+
+    async def _gestisci_connessione(self, reader, writer):
+        """Una connessione può inviare più richieste in sequenza (keep-alive)."""
+        try:
+            while True:
+                messaggio = await leggi_messaggio_http(reader)
+                if messaggio is None:
+                    break
+                riga, header, corpo = messaggio
+                metodo, percorso, _ = (riga.split(" ") + ["", ""])[:3]
+                try:
+                    stato, risposta = await self._gestisci_richiesta(metodo, percorso, corpo)
+                except Exception as e:
+                    stato, risposta = 500, {"errore": f"{e.__class__.__name__} - {e}"}
+                chiudi = header.get("connection", "").lower() == "close"
+                writer.write(componi_messaggio_http(f"HTTP/1.1 {stato} {MESSAGGI_STATO[stato]}", risposta, {"Connection": "close" if chiudi else "keep-alive"}))
+                await writer.drain()
+                if chiudi:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def esegui(self, host, porta):
+        for batcher in self.batcher:
+            batcher.avvia()
+        server = await asyncio.start_server(self._gestisci_connessione, host, porta)
+        print(f"Server di sentiment in ascolto su http://{host}:{porta} (POST /analizza, GET /metriche, GET /salute)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for batcher in self.batcher:
+                batcher.chiudi()
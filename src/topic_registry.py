@@ -0,0 +1,162 @@
+# topic_registry.py
+#
+# Registro condiviso delle versioni dei modelli LDA e delle relative etichette dei topic.
+# Struttura su disco (vedi TOPIC_MODEL_REGISTRY_DIR in config.py):
+#
+#   <lingua>/versione_corrente.txt
+#   <lingua>/<versione>/lda_topics.txt      topic stampati dal modello (da cui deriva la versione)
+#   <lingua>/<versione>/lda_model*          modello Gensim persistito
+#   <lingua>/<versione>/topic_labels.json   tabella id -> etichetta per QUESTA versione
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from config import TOPIC_MODEL_REGISTRY_DIR
+
+FILE_TOPIC = "lda_topics.txt"
+FILE_MODELLO = "lda_model"
+FILE_ETICHETTE = "topic_labels.json"
+FILE_VERSIONE_CORRENTE = "versione_corrente.txt"
+
+
+class ErroreVersioneTopic(Exception):
+    """Versione del modello LDA e tabella delle etichette non corrispondono."""
+
+
+# --- VERSIONI ---
+def calcola_versione_modello(righe_topic):
+    """
+    Calcola la versione di un modello LDA come impronta delle righe dei topic
+    (le stesse scritte in lda_topics_<lingua>.txt, newline inclusi).
+    """
+    contenuto = "".join(righe_topic).encode("utf-8")
+    return hashlib.sha1(contenuto).hexdigest()[:12]
+
+def calcola_versione_da_file(percorso_topic_txt):
+    """Calcola la versione a partire da un file lda_topics_<lingua>.txt già scritto."""
+    with open(percorso_topic_txt, "r", encoding="utf-8") as f:
+        return calcola_versione_modello(f.readlines())
+
+def colonna_versione(lingua):
+    """Nome della colonna che, negli output per documento, riporta la versione del modello."""
+    return f"versione_modello_lda_{lingua}"
+
+def cartella_versione(lingua, versione):
+    return os.path.join(TOPIC_MODEL_REGISTRY_DIR, lingua, versione)
+
+def versione_corrente(lingua):
+    """Restituisce l'ultima versione registrata per la lingua, o None se il registro è vuoto."""
+    percorso = os.path.join(TOPIC_MODEL_REGISTRY_DIR, lingua, FILE_VERSIONE_CORRENTE)
+    if not os.path.exists(percorso):
+        return None
+    with open(percorso, "r", encoding="utf-8") as f:
+        return f.read().strip() or None
+
+def versione_da_df(df, lingua, percorso_topic_txt=None):
+    """
+    Legge la versione del modello da cui provengono i topic di un DataFrame.
+    Per gli output precedenti al registro (senza colonna di versione) la ricava dal
+    file dei topic prodotto nella stessa esecuzione di 01_topic.py.
+    """
+    colonna = colonna_versione(lingua)
+    if colonna in df.columns:
+        versioni = df[colonna].dropna().astype(str).unique()
+        if len(versioni) != 1:
+            raise ErroreVersioneTopic(f"Attesa una sola versione del modello nella colonna '{colonna}', trovate: {list(versioni)}")
+        return versioni[0]
+
+    if percorso_topic_txt and os.path.exists(percorso_topic_txt):
+        print(f"  AVVISO: colonna '{colonna}' assente, versione ricavata da '{percorso_topic_txt}'.")
+        return calcola_versione_da_file(percorso_topic_txt)
+
+    raise ErroreVersioneTopic(
+        f"Impossibile determinare la versione del modello LDA ({lingua}): colonna '{colonna}' assente "
+        f"e file dei topic non disponibile. Riesegui 01_topic.py."
+    )
+
+
+# --- REGISTRAZIONE ---
+def registra_modello(lingua, righe_topic, lda_model=None):
+    """
+    Persiste una versione del modello nel registro e la marca come corrente.
+    Se la versione è nuova, scrive un modello di tabella delle etichette con valori vuoti
+    da compilare a mano: finché non è completa gli stage a valle si rifiutano di partire.
+    Restituisce la versione.
+    """
+    versione = calcola_versione_modello(righe_topic)
+    cartella = cartella_versione(lingua, versione)
+    os.makedirs(cartella, exist_ok=True)
+
+    with open(os.path.join(cartella, FILE_TOPIC), "w", encoding="utf-8") as f:
+        f.writelines(righe_topic)
+    if lda_model is not None:
+        lda_model.save(os.path.join(cartella, FILE_MODELLO))
+
+    percorso_etichette = os.path.join(cartella, FILE_ETICHETTE)
+    if not os.path.exists(percorso_etichette):
+        tabella = {
+            "lingua": lingua,
+            "versione_modello": versione,
+            "num_topic": len(righe_topic),
+            "etichette": {str(i): None for i in range(len(righe_topic))}
+        }
+        with open(percorso_etichette, "w", encoding="utf-8") as f:
+            json.dump(tabella, f, ensure_ascii=False, indent=2)
+        print(f"  Nuova versione del modello '{versione}': compilare le etichette in '{percorso_etichette}'")
+
+    with open(os.path.join(TOPIC_MODEL_REGISTRY_DIR, lingua, FILE_VERSIONE_CORRENTE), "w", encoding="utf-8") as f:
+        f.write(versione + "\n")
+    return versione
+
+
+# --- ETICHETTE ---
+def carica_etichette(lingua, versione):
+    """
+    Carica la tabella delle etichette associata a una versione del modello.
+    Restituisce la lista delle etichette ordinate per id (l'id è la posizione).
+    Solleva ErroreVersioneTopic se la tabella manca, è incompleta o appartiene a un'altra versione.
+    """
+    percorso = os.path.join(cartella_versione(lingua, versione), FILE_ETICHETTE)
+    if not os.path.exists(percorso):
+        raise ErroreVersioneTopic(f"Nessuna tabella di etichette registrata per il modello {lingua} versione '{versione}' ({percorso}).")
+
+    with open(percorso, "r", encoding="utf-8") as f:
+        tabella = json.load(f)
+
+    if tabella.get("lingua") != lingua or tabella.get("versione_modello") != versione:
+        raise ErroreVersioneTopic(
+            f"La tabella '{percorso}' appartiene a {tabella.get('lingua')}/{tabella.get('versione_modello')}, "
+            f"non a {lingua}/{versione}."
+        )
+
+    etichette = {int(k): v for k, v in tabella.get("etichette", {}).items()}
+    if sorted(etichette) != list(range(tabella.get("num_topic", len(etichette)))):
+        raise ErroreVersioneTopic(f"Gli id dei topic in '{percorso}' non coprono 0..{tabella.get('num_topic', 0) - 1}.")
+    mancanti = [i for i, v in etichette.items() if not v]
+    if mancanti:
+        raise ErroreVersioneTopic(f"Etichette non ancora assegnate in '{percorso}' per i topic: {mancanti}")
+    if len(set(etichette.values())) != len(etichette):
+        raise ErroreVersioneTopic(f"Etichette duplicate in '{percorso}'.")
+
+    return [etichette[i] for i in range(len(etichette))]
+
+def applica_etichette(serie_topic, etichette):
+    """
+    Converte una serie di id di topic nelle relative etichette come dtype 'category':
+    i codici sono gli id stessi (int8 fino a 127 topic), quindi nessuna ricerca per riga.
+    I valori mancanti restano NaN; un id senza etichetta solleva ErroreVersioneTopic.
+    """
+    ids = pd.to_numeric(serie_topic, errors="coerce")
+    fuori_tabella = ids.notna() & ~ids.isin(range(len(etichette)))
+    if fuori_tabella.any():
+        raise ErroreVersioneTopic(f"ID di topic senza etichetta: {sorted(ids[fuori_tabella].unique().tolist())}")
+
+    codici = ids.fillna(-1).astype("int8" if len(etichette) < 128 else "int16")
+    return pd.Series(
+        pd.Categorical.from_codes(codici, categories=etichette),
+        index=serie_topic.index,
+        name="topic_label"
+    )